@@ -0,0 +1,439 @@
+"""
+変換処理のベンチマーク。
+
+  python generator.py bench --sizes 1000,10000,100000
+  python generator.py bench --sizes 1000000 --output results.json --baseline baseline.json
+
+合成した OfflineList DAT / CSV（日本語タイトル、UTF-8 / cp932）を使い、
+XML → CSV・CSV → XML・往復変換の処理時間、件数/秒、ピークメモリを計測する。
+各ケースは別プロセスで実行し、ピーク RSS が他のケースの影響を受けないようにする。
+--check-output を付けると、CSV → XML の出力を ElementTree + minidom による基準の実装と比較する。
+"""
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import generator
+
+
+# -------------------------------
+# 合成データ生成
+# -------------------------------
+TITLE_PREFIXES = ["スーパー", "ドラゴン", "ファイナル", "伝説の", "魔界", "忍者", "熱血", "がんばれ", "新・", "真・"]
+TITLE_NOUNS = ["クエスト", "ファイター", "ウォーズ", "物語", "大作戦", "サッカー", "ゴルフ", "麻雀", "アドベンチャー",
+               "レーサー", "ベースボール", "探偵団", "騎士", "三国志", "パズル"]
+TITLE_SUFFIXES = ["", "", "", "II", "III", "外伝", "スペシャル", "ＤＸ", " ～失われた秘宝～", " & フレンズ"]
+PUBLISHERS = ["任天堂", "ハドソン", "ナムコ", "コナミ", "カプコン", "スクウェア", "エニックス", "タイトー", "バンダイ", "セガ"]
+SAVE_TYPES = ["None", "Battery", "Password", "EEPROM"]
+ROM_EXTENSIONS = [".nes", ".nes", ".nes", ".fds"]
+
+BENCH_DAT_CODE = "bench"
+BENCH_EXTENSION = "nes"
+BENCH_SETTINGS = dict(
+    dat_name="Benchmark",
+    im_folder="benchimg",
+    system="bench",
+    ss_width="320",
+    ss_height="224",
+    dat_code=BENCH_DAT_CODE,
+)
+# 基準の実装は全件を DOM にするため、これより多い件数では実行しない
+REFERENCE_MAX_ROWS = 100000
+
+
+def synthetic_games(count: int, seed: int = 1):
+    """CSV_FIELDNAMES の順に値を並べた list を count 件返す（seed が同じなら同じ内容）。"""
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        title = rng.choice(TITLE_PREFIXES) + rng.choice(TITLE_NOUNS) + rng.choice(TITLE_SUFFIXES)
+        values = {
+            "imageNumber": str(number),
+            "releaseNumber": str(number),
+            "title": title,
+            "im1CRC": f"{rng.getrandbits(32):08X}",
+            "im2CRC": f"{rng.getrandbits(32):08X}" if rng.random() < 0.8 else "",
+            "publisher": rng.choice(PUBLISHERS),
+            "sourceRom": rng.choice(["", "ROM吸い出し", "No-Intro"]),
+            "location": "7",
+            "comment": rng.choice(["", "", "名作", "続編あり", "限定版 <初回特典付き>"]),
+            "language": "64",
+            "saveType": rng.choice(SAVE_TYPES),
+            "romSize": str(rng.choice([24592, 40976, 131088, 262160, 524304])),
+            "romCRC": f"{rng.getrandbits(32):08X}",
+            "extension": rng.choice(ROM_EXTENSIONS),
+        }
+        yield [values[name] for name in generator.CSV_FIELDNAMES]
+
+
+def write_synthetic_csv(path: str, count: int, seed: int = 1):
+    import csv
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(generator.CSV_FIELDNAMES)
+        writer.writerows(synthetic_games(count, seed))
+
+
+def write_synthetic_dat(path: str, count: int, encoding: str, seed: int = 1):
+    declared = "Shift_JIS" if encoding == "cp932" else "UTF-8"
+    escape = generator.escape_xml_text
+    with open(path, "w", encoding=encoding, newline="\n") as f:
+        f.write(f'<?xml version="1.0" encoding="{declared}"?>\n<dat>\n')
+        f.write("\t<configuration>\n\t\t<datName>Benchmark</datName>\n\t</configuration>\n\t<games>\n")
+        for values in synthetic_games(count, seed):
+            row = dict(zip(generator.CSV_FIELDNAMES, values))
+            f.write("\t\t<game>\n")
+            for name in generator.CSV_FIELDNAMES:
+                if name == "romCRC":
+                    f.write(f'\t\t\t<files><romCRC extension="{row["extension"]}">{row["romCRC"]}</romCRC></files>\n')
+                elif name != "extension":
+                    f.write(f"\t\t\t<{name}>{escape(row[name])}</{name}>\n")
+            f.write("\t\t</game>\n")
+        f.write("\t</games>\n</dat>\n")
+
+
+def prepare_inputs(workdir: str, size: int) -> dict:
+    """サイズごとの入力ファイルを作る（既にあれば再利用する）。"""
+    size_dir = os.path.join(workdir, str(size))
+    os.makedirs(size_dir, exist_ok=True)
+    inputs = {
+        "csv": os.path.join(size_dir, "games.csv"),
+        "utf-8": os.path.join(size_dir, "games_utf8.xml"),
+        "cp932": os.path.join(size_dir, "games_cp932.xml"),
+    }
+    if not os.path.exists(inputs["csv"]):
+        write_synthetic_csv(inputs["csv"], size)
+    for encoding in ("utf-8", "cp932"):
+        if not os.path.exists(inputs[encoding]):
+            write_synthetic_dat(inputs[encoding], size, encoding)
+    return inputs
+
+
+# -------------------------------
+# 計測（子プロセス側）
+# -------------------------------
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return windows_peak_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB 単位、macOS はバイト単位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def windows_peak_rss_mb():
+    try:
+        import ctypes
+        from ctypes import wintypes
+    except ImportError:
+        return None
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize / (1024 * 1024)
+
+
+def convert_csv(csv_path: str, stats: dict, output_encoding: str = "utf-8") -> str:
+    return generator.generate_xml_from_csv(
+        csv_path=csv_path,
+        extension_suffix=BENCH_EXTENSION,
+        config={},
+        stats=stats,
+        incremental=False,
+        zip_output=False,
+        output_encoding=output_encoding,
+        **BENCH_SETTINGS,
+    )
+
+
+# -------------------------------
+# 基準の実装（ElementTree + minidom）
+# -------------------------------
+def reference_games_xml(csv_path: str, extension_with_dot: str) -> tuple:
+    """<game> ごとに ET.SubElement を作り、minidom で整形する従来の方法で <games> 部分を作る。"""
+    import csv
+    import xml.etree.ElementTree as ET
+    from xml.dom import minidom
+
+    games_root = ET.Element("games")
+    count = 0
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            game = ET.SubElement(games_root, "game")
+            count += 1
+            for key, value in row.items():
+                if key == "romCRC":
+                    files = ET.SubElement(game, "files")
+                    crc = ET.SubElement(files, "romCRC")
+                    crc.text = value
+                    crc.set("extension", row.get("extension", extension_with_dot))
+                elif key != "extension":
+                    ET.SubElement(game, key).text = value or " "
+
+    pretty = minidom.parseString(ET.tostring(games_root, encoding="unicode")).toprettyxml(indent="  ")
+    lines = [line for line in pretty.splitlines() if line.strip()]
+    return "\n".join(lines[1:]), count
+
+
+def write_reference_xml(csv_path: str, output_path: str) -> int:
+    extension_with_dot = "." + BENCH_EXTENSION
+    configuration_xml = generator.build_configuration_xml_string(
+        config={}, extension_with_dot=extension_with_dot, **BENCH_SETTINGS)
+    games_xml, count = reference_games_xml(csv_path, extension_with_dot)
+    with open(output_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(generator.DAT_XML_HEADER + configuration_xml + "\n" + games_xml + generator.DAT_XML_FOOTER)
+    return count
+
+
+def check_output(csv_path: str) -> bool:
+    """CSV → XML の出力が基準の実装とバイト単位で一致するかを調べる。"""
+    work_dir = os.path.join(os.path.dirname(csv_path), "check")
+    os.makedirs(work_dir, exist_ok=True)
+    output_path = convert_csv(shutil.copy(csv_path, os.path.join(work_dir, "games.csv")), {})
+    reference_path = os.path.join(work_dir, "reference.xml")
+    write_reference_xml(csv_path, reference_path)
+    with open(output_path, "rb") as f, open(reference_path, "rb") as r:
+        return f.read() == r.read()
+
+
+def run_case(case: dict) -> dict:
+    """1 ケースを実行して結果を返す（ベンチマーク用の子プロセスから呼ばれる）。"""
+    kind = case["kind"]
+    path = case["input"]
+    stats = {}
+    if kind == "check-output":
+        return {"matched": check_output(path)}
+
+    if kind == "roundtrip":
+        # 出力が入力を上書きしないよう、作業用ディレクトリにコピーしてから計測する
+        work_dir = os.path.join(os.path.dirname(path), "roundtrip")
+        os.makedirs(work_dir, exist_ok=True)
+        path = shutil.copy(path, os.path.join(work_dir, "games.xml"))
+
+    if case.get("tracemalloc"):
+        import tracemalloc
+
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    if kind == "xml2csv":
+        generator.generate_csv_from_xml(path, stats=stats, parse_workers=case.get("parse_workers"))
+    elif kind == "csv2xml":
+        convert_csv(path, stats, case.get("output_encoding", "utf-8"))
+    elif kind == "csv2xml-reference":
+        stats["rows"] = write_reference_xml(path, os.path.join(os.path.dirname(path), "games_reference.xml"))
+    elif kind == "roundtrip":
+        csv_path = generator.generate_csv_from_xml(path)
+        convert_csv(csv_path, stats)
+    elif kind == "hold-rows":
+        # 比較用: 全件を行ごとの list のまま保持する
+        held = list(generator.iter_game_rows(path))
+        stats["rows"] = len(held)
+    elif kind == "hold-table":
+        held = generator.load_game_table(path)
+        stats["rows"] = len(held)
+    else:
+        raise ValueError(f"未知のケースです: {kind}")
+    seconds = time.perf_counter() - start
+
+    result = {"seconds": seconds, "rows": stats.get("rows", 0), "peak_rss_mb": peak_rss_mb()}
+    if case.get("tracemalloc"):
+        result["tracemalloc_peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    return result
+
+
+def run_case_in_subprocess(case: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{case['name']} の実行に失敗しました:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# -------------------------------
+# ケース定義と集計
+# -------------------------------
+def build_cases(inputs: dict, size: int) -> list:
+    cases = [
+        {"name": "xml2csv-utf8", "kind": "xml2csv", "size": size, "input": inputs["utf-8"]},
+        {"name": "xml2csv-cp932", "kind": "xml2csv", "size": size, "input": inputs["cp932"]},
+        # PARALLEL_PARSE_MIN_BYTES 未満の DAT は 1 プロセスで処理されるため、小さい件数では xml2csv-utf8 と同じになる
+        {"name": "xml2csv-parallel", "kind": "xml2csv", "size": size, "input": inputs["utf-8"],
+         "parse_workers": os.cpu_count() or 1},
+        {"name": "csv2xml", "kind": "csv2xml", "size": size, "input": inputs["csv"]},
+        {"name": "csv2xml-cp932", "kind": "csv2xml", "size": size, "input": inputs["csv"],
+         "output_encoding": "cp932"},
+        {"name": "roundtrip", "kind": "roundtrip", "size": size, "input": inputs["utf-8"]},
+        {"name": "hold-rows", "kind": "hold-rows", "size": size, "input": inputs["csv"]},
+        {"name": "hold-table", "kind": "hold-table", "size": size, "input": inputs["csv"]},
+    ]
+    if size <= REFERENCE_MAX_ROWS:
+        cases.append({"name": "csv2xml-reference", "kind": "csv2xml-reference", "size": size,
+                      "input": inputs["csv"]})
+    return cases
+
+
+def measure(case: dict, repeat: int, with_tracemalloc: bool) -> dict:
+    runs = [run_case_in_subprocess(case) for _ in range(max(1, repeat))]
+    best = min(runs, key=lambda run: run["seconds"])
+    result = {
+        "case": case["name"],
+        "size": case["size"],
+        "seconds": best["seconds"],
+        "rows_per_sec": best["rows"] / best["seconds"] if best["seconds"] > 0 else None,
+        "peak_rss_mb": max((run["peak_rss_mb"] or 0) for run in runs) or None,
+    }
+    if with_tracemalloc:
+        # tracemalloc は処理を大きく遅くするため、時間の計測とは別に 1 回だけ実行する
+        traced = run_case_in_subprocess(dict(case, tracemalloc=True))
+        result["tracemalloc_peak_mb"] = traced["tracemalloc_peak_mb"]
+    return result
+
+
+def result_key(result: dict) -> tuple:
+    return result["case"], result["size"]
+
+
+def compare_with_baseline(results: list, baseline: dict, threshold: float) -> list:
+    """基準より threshold（割合）以上遅い、またはメモリが多いケースを返す。"""
+    previous = {result_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = previous.get(result_key(result))
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb", "tracemalloc_peak_mb"):
+            if result.get(metric) and base.get(metric):
+                ratio = result[metric] / base[metric]
+                result.setdefault("ratio", {})[metric] = ratio
+                if ratio > 1 + threshold:
+                    regressions.append((result, metric, ratio))
+    return regressions
+
+
+def format_mb(value) -> str:
+    return f"{value:,.1f}" if value else "-"
+
+
+def print_results(results: list):
+    print(f"{'case':<20}{'size':>10}{'sec':>10}{'rows/s':>12}{'RSS MB':>10}{'trace MB':>10}{'vs base':>10}")
+    for result in results:
+        ratio = result.get("ratio", {}).get("seconds")
+        print(f"{result['case']:<20}{result['size']:>10,}{result['seconds']:>10.3f}"
+              f"{result['rows_per_sec'] or 0:>12,.0f}{format_mb(result.get('peak_rss_mb')):>10}"
+              f"{format_mb(result.get('tracemalloc_peak_mb')):>10}"
+              f"{(f'{ratio:.2f}x' if ratio else '-'):>10}")
+
+
+def environment_info() -> dict:
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv: list) -> int:
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py bench",
+        description="合成した DAT / CSV で変換処理の速度とメモリ使用量を計測します。",
+    )
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="ゲーム件数（カンマ区切り、既定: 1000,10000,100000。1000000 まで指定可）")
+    parser.add_argument("--cases", help="実行するケース（カンマ区切り、既定: すべて）")
+    parser.add_argument("--repeat", type=int, default=3, help="各ケースの実行回数（最短時間を採用、既定: 3）")
+    parser.add_argument("--tracemalloc", action="store_true", help="tracemalloc によるピーク割り当て量も計測する")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "offlinelist_bench"),
+                        help="合成データの保存先（既存のデータは再利用します）")
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    parser.add_argument("--baseline", help="比較する基準の結果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="基準からの悪化を退行とみなす割合（既定: 0.10 = 10%%）")
+    parser.add_argument("--check-output", action="store_true",
+                        help="CSV → XML の出力が ElementTree + minidom による基準の実装と一致するか確認する")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    selected = {name.strip() for name in args.cases.split(",")} if args.cases else None
+
+    results = []
+    mismatches = []
+    for size in sizes:
+        inputs = prepare_inputs(args.workdir, size)
+        if args.check_output and size <= REFERENCE_MAX_ROWS:
+            # 基準の実装はメモリを多く使うため、計測するケースと同じく別プロセスで実行する
+            matched = run_case_in_subprocess({"name": "check-output", "kind": "check-output",
+                                              "input": inputs["csv"]})["matched"]
+            print(f"  出力の検証 ({size:,}) ... {'一致' if matched else '不一致'}", file=sys.stderr)
+            if not matched:
+                mismatches.append(size)
+        for case in build_cases(inputs, size):
+            if selected and case["name"] not in selected:
+                continue
+            results.append(measure(case, args.repeat, args.tracemalloc))
+            print(f"  {case['name']} ({size:,}) ... {results[-1]['seconds']:.3f} 秒", file=sys.stderr)
+
+    import_time = generator.measure_import_time()["total_ms"]
+    report = {"environment": environment_info(), "import_ms": import_time, "results": results}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.threshold)
+
+    print_results(results)
+    print(f"import generator: {import_time:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for result, metric, ratio in regressions:
+        print(f"退行: {result['case']} ({result['size']:,}) の {metric} が基準の {ratio:.2f} 倍です。")
+    for size in mismatches:
+        print(f"不一致: {size:,} 件の CSV → XML の出力が基準の実装と異なります。")
+    return 1 if regressions or mismatches else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--run-case":
+        print(json.dumps(run_case(json.loads(sys.argv[2]))))
+    else:
+        sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,426 @@
+"""
+SQLite のカタログ（大きなコレクションを CSV の代わりに編集・検索するためのデータベース）。
+
+  python generator.py catalog import fc.db fc.xml extra.csv --dat-name ファミコン --system fc --extension nes
+  python generator.py catalog query fc.db --publisher 任天堂 --missing im2CRC
+  python generator.py catalog update fc.db --crc 1A2B3C4D --set publisher=任天堂
+  python generator.py catalog export fc.db fc.xml
+
+ゲームは games 表に 1 行ずつ（列は標準の列 CSV_FIELDNAMES、値は CSV と同じ文字列のまま）保存し、
+romCRC / imageNumber / title / publisher に索引を張る。取り込みは 1 つのトランザクションでまとめて行い、
+DAT の書き出しはカーソルから読んだ行をそのまま <game> にして書き込むため、全件をメモリに持たない。
+DAT の設定（datName / system など）は settings 表に保存し、書き出し時に使う。
+"""
+import csv
+import os
+import sqlite3
+import sys
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from itertools import chain
+
+from generator import (
+    CSV_FIELDNAMES,
+    DAT_OUTPUT_ENCODINGS,
+    DAT_SETTING_KEYS,
+    DAT_XML_FOOTER,
+    DAT_XML_HEADER_TEMPLATE,
+    GameSerializer,
+    build_configuration_xml_string,
+    create_version_file,
+    is_csv,
+    is_xml,
+    iter_game_rows,
+    load_config,
+    open_output,
+    resolve_dat_settings,
+    resolve_output_encoding,
+    today_dat_version,
+    write_games_xml,
+)
+
+
+# -------------------------------
+# スキーマ
+# -------------------------------
+CATALOG_VERSION = 1
+CATALOG_FETCH_ROWS = 1000
+
+# (索引名, 列, 照合順序)。romCRC は大文字・小文字を区別せずに検索する
+CATALOG_INDEXES = (
+    ("games_romCRC", "romCRC", "NOCASE"),
+    ("games_imageNumber", "imageNumber", None),
+    ("games_title", "title", None),
+    ("games_publisher", "publisher", None),
+)
+
+GAME_COLUMNS = ", ".join(f'"{name}"' for name in CSV_FIELDNAMES)
+INSERT_GAME_SQL = f"INSERT INTO games ({GAME_COLUMNS}) VALUES ({', '.join('?' * len(CSV_FIELDNAMES))})"
+
+
+def create_schema(conn):
+    columns = ",\n".join(f'  "{name}" TEXT NOT NULL DEFAULT \'\'' for name in CSV_FIELDNAMES)
+    # id は取り込んだ順（DAT に書き出す順）
+    conn.execute(f"CREATE TABLE IF NOT EXISTS games (\n  id INTEGER PRIMARY KEY,\n{columns}\n)")
+    conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    create_indexes(conn)
+
+
+def create_indexes(conn):
+    for name, column, collation in CATALOG_INDEXES:
+        collate = f" COLLATE {collation}" if collation else ""
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON games ("{column}"{collate})')
+
+
+def drop_indexes(conn):
+    for name, _, _ in CATALOG_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+@contextmanager
+def transaction(conn):
+    """BEGIN 〜 COMMIT を 1 つのトランザクションにまとめる（例外時は ROLLBACK）。"""
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def open_catalog(path: str, create: bool = False):
+    """
+    カタログを開く（create=True なら無ければ作る）。
+    トランザクションは transaction() で明示的に開始する（isolation_level=None）。
+    """
+    if not create and not os.path.isfile(path):
+        raise ValueError(f"カタログがありません: {path}")
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, CATALOG_VERSION):
+            raise ValueError(f"対応していない形式のカタログです（version {version}）: {path}")
+        if version == 0:
+            if not create:
+                raise ValueError(f"カタログではありません: {path}")
+            with transaction(conn):
+                create_schema(conn)
+                conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+    except (sqlite3.DatabaseError, ValueError):
+        conn.close()
+        raise
+    return conn
+
+
+def load_settings(conn) -> dict:
+    return dict(conn.execute("SELECT key, value FROM settings"))
+
+
+def save_settings(conn, settings: dict):
+    conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                     [(key, str(value)) for key, value in settings.items() if value is not None])
+
+
+# -------------------------------
+# 取り込み（DAT / CSV → カタログ）
+# -------------------------------
+def import_games(conn, paths: list, replace: bool = False, settings: dict = None) -> int:
+    """
+    paths（XML / CSV）のゲームを games 表の末尾に追加し、追加した件数を返す。
+    replace=True なら既存のゲームを削除してから取り込む。全体を 1 つのトランザクションで行う。
+    表が空のときは索引を外して取り込み、最後に作り直す（1 行ずつ索引を更新するより速い）。
+    """
+    added = 0
+    with transaction(conn):
+        if replace:
+            conn.execute("DELETE FROM games")
+        bulk = conn.execute("SELECT 1 FROM games LIMIT 1").fetchone() is None
+        if bulk:
+            drop_indexes(conn)
+        for path in paths:
+            before = conn.total_changes
+            conn.executemany(INSERT_GAME_SQL, iter_game_rows(path))
+            added += conn.total_changes - before
+        if bulk:
+            create_indexes(conn)
+        if settings:
+            save_settings(conn, settings)
+    return added
+
+
+# -------------------------------
+# 検索条件
+# -------------------------------
+def check_column(name: str) -> str:
+    if name not in CSV_FIELDNAMES:
+        raise ValueError(f"列名が正しくありません: {name}（{', '.join(CSV_FIELDNAMES)}）")
+    return f'"{name}"'
+
+
+def build_where(crc: str = None, image: str = None, release: str = None, title: str = None,
+                publisher: str = None, missing: list = (), contains: bool = False, where: str = None) -> tuple:
+    """
+    検索条件から (WHERE 句, パラメーター) を作る。条件はすべて満たすものだけを対象にする。
+    missing は空欄（空白だけを含む）の列、where は SQL の条件式をそのまま追加する。
+    """
+    conditions = []
+    params = []
+    if crc is not None:
+        conditions.append('"romCRC" = ? COLLATE NOCASE')
+        params.append(crc.strip())
+    if image is not None:
+        conditions.append('"imageNumber" = ?')
+        params.append(image.strip())
+    if release is not None:
+        conditions.append('"releaseNumber" = ?')
+        params.append(release.strip())
+    if title is not None:
+        if contains:
+            conditions.append("instr(\"title\", ?) > 0")
+        else:
+            conditions.append('"title" = ?')
+        params.append(title)
+    if publisher is not None:
+        conditions.append('"publisher" = ?')
+        params.append(publisher)
+    for name in missing:
+        conditions.append(f"trim({check_column(name)}) = ''")
+    if where:
+        conditions.append(f"({where})")
+    if not conditions:
+        return "", params
+    return " WHERE " + " AND ".join(conditions), params
+
+
+def iter_catalog_rows(conn, where: str = "", params: list = ()):
+    """
+    条件に合うゲームを id 順に CSV_FIELDNAMES 順のタプルで返す（カーソルから少しずつ読む）。
+    SQL の誤りは呼び出した時点で例外になる。
+    """
+    cursor = conn.execute(f"SELECT {GAME_COLUMNS} FROM games{where} ORDER BY id", params)
+    cursor.arraysize = CATALOG_FETCH_ROWS
+    return chain.from_iterable(iter(cursor.fetchmany, []))
+
+
+def update_games(conn, assignments: dict, where: str, params: list) -> int:
+    if not assignments:
+        raise ValueError("変更する列を --set 列名=値 で指定してください。")
+    columns = ", ".join(f"{check_column(name)} = ?" for name in assignments)
+    with transaction(conn):
+        cursor = conn.execute(f"UPDATE games SET {columns}{where}", list(assignments.values()) + list(params))
+    return cursor.rowcount
+
+
+# -------------------------------
+# 書き出し（カタログ → DAT / CSV）
+# -------------------------------
+def export_catalog_xml(conn, output_path: str, settings: dict, config: dict,
+                       where: str = "", params: list = (), output_encoding: str = None) -> int:
+    """
+    カーソルの行を 1 件ずつ <game> にして output_path へ書き出し、同じフォルダに {datCode}.txt を作る。
+    """
+    if output_encoding is None:
+        output_encoding = config.get("output_encoding", "utf-8")
+    output_encoding = resolve_output_encoding(output_encoding)
+
+    extension = settings["extension"].strip().lstrip(".")
+    extension_with_dot = "." + extension if extension else ""
+    dat_version = today_dat_version()
+    configuration_xml = build_configuration_xml_string(
+        config=config,
+        dat_name=settings["datName"],
+        im_folder=settings["imFolder"],
+        system=settings["system"],
+        ss_width=settings["screenshotsWidth"],
+        ss_height=settings["screenshotsHeight"],
+        extension_with_dot=extension_with_dot,
+        dat_code=settings["datCode"],
+        dat_version=dat_version,
+    )
+    serialize = GameSerializer(CSV_FIELDNAMES, extension_with_dot).serialize
+    games = (serialize(row, number) for number, row in enumerate(iter_catalog_rows(conn, where, params), 1))
+
+    with open_output(output_path, "wb") as f:
+        f.write(DAT_XML_HEADER_TEMPLATE.format(encoding=DAT_OUTPUT_ENCODINGS[output_encoding]).encode(output_encoding))
+        f.write(configuration_xml.encode(output_encoding, "xmlcharrefreplace"))
+        count = write_games_xml(f, games, encoding=output_encoding)
+        f.write(DAT_XML_FOOTER.encode(output_encoding))
+    create_version_file(os.path.dirname(output_path), settings["datCode"], dat_version)
+    return count
+
+
+def export_catalog_csv(conn, output_path: str, where: str = "", params: list = ()) -> int:
+    count = 0
+    with open_output(output_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDNAMES)
+        for row in iter_catalog_rows(conn, where, params):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def add_filter_options(parser):
+    parser.add_argument("--crc", help="romCRC（大文字・小文字は区別しない）")
+    parser.add_argument("--image", help="imageNumber")
+    parser.add_argument("--release", help="releaseNumber")
+    parser.add_argument("--title", help="タイトル")
+    parser.add_argument("--contains", action="store_true", help="タイトルを部分一致で検索する")
+    parser.add_argument("--publisher", help="publisher")
+    parser.add_argument("--missing", action="append", default=[], metavar="COLUMN",
+                        help="空欄の列（複数指定可。例: --missing im2CRC）")
+    parser.add_argument("--where", help="SQL の条件式（例: \"CAST(romSize AS INTEGER) > 1048576\"）")
+
+
+def add_setting_options(parser):
+    parser.add_argument("--dat-name", dest="datName")
+    parser.add_argument("--system")
+    parser.add_argument("--im-folder", dest="imFolder")
+    parser.add_argument("--screenshots-width", dest="screenshotsWidth")
+    parser.add_argument("--screenshots-height", dest="screenshotsHeight")
+    parser.add_argument("--extension", help="ROM ファイルの拡張子（例: nes）")
+    parser.add_argument("--dat-code", dest="datCode")
+
+
+def filter_args(args) -> tuple:
+    return build_where(crc=args.crc, image=args.image, release=args.release, title=args.title,
+                       publisher=args.publisher, missing=args.missing, contains=args.contains, where=args.where)
+
+
+def setting_args(args) -> dict:
+    return {key: getattr(args, key) for key in DAT_SETTING_KEYS if getattr(args, key) is not None}
+
+
+def parse_assignments(values: list) -> dict:
+    assignments = {}
+    for value in values:
+        name, sep, text = value.partition("=")
+        if not sep:
+            raise ValueError(f"--set は 列名=値 の形式で指定してください: {value}")
+        check_column(name)
+        assignments[name] = text
+    return assignments
+
+
+def run_import(args) -> int:
+    for path in args.inputs:
+        if not os.path.isfile(path) or not (is_csv(path) or is_xml(path)):
+            raise ValueError(f"CSV / XML ファイルではありません: {path}")
+    conn = open_catalog(args.catalog, create=True)
+    try:
+        added = import_games(conn, args.inputs, replace=args.replace, settings=setting_args(args))
+        total = conn.execute("SELECT count(*) FROM games").fetchone()[0]
+    finally:
+        conn.close()
+    print(f"{args.catalog}: {added:,} 件を取り込みました（合計 {total:,} 件）")
+    return 0
+
+
+def run_export(args) -> int:
+    conn = open_catalog(args.catalog)
+    try:
+        where, params = filter_args(args)
+        if is_csv(args.output):
+            count = export_catalog_csv(conn, args.output, where, params)
+        else:
+            stored = load_settings(conn)
+            settings = resolve_dat_settings(args.output, setting_args(args), stored, {})
+            count = export_catalog_xml(conn, args.output, settings, load_config(), where, params,
+                                       args.output_encoding)
+    finally:
+        conn.close()
+    print(f"{args.output}: {count:,} 件を書き出しました")
+    return 0
+
+
+def run_query(args) -> int:
+    import json
+
+    conn = open_catalog(args.catalog)
+    try:
+        where, params = filter_args(args)
+        if args.count:
+            print(conn.execute(f"SELECT count(*) FROM games{where}", params).fetchone()[0])
+            return 0
+        rows = iter_catalog_rows(conn, where, params)
+        found = 0
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        if args.format == "csv":
+            writer.writerow(CSV_FIELDNAMES)
+        for row in rows:
+            found += 1
+            if args.format == "csv":
+                writer.writerow(row)
+            else:
+                print(json.dumps(dict(zip(CSV_FIELDNAMES, row)), ensure_ascii=False))
+    finally:
+        conn.close()
+    if not found:
+        print("見つかりませんでした。", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_update(args) -> int:
+    assignments = parse_assignments(args.set)
+    conn = open_catalog(args.catalog)
+    try:
+        where, params = filter_args(args)
+        if not where and not args.all:
+            raise ValueError("条件を指定してください（すべてのゲームを変更する場合は --all）。")
+        updated = update_games(conn, assignments, where, params)
+    finally:
+        conn.close()
+    print(f"{args.catalog}: {updated:,} 件を更新しました")
+    return 0
+
+
+def main(argv: list) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py catalog",
+        description="DAT / CSV を SQLite のカタログに取り込み、検索・編集して DAT / CSV に書き出します。",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("import", help="DAT / CSV をカタログに取り込む")
+    p.add_argument("catalog", help="カタログ（SQLite。無ければ作成）")
+    p.add_argument("inputs", nargs="+", help="取り込む DAT（XML）/ CSV")
+    p.add_argument("--replace", action="store_true", help="既存のゲームを削除してから取り込む")
+    add_setting_options(p)
+    p.set_defaults(run=run_import)
+
+    p = commands.add_parser("export", help="カタログを DAT / CSV に書き出す")
+    p.add_argument("catalog", help="カタログ（SQLite）")
+    p.add_argument("output", help="出力先（.xml なら DAT と {datCode}.txt、.csv なら CSV）")
+    p.add_argument("--output-encoding", choices=tuple(DAT_OUTPUT_ENCODINGS),
+                   help="DAT の文字コード（既定: config.json の \"output_encoding\"）")
+    add_setting_options(p)
+    add_filter_options(p)
+    p.set_defaults(run=run_export)
+
+    p = commands.add_parser("query", help="条件に合うゲームを表示する")
+    p.add_argument("catalog", help="カタログ（SQLite）")
+    p.add_argument("--format", choices=("csv", "json"), default="csv", help="出力形式（既定: csv）")
+    p.add_argument("--count", action="store_true", help="件数だけを表示する")
+    add_filter_options(p)
+    p.set_defaults(run=run_query)
+
+    p = commands.add_parser("update", help="条件に合うゲームの列を書き換える")
+    p.add_argument("catalog", help="カタログ（SQLite）")
+    p.add_argument("--set", action="append", default=[], metavar="COLUMN=VALUE", help="変更する列と値（複数指定可）")
+    p.add_argument("--all", action="store_true", help="条件なしですべてのゲームを変更する")
+    add_filter_options(p)
+    p.set_defaults(run=run_update)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.run(args)
+    except (ValueError, OSError, ET.ParseError, sqlite3.Error) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
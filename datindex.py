@@ -0,0 +1,230 @@
+"""
+DAT の <game> 要素の位置（バイトオフセットと長さ）の索引。
+
+  python generator.py lookup fc.xml --crc 1A2B3C4D
+  python generator.py lookup fc.xml --release 1234 --format json
+  python generator.py lookup fc.xml --title "ドラゴンクエスト" --contains
+
+索引は {DAT}.idx（zlib 圧縮した JSON）に保存し、DAT のサイズか更新日時が
+変わっていれば自動で作り直す。検索時は該当する <game> だけを読み込んで解析する。
+"""
+import json
+import os
+import sys
+import zlib
+import xml.etree.ElementTree as ET
+
+from generator import (
+    GameRowExtractor,
+    check_byte_scan_encoding,
+    iter_game_spans,
+    normalize_rom_key,
+    open_output,
+    sniff_encoding,
+)
+
+
+# -------------------------------
+# 索引
+# -------------------------------
+DAT_INDEX_VERSION = 1
+INDEX_KEYS = ("romCRC", "imageNumber", "releaseNumber", "title")
+
+
+def index_path(dat_path: str) -> str:
+    return dat_path + ".idx"
+
+
+def index_key_value(key: str, value: str) -> str:
+    value = value.strip()
+    if key == "romCRC":
+        return value.upper()
+    if key == "title":
+        return normalize_rom_key(value)
+    return value
+
+
+class DatIndex:
+    """
+    spans[n] が n 番目の <game> の (開始位置, バイト長)、
+    keys[キー名][値] がその値を持つ <game> の番号の一覧。
+    """
+
+    def __init__(self, dat_path: str, encoding: str, spans: list, keys: dict, size: int, mtime_ns: int):
+        self.dat_path = dat_path
+        self.encoding = encoding
+        self.spans = spans
+        self.keys = keys
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    @classmethod
+    def build(cls, dat_path: str):
+        import mmap
+
+        encoding, _ = sniff_encoding(dat_path)
+        check_byte_scan_encoding(encoding)
+        st = os.stat(dat_path)
+        spans = []
+        keys = {key: {} for key in INDEX_KEYS}
+
+        def add_key(key: str, value, number: int):
+            if value is None:
+                return
+            value = index_key_value(key, value)
+            if value:
+                keys[key].setdefault(value, []).append(number)
+
+        with open(dat_path, "rb") as f:
+            if not st.st_size:
+                raise ValueError("<game> タグが見つかりません。")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for number, (offset, length) in enumerate(iter_game_spans(mm)):
+                    spans.append((offset, length))
+                    game = ET.fromstring(mm[offset:offset + length].decode(encoding, "replace"))
+                    for rom in game.iter("romCRC"):
+                        add_key("romCRC", rom.text, number)
+                    for key in ("imageNumber", "releaseNumber", "title"):
+                        add_key(key, game.findtext(key), number)
+
+        if not spans:
+            raise ValueError("<game> タグが見つかりません。")
+        return cls(dat_path, encoding, spans, keys, st.st_size, st.st_mtime_ns)
+
+    @classmethod
+    def load(cls, dat_path: str):
+        """保存済みの索引を読み込む。DAT が変更されている・形式が古い場合は None。"""
+        try:
+            with open(index_path(dat_path), "rb") as f:
+                data = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+            st = os.stat(dat_path)
+        except (OSError, ValueError, zlib.error):
+            return None
+        if (data.get("version") != DAT_INDEX_VERSION
+                or data.get("size") != st.st_size
+                or data.get("mtime_ns") != st.st_mtime_ns):
+            return None
+
+        # 開始位置は直前の <game> の終わりからの差分で保存している
+        spans = []
+        position = 0
+        for gap, length in zip(data["gaps"], data["lengths"]):
+            position += gap
+            spans.append((position, length))
+            position += length
+        return cls(dat_path, data["encoding"], spans, data["keys"], st.st_size, st.st_mtime_ns)
+
+    def save(self):
+        gaps = []
+        position = 0
+        for offset, length in self.spans:
+            gaps.append(offset - position)
+            position = offset + length
+        data = {
+            "version": DAT_INDEX_VERSION,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "encoding": self.encoding,
+            "gaps": gaps,
+            "lengths": [length for _, length in self.spans],
+            "keys": self.keys,
+        }
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with open_output(index_path(self.dat_path), "wb") as f:
+            f.write(zlib.compress(payload, 6))
+
+    def find(self, key: str, value: str, contains: bool = False) -> list:
+        """キーの値に一致する <game> の番号を返す（contains=True ならタイトルの部分一致）。"""
+        value = index_key_value(key, value)
+        values = self.keys.get(key, {})
+        if not contains:
+            return list(values.get(value, []))
+        numbers = set()
+        for candidate, found in values.items():
+            if value in candidate:
+                numbers.update(found)
+        return sorted(numbers)
+
+    def read_game_text(self, number: int, f) -> str:
+        offset, length = self.spans[number]
+        f.seek(offset)
+        return f.read(length).decode(self.encoding, "replace")
+
+    def read_games(self, numbers: list):
+        """番号順に (番号, <game> の XML 文字列) を返す。DAT は 1 回だけ開く。"""
+        with open(self.dat_path, "rb") as f:
+            for number in numbers:
+                yield number, self.read_game_text(number, f)
+
+
+def open_index(dat_path: str, rebuild: bool = False, stats: dict = None) -> DatIndex:
+    """索引を読み込む。無い・古い場合（または rebuild=True）は作り直して保存する。"""
+    index = None if rebuild else DatIndex.load(dat_path)
+    built = index is None
+    if built:
+        index = DatIndex.build(dat_path)
+        index.save()
+    if stats is not None:
+        stats["built"] = built
+        stats["games"] = len(index.spans)
+    return index
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+LOOKUP_OPTIONS = (
+    ("crc", "romCRC"),
+    ("release", "releaseNumber"),
+    ("image", "imageNumber"),
+    ("title", "title"),
+)
+
+
+def main(argv: list) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py lookup",
+        description="DAT の索引を使って、romCRC / releaseNumber / imageNumber / タイトルで <game> を検索します。",
+    )
+    parser.add_argument("dat_path", help="検索する DAT（XML）")
+    parser.add_argument("--crc", help="romCRC（大文字・小文字は区別しない）")
+    parser.add_argument("--release", help="releaseNumber")
+    parser.add_argument("--image", help="imageNumber")
+    parser.add_argument("--title", help="タイトル（全角・半角や大文字・小文字の違いは無視）")
+    parser.add_argument("--contains", action="store_true", help="タイトルを部分一致で検索する")
+    parser.add_argument("--format", choices=("xml", "json"), default="xml", help="出力形式（既定: xml）")
+    parser.add_argument("--rebuild", action="store_true", help="索引を作り直す")
+    args = parser.parse_args(argv)
+
+    conditions = [(key, getattr(args, option)) for option, key in LOOKUP_OPTIONS if getattr(args, option)]
+    try:
+        stats = {}
+        index = open_index(args.dat_path, rebuild=args.rebuild, stats=stats)
+    except (ValueError, OSError, ET.ParseError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    if stats["built"]:
+        print(f"索引を作成しました: {index_path(args.dat_path)}（{stats['games']:,} 件）", file=sys.stderr)
+    if not conditions:
+        return 0
+
+    # 複数の条件はすべて満たすものだけを返す
+    numbers = None
+    for key, value in conditions:
+        found = set(index.find(key, value, contains=args.contains and key == "title"))
+        numbers = found if numbers is None else numbers & found
+
+    for number, text in index.read_games(sorted(numbers)):
+        if args.format == "xml":
+            print(text)
+            continue
+        extractor = GameRowExtractor(discover_columns=True)
+        row = extractor.extract(ET.fromstring(text))
+        print(json.dumps(dict(zip(extractor.columns, row)), ensure_ascii=False))
+
+    if not numbers:
+        print("見つかりませんでした。", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,252 @@
+"""
+複数の DAT / CSV の統合と重複除去。
+
+  python generator.py merge jp.xml us.csv eu.xml -o merged.xml --dat-name 統合版 --system fc --extension nes
+
+romCRC が同じゲームは最初に現れたもの（指定した順で優先）だけを残し、
+同じ CRC でタイトルや romSize が異なるものは衝突として報告する。
+入力は 2 回読み、1 回目で残すゲームを決め、2 回目でそのまま書き出すため、
+メモリ使用量は入力の大きさではなく、romCRC の種類数に比例する。
+列は標準の列（CSV_FIELDNAMES）だけを扱う。
+"""
+import csv
+import os
+import sys
+from contextlib import ExitStack
+
+from generator import (
+    CSV_FIELDNAMES,
+    DAT_XML_FOOTER,
+    DAT_XML_HEADER,
+    DAT_SETTING_KEYS,
+    GameSerializer,
+    build_configuration_xml_string,
+    is_csv,
+    is_xml,
+    iter_game_rows,
+    load_config,
+    normalize_rom_key,
+    open_output,
+    resolve_dat_settings,
+    write_games_xml,
+)
+
+
+# -------------------------------
+# 重複の判定キー（入力は iter_game_rows で CSV_FIELDNAMES 順の list にそろえる）
+# -------------------------------
+COLUMN = {name: i for i, name in enumerate(CSV_FIELDNAMES)}
+
+
+def merge_key(row: list) -> str:
+    return row[COLUMN["romCRC"]].strip().upper()
+
+
+# -------------------------------
+# 1 回目: 残すゲームの決定と衝突の検出
+# -------------------------------
+class MergePlan:
+    """
+    winners[romCRC] = [入力番号, 入力内の通し番号, 正規化したタイトル, romSize]
+    （romCRC の種類数だけ保持する）。romCRC が空のゲームは重複の判定ができないため、すべて残す。
+    """
+
+    def __init__(self):
+        self.winners = {}
+        self.conflicts = []
+        self.games = 0
+        self.duplicates = 0
+        self.without_crc = 0
+        self.written = 0
+
+    def add(self, source: int, number: int, row: list, source_path: str):
+        self.games += 1
+        key = merge_key(row)
+        if not key:
+            self.without_crc += 1
+            return
+
+        title = normalize_rom_key(row[COLUMN["title"]])
+        size = row[COLUMN["romSize"]].strip()
+        winner = self.winners.get(key)
+        if winner is None:
+            self.winners[key] = [source, number, title, size]
+            return
+
+        self.duplicates += 1
+        differences = []
+        if winner[2] != title:
+            differences.append("title")
+        if winner[3] and size and winner[3] != size:
+            differences.append("romSize")
+        if differences:
+            self.conflicts.append({
+                "romCRC": key,
+                "fields": differences,
+                "kept_source": winner[0],
+                "kept_number": winner[1],
+                "source_path": source_path,
+                "number": number,
+                "title": row[COLUMN["title"]],
+                "romSize": size,
+            })
+
+    def keeps(self, source: int, number: int, row: list) -> bool:
+        key = merge_key(row)
+        if not key:
+            return True
+        winner = self.winners[key]
+        return winner[0] == source and winner[1] == number
+
+
+def plan_merge(paths: list) -> MergePlan:
+    plan = MergePlan()
+    for source, path in enumerate(paths):
+        for number, row in enumerate(iter_game_rows(path)):
+            plan.add(source, number, row, path)
+    return plan
+
+
+# -------------------------------
+# 2 回目: 残すゲームを番号を振り直して書き出す
+# -------------------------------
+def iter_merged_rows(paths: list, plan: MergePlan, renumber: bool = True, number_map=None):
+    """
+    残すゲームを入力順に返す。renumber=True なら releaseNumber / imageNumber を 1 から振り直す。
+    number_map（csv.writer）を渡すと、元の番号と新しい番号の対応を書き込む。
+    """
+    next_number = 0
+    for source, path in enumerate(paths):
+        for number, row in enumerate(iter_game_rows(path)):
+            if not plan.keeps(source, number, row):
+                continue
+            next_number += 1
+            if renumber:
+                old_image = row[COLUMN["imageNumber"]]
+                old_release = row[COLUMN["releaseNumber"]]
+                row[COLUMN["imageNumber"]] = row[COLUMN["releaseNumber"]] = str(next_number)
+                if number_map is not None:
+                    number_map.writerow([path, old_image, old_release, next_number])
+            yield row
+
+
+def write_merged_xml(output_path: str, rows, settings: dict, config: dict) -> int:
+    extension = settings["extension"].strip().lstrip(".")
+    extension_with_dot = "." + extension if extension else ""
+    configuration_xml = build_configuration_xml_string(
+        config=config,
+        dat_name=settings["datName"],
+        im_folder=settings["imFolder"],
+        system=settings["system"],
+        ss_width=settings["screenshotsWidth"],
+        ss_height=settings["screenshotsHeight"],
+        extension_with_dot=extension_with_dot,
+        dat_code=settings["datCode"],
+    )
+    serialize = GameSerializer(CSV_FIELDNAMES, extension_with_dot).serialize
+    games = (serialize(row, number) for number, row in enumerate(rows, 1))
+
+    with open_output(output_path, "wb") as f:
+        f.write(DAT_XML_HEADER.encode("utf-8"))
+        f.write(configuration_xml.encode("utf-8"))
+        count = write_games_xml(f, games)
+        f.write(DAT_XML_FOOTER.encode("utf-8"))
+    return count
+
+
+def write_merged_csv(output_path: str, rows) -> int:
+    count = 0
+    with open_output(output_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDNAMES)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def merge_dats(paths: list, output_path: str, settings: dict = None, config: dict = None,
+               renumber: bool = True, number_map_path: str = None) -> MergePlan:
+    """
+    paths（XML / CSV）を統合して output_path（.xml なら DAT、.csv なら CSV）に書き出す。
+    DAT に書き出す場合は settings（resolve_dat_settings の結果）と config が必要。
+    """
+    output = os.path.abspath(output_path)
+    if any(os.path.abspath(path) == output for path in paths):
+        raise ValueError(f"入力ファイルと同じファイルには書き出せません: {output_path}")
+
+    plan = plan_merge(paths)
+
+    with ExitStack() as stack:
+        number_map = None
+        if number_map_path:
+            map_file = stack.enter_context(open_output(number_map_path, "w", encoding="utf-8-sig", newline=""))
+            number_map = csv.writer(map_file)
+            number_map.writerow(["source", "imageNumber", "releaseNumber", "newNumber"])
+        rows = iter_merged_rows(paths, plan, renumber, number_map)
+        if is_csv(output_path):
+            plan.written = write_merged_csv(output_path, rows)
+        else:
+            plan.written = write_merged_xml(output_path, rows, settings, config)
+    return plan
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv: list) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py merge",
+        description="複数の DAT / CSV を統合し、romCRC が同じゲームを 1 件にまとめます（先に指定したものを優先）。",
+    )
+    parser.add_argument("inputs", nargs="+", help="統合する DAT（XML）/ CSV（優先する順に指定）")
+    parser.add_argument("-o", "--output", required=True, help="出力先（.xml なら DAT、.csv なら CSV）")
+    parser.add_argument("--keep-numbers", action="store_true",
+                        help="releaseNumber / imageNumber を振り直さず、元の値のままにする")
+    parser.add_argument("--number-map", help="元の番号と新しい番号の対応を書き出す CSV（画像の名前の変更用）")
+    parser.add_argument("--conflicts", help="衝突（同じ romCRC でタイトル・romSize が異なる）の一覧を書き出す CSV")
+    parser.add_argument("--dat-name", dest="datName")
+    parser.add_argument("--system")
+    parser.add_argument("--im-folder", dest="imFolder")
+    parser.add_argument("--screenshots-width", dest="screenshotsWidth")
+    parser.add_argument("--screenshots-height", dest="screenshotsHeight")
+    parser.add_argument("--extension", help="ROM ファイルの拡張子（例: nes）")
+    parser.add_argument("--dat-code", dest="datCode")
+    args = parser.parse_args(argv)
+
+    try:
+        for path in args.inputs:
+            if not os.path.isfile(path) or not (is_csv(path) or is_xml(path)):
+                raise ValueError(f"CSV / XML ファイルではありません: {path}")
+        settings = config = None
+        if not is_csv(args.output):
+            settings = resolve_dat_settings(args.output, {key: getattr(args, key) for key in DAT_SETTING_KEYS},
+                                            {}, {})
+            config = load_config()
+        plan = merge_dats(args.inputs, args.output, settings, config,
+                          renumber=not args.keep_numbers, number_map_path=args.number_map)
+    except (ValueError, OSError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    print(f"入力: {len(args.inputs)} ファイル  {plan.games:,} 件（romCRC なし {plan.without_crc:,} 件）")
+    print(f"出力: {args.output}  {plan.written:,} 件（重複を {plan.duplicates:,} 件除外）")
+
+    for conflict in plan.conflicts:
+        kept = args.inputs[conflict["kept_source"]]
+        print(f"  [衝突] {conflict['romCRC']} ({'/'.join(conflict['fields'])}): "
+              f"{os.path.basename(conflict['source_path'])} の {conflict['number'] + 1} 件目「{conflict['title']}」"
+              f"は {os.path.basename(kept)} の {conflict['kept_number'] + 1} 件目を優先して除外")
+
+    if args.conflicts:
+        with open_output(args.conflicts, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["romCRC", "fields", "kept_source", "kept_number", "source", "number", "title", "romSize"])
+            for conflict in plan.conflicts:
+                writer.writerow([conflict["romCRC"], "/".join(conflict["fields"]),
+                                 args.inputs[conflict["kept_source"]], conflict["kept_number"] + 1,
+                                 conflict["source_path"], conflict["number"] + 1,
+                                 conflict["title"], conflict["romSize"]])
+    return 0
@@ -1,14 +1,17 @@
+# 変換処理だけを使う場合（CLI / 他モジュールからの import）に起動が重くならないよう、
+# tkinter・argparse・concurrent.futures などは使う処理の中で import する。
+import codecs
 import csv
 import json
 import os
+import re
+import shutil
 import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-import xml.etree.ElementTree as ET  # CSV→XML の生成に使用
-from xml.dom import minidom
-import tkinter as tk
-from tkinter import filedialog, messagebox
-
-from bs4 import BeautifulSoup  # XML→CSV 用（寛容パーサー）
+import xml.etree.ElementTree as ET  # XML→CSV の解析に使用
 
 
 # -------------------------------
@@ -28,25 +31,279 @@ def resource_path(relative_path: str) -> str:
 def load_config():
     config_path = resource_path("config.json")
     if not os.path.exists(config_path):
-        messagebox.showerror("エラー", f"config.json が見つかりません。\n場所: {config_path}")
-        raise FileNotFoundError("config.json not found")
+        raise FileNotFoundError(f"config.json が見つかりません。\n場所: {config_path}")
 
     with open(config_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
 # -------------------------------
-# XML 整形ヘルパー（CSV→XML用）
+# 出力ファイルの一時書き込み（失敗時に中途半端なファイルを残さない）
+# -------------------------------
+@contextmanager
+def open_output(path: str, mode: str = "w", **kwargs):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    f = open(tmp_path, mode, **kwargs)
+    try:
+        with f:
+            yield f
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(tmp_path, path)
+
+
+# -------------------------------
+# ステージ別の計測（OFFLINELIST_PROFILE を設定したときだけ有効）
 # -------------------------------
-def prettify_element(elem: ET.Element) -> str:
-    rough_string = ET.tostring(elem, encoding="unicode")
-    reparsed = minidom.parseString(rough_string)
-    pretty = reparsed.toprettyxml(indent="  ")
-    lines = pretty.splitlines()
-    lines = [line for line in lines if line.strip()]
-    if lines and lines[0].startswith("<?xml"):
-        lines = lines[1:]
-    return "\n".join(lines)
+PROFILE_ENV = "OFFLINELIST_PROFILE"              # "time" / "1" → 時間、"memory" → 時間 + 割り当てピーク
+PROFILE_STAGE_ENV = "OFFLINELIST_PROFILE_STAGE"  # 例: "parse" → そのステージだけ cProfile で計測
+PROFILE_MODES = ("time", "memory")
+
+
+class StageProfile:
+    """
+    変換処理のステージ（read / decode / parse / extract / build / write など）ごとに
+    経過時間・呼び出し回数・割り当てピーク（trace_memory=True のとき）を積算する。
+
+    hooks に {ステージ名: enable() / disable() を持つオブジェクト} を渡すと、
+    そのステージの処理中だけ有効にする（cProfile.Profile をそのまま渡せる）。
+    計測しないときは None を渡し、各処理は元の関数をそのまま呼ぶ。
+    """
+
+    def __init__(self, trace_memory: bool = False, hooks: dict = None):
+        self.trace_memory = trace_memory
+        self.hooks = dict(hooks or {})
+        self.stages = {}
+        self.peak_bytes = 0
+        self.started = time.perf_counter()
+        self.owns_tracemalloc = False
+
+    @classmethod
+    def from_settings(cls, mode: str = None, stage: str = None):
+        mode = (mode or "").strip().lower()
+        if mode in ("", "0", "off", "false"):
+            return None
+        if mode == "1":
+            mode = "time"
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"計測モードが不正です: {mode}（{' / '.join(PROFILE_MODES)}）")
+
+        hooks = {}
+        if stage:
+            import cProfile
+
+            hooks[stage.strip()] = cProfile.Profile()
+        return cls(trace_memory=mode == "memory", hooks=hooks)
+
+    @classmethod
+    def from_env(cls):
+        return cls.from_settings(os.environ.get(PROFILE_ENV), os.environ.get(PROFILE_STAGE_ENV))
+
+    def begin(self):
+        if self.trace_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.owns_tracemalloc = True
+        self.started = time.perf_counter()
+
+    def wrap(self, name: str, func):
+        """func を呼ぶたびに name のステージとして計測する関数を返す。"""
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_bytes": 0})
+        hook = self.hooks.get(name)
+        clock = time.perf_counter
+        if self.trace_memory:
+            import tracemalloc
+
+            get_traced_memory = tracemalloc.get_traced_memory
+            reset_peak = tracemalloc.reset_peak
+
+        def timed(*args, **kwargs):
+            if hook is not None:
+                hook.enable()
+            if self.trace_memory:
+                reset_peak()
+                base = get_traced_memory()[0]
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry["seconds"] += clock() - start
+                entry["calls"] += 1
+                if self.trace_memory:
+                    peak = get_traced_memory()[1]
+                    entry["peak_bytes"] = max(entry["peak_bytes"], peak - base)
+                    self.peak_bytes = max(self.peak_bytes, peak)
+                if hook is not None:
+                    hook.disable()
+
+        return timed
+
+    def iterate(self, name: str, iterable):
+        """iterable から 1 件取り出すたびに name のステージとして計測する。"""
+        step = self.wrap(name, iter(iterable).__next__)
+        while True:
+            try:
+                item = step()
+            except StopIteration:
+                return
+            yield item
+
+    def report(self, rows: int) -> dict:
+        seconds = time.perf_counter() - self.started
+        staged = sum(entry["seconds"] for entry in self.stages.values())
+        stages = {}
+        for name, entry in self.stages.items():
+            stages[name] = {
+                "seconds": round(entry["seconds"], 6),
+                "calls": entry["calls"],
+                "share": round(entry["seconds"] / seconds, 4) if seconds > 0 else 0.0,
+            }
+            if self.trace_memory:
+                stages[name]["peak_kb"] = round(entry["peak_bytes"] / 1024, 1)
+        report = {
+            "rows": rows,
+            "seconds": round(seconds, 6),
+            "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+            "other_seconds": round(max(seconds - staged, 0.0), 6),
+            "stages": stages,
+        }
+        if self.trace_memory:
+            report["peak_kb"] = round(self.peak_bytes / 1024, 1)
+        return report
+
+    def finish(self, output_path: str, rows: int, **extra) -> str:
+        """
+        {出力ファイル}.profile.json に結果を書き出し、そのパスを返す。
+        hooks のうち dump_stats() を持つもの（cProfile）は {出力ファイル}.{ステージ名}.prof に保存する。
+        """
+        report = dict(self.report(rows), output=output_path, **extra)
+        if self.owns_tracemalloc:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self.owns_tracemalloc = False
+
+        profile_path = output_path + ".profile.json"
+        with open_output(profile_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        for name, hook in self.hooks.items():
+            if hasattr(hook, "dump_stats"):
+                hook.dump_stats(f"{output_path}.{name}.prof")
+        return profile_path
+
+
+# -------------------------------
+# 進捗通知とキャンセル（GUI のワーカースレッドから使う）
+# -------------------------------
+PROGRESS_INTERVAL_ROWS = 500
+
+
+class ConversionCancelled(Exception):
+    """progress コールバックから送出すると変換を中止する（出力ファイルは作られない）。"""
+
+
+def track_progress(items, progress, bytes_read, total_bytes: int):
+    """
+    items を順に返しながら、PROGRESS_INTERVAL_ROWS 件ごとと最後に
+    progress(件数, 読み込み済みバイト数, 全体のバイト数) を呼ぶ。
+    """
+    count = 0
+    for item in items:
+        yield item
+        count += 1
+        if count % PROGRESS_INTERVAL_ROWS == 0:
+            progress(count, bytes_read(), total_bytes)
+    progress(count, total_bytes, total_bytes)
+
+
+# -------------------------------
+# XML 書き出しヘルパー（CSV→XML用）
+# -------------------------------
+XML_INDENT = "  "
+XML_WRITE_BUFFER_SIZE = 1024 * 1024
+DAT_ZIP_COMPRESS_LEVEL = 6
+
+# 改行扱いになる文字と、XML に書けない制御文字
+XML_SPECIAL_CHARS = re.compile("[\x00-\x08\x0a-\x1f\x85\u2028\u2029]")
+XML_INVALID_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+XML_ESCAPE_CHARS = re.compile('[&<>"]')
+
+
+def escape_xml_attr(text: str) -> str:
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if "\"" in text:
+        text = text.replace("\"", "&quot;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_xml_text(text: str) -> str:
+    # XML パーサーと同様に、テキスト中の CR / CRLF は LF に正規化する
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return escape_xml_attr(text)
+
+
+def finish_game_block(lines: list, line_number: int) -> str:
+    block = "\n".join(lines)
+    if XML_SPECIAL_CHARS.search(block) is None:
+        return block
+
+    if XML_INVALID_CHARS.search(block) is not None:
+        raise ValueError(f"XML に使用できない制御文字が含まれています（{line_number} 行目）。")
+
+    # 値の中の改行で生じた空行は、従来の整形出力と同じく取り除く
+    return "\n".join(line for line in block.splitlines() if line.strip())
+
+
+class TeeWriter:
+    """
+    出力 XML と zip のエントリへ同じバイト列を書き込む。
+    zip 側は圧縮の呼び出し回数を減らすため、ある程度まとめてから書き込む。
+    """
+
+    def __init__(self, primary, secondary, buffer_size: int = XML_WRITE_BUFFER_SIZE):
+        self.primary = primary
+        self.secondary = secondary
+        self.buffer_size = buffer_size
+        self.pending = []
+        self.pending_size = 0
+
+    def write(self, data: bytes):
+        self.primary.write(data)
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.secondary.write(b"".join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def tell(self) -> int:
+        return self.primary.tell()
+
+
+@contextmanager
+def open_zip_entry(fileobj, name: str, compress_level: int = DAT_ZIP_COMPRESS_LEVEL):
+    # 書き込み先のファイルへ直接圧縮しながら書き込む（一時コピーは作らない）
+    import zipfile
+
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=compress_level) as zf:
+        with zf.open(name, "w") as entry:
+            yield entry
 
 
 # -------------------------------
@@ -60,38 +317,295 @@ def is_xml(path: str) -> bool:
     return path.lower().endswith(".xml")
 
 
+# -------------------------------
+# CSV の列定義（XML → CSV / CSV → XML 共通）
+# -------------------------------
+CSV_FIELDNAMES = [
+    "imageNumber",
+    "releaseNumber",
+    "title",
+    "im1CRC",
+    "im2CRC",
+    "publisher",
+    "sourceRom",
+    "location",
+    "comment",
+    "language",
+    "saveType",
+    "romSize",
+    "romCRC",
+    "extension",
+]
+
+# <files> 内の 2 件目以降の <romCRC> は romCRC2 / extension2 ... の列に対応させる
+ROM_COLUMN_PATTERN = re.compile(r"^(romCRC|extension)([2-9]|[1-9][0-9]+)?$")
+
+
+def rom_column_names(index: int) -> tuple:
+    suffix = str(index + 1) if index else ""
+    return "romCRC" + suffix, "extension" + suffix
+
+
+# -------------------------------
+# タイトル・ファイル名の照合キー（ROM の走査・DAT の索引・結合で共通）
+# -------------------------------
+def normalize_rom_key(text: str) -> str:
+    # 全角・半角や大文字・小文字、連続する空白の違いを無視して照合する
+    import unicodedata
+
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split())
+
+
 # -------------------------------
 # games 部分生成（CSV → XML）
 # -------------------------------
-def build_games_from_csv(csv_path: str, extension_with_dot: str) -> ET.Element:
-    games_root = ET.Element("games")
+def plan_csv_columns(header: list) -> list:
+    """
+    CSV のヘッダーから、列ごとの出力方法を一度だけ決める。
+      ("text", 列番号, タグ名)            … 通常のタグ
+      ("files", [(CRC 列, 拡張子列), ...]) … <files> と、その中の <romCRC>（romCRC 列の位置に出力）
+    extension 列と 2 件目以降の romCRC 列は <files> 側で処理する。
+    """
+    rom_crc = {}
+    rom_ext = {}
+    for i, key in enumerate(header):
+        match = ROM_COLUMN_PATTERN.match(key)
+        if match:
+            number = int(match.group(2) or 1)
+            (rom_crc if match.group(1) == "romCRC" else rom_ext).setdefault(number, i)
+
+    files_index = min(rom_crc.values()) if rom_crc else None
+    plan = []
+    for i, key in enumerate(header):
+        if i == files_index:
+            pairs = [(rom_crc[number], rom_ext.get(number)) for number in sorted(rom_crc)]
+            plan.append(("files", pairs))
+        elif not ROM_COLUMN_PATTERN.match(key):
+            plan.append(("text", i, key))
+    return plan
+
+
+def build_game_lines(row: list, plan: list, extension_with_dot: str) -> list:
+    # 子要素がない（extension の列だけの）場合は、従来の整形出力と同じく空要素にする
+    if not plan:
+        return [XML_INDENT + "<game/>"]
+
+    indent = XML_INDENT * 2
+    files_indent = XML_INDENT * 3
+    lines = [XML_INDENT + "<game>"]
+
+    for step in plan:
+        if step[0] == "text":
+            value = row[step[1]]
+            text = " " if not value else value
+            lines.append(f"{indent}<{step[2]}>{escape_xml_text(text)}</{step[2]}>")
+            continue
+
+        lines.append(indent + "<files>")
+        for n, (crc_index, ext_index) in enumerate(step[1]):
+            value = row[crc_index]
+            extension = (extension_with_dot or "") if ext_index is None else row[ext_index]
+            # 2 件目以降は CRC も拡張子も空なら出力しない
+            if n and not value and not extension:
+                continue
+            extension = escape_xml_attr(extension)
+            if value:
+                lines.append(f'{files_indent}<romCRC extension="{extension}">'
+                             f"{escape_xml_text(value)}</romCRC>")
+            else:
+                lines.append(f'{files_indent}<romCRC extension="{extension}"/>')
+        lines.append(indent + "</files>")
 
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    lines.append(XML_INDENT + "</game>")
+    return lines
 
-        for row in reader:
-            game = ET.SubElement(games_root, "game")
-
-            for key, value in row.items():
-                if key == "romCRC":
-                    files = ET.SubElement(game, "files")
-                    crc = ET.SubElement(files, "romCRC")
-                    crc.text = value
-                    crc.set("extension", row.get("extension", extension_with_dot or ""))
-                    continue
 
-                if key == "extension":
-                    continue
+def escape_format_literal(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
 
-                elem = ET.SubElement(game, key)
-                elem.text = " " if not value else str(value)
+class GameSerializer:
+    """
+    CSV のヘッダーから <game> ブロック全体のテンプレート（インデントと開始・終了タグを含む）を
+    一度だけ作り、1 行を 1 回の str.format で文字列にする。
+    特殊文字の有無は行全体で 1 回だけ調べ、エスケープが必要な行だけ値ごとにエスケープする。
+    改行や制御文字を含む行は build_game_lines / finish_game_block（基準の実装）で生成する。
+    どちらの出力も同じになる。
+    """
 
-    return games_root
+    def __init__(self, header: list, extension_with_dot: str):
+        self.plan = plan_csv_columns(header)
+        self.extension_with_dot = extension_with_dot or ""
+        self.rom_pairs = None
+        self.template = None
+
+        # タグ名や拡張子の既定値に特殊文字を含む場合は、すべての行を基準の実装で生成する
+        literal = "\t".join(header) + self.extension_with_dot
+        if XML_SPECIAL_CHARS.search(literal) is not None or XML_ESCAPE_CHARS.search(literal) is not None:
+            return
+
+        if not self.plan:
+            self.template = XML_INDENT + "<game/>"
+            return
+
+        indent = XML_INDENT * 2
+        lines = [XML_INDENT + "<game>"]
+        for step in self.plan:
+            if step[0] == "text":
+                tag = escape_format_literal(step[2])
+                lines.append(f"{indent}<{tag}>{{{step[1]}}}</{tag}>")
+            else:
+                self.rom_pairs = step[1]
+                lines.append(indent + "<files>\n{files}\n" + indent + "</files>")
+        lines.append(XML_INDENT + "</game>")
+        self.template = "\n".join(lines)
+
+    def build_files(self, row: list) -> str:
+        files_indent = XML_INDENT * 3
+        lines = []
+        for n, (crc_index, ext_index) in enumerate(self.rom_pairs):
+            value = row[crc_index]
+            extension = self.extension_with_dot if ext_index is None else row[ext_index]
+            if n and not value and not extension:
+                continue
+            if value:
+                lines.append(f'{files_indent}<romCRC extension="{extension}">{value}</romCRC>')
+            else:
+                lines.append(f'{files_indent}<romCRC extension="{extension}"/>')
+        return "\n".join(lines)
+
+    def serialize(self, row: list, line_number: int) -> str:
+        joined = "\t".join(row)
+        if self.template is None or XML_SPECIAL_CHARS.search(joined) is not None:
+            return finish_game_block(build_game_lines(row, self.plan, self.extension_with_dot), line_number)
+        if XML_ESCAPE_CHARS.search(joined) is not None:
+            row = [escape_xml_attr(value) for value in row]
+
+        values = [value or " " for value in row]
+        if self.rom_pairs is None:
+            return self.template.format(*values)
+        return self.template.format(*values, files=self.build_files(row))
+
+
+def build_games_from_csv(csv_path: str, extension_with_dot: str, state=None, profile: StageProfile = None,
+                         progress=None, validator=None):
+    """
+    CSV を 1 行ずつ読み、インデント済みの <game> ブロック文字列を順に返す。
+    state（DatState）を渡すと、前回から変わっていない行は前回の出力のバイト列をそのまま返す。
+    progress を渡すと track_progress の形式で進捗を通知する。
+    validator（validator.GameValidator）を渡すと、読み込んだ行を同じ走査の中で検証する。
+    """
+    reuse = state.reuse if state is not None else None
+    check = validator.check if validator is not None else None
+    if profile is not None:
+        if reuse is not None:
+            reuse = profile.wrap("reuse", reuse)
+        if check is not None:
+            check = profile.wrap("validate", check)
+
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        serialize = GameSerializer(header, extension_with_dot).serialize
+        if profile is not None:
+            serialize = profile.wrap("build", serialize)
+        width = len(header)
+        if state is not None:
+            state.set_header(header)
+        if validator is not None:
+            validator.set_header(header)
+
+        rows = reader if profile is None else profile.iterate("read", reader)
+
+        def blocks():
+            line = reader.line_num + 1
+            for row in rows:
+                if not row:
+                    line = reader.line_num + 1
+                    continue
+                if check is not None:
+                    check(row, line)
+                    line = reader.line_num + 1
+                    # エラーがあれば出力は確定しないため、残りの行は検証だけを行う
+                    if validator.errors:
+                        continue
+                if len(row) < width:
+                    row += [""] * (width - len(row))
+
+                if reuse is not None:
+                    block = reuse(row)
+                    if block is not None:
+                        yield block
+                        continue
+
+                yield serialize(row, reader.line_num)
+
+        if progress is None:
+            yield from blocks()
+        else:
+            yield from track_progress(blocks(), progress, f.buffer.tell, os.fstat(f.fileno()).st_size)
+
+
+def write_games_xml(f, games, spans: list = None, profile: StageProfile = None,
+                    encoding: str = "utf-8") -> int:
+    """
+    <game> ブロックをバイナリファイルへ書き出す（str は encoding に変換し、
+    変換できない文字は数値文字参照にする）。書き込みは XML_WRITE_BUFFER_SIZE ごとにまとめて行う。
+    spans を渡すと、各ブロックの (開始位置, バイト長) を追加する。
+    """
+    count = 0
+    position = f.tell() if spans is not None else 0
+    write = f.write if profile is None else profile.wrap("write", f.write)
+    pending = []
+    pending_size = 0
+    for block in games:
+        if isinstance(block, str):
+            block = block.encode(encoding, "xmlcharrefreplace")
+        prefix = b"\n<games>\n" if not count else b"\n"
+        pending.append(prefix)
+        pending.append(block)
+        pending_size += len(prefix) + len(block)
+        if spans is not None:
+            position += len(prefix)
+            spans.append((position, len(block)))
+            position += len(block)
+        count += 1
+        if pending_size >= XML_WRITE_BUFFER_SIZE:
+            write(b"".join(pending))
+            pending = []
+            pending_size = 0
+
+    pending.append(b"\n</games>" if count else b"\n<games/>")
+    write(b"".join(pending))
+    return count
 
 
 # -------------------------------
 # configuration テンプレート（共通）
 # -------------------------------
+# 出力できる文字コードと、XML 宣言に書く名前（古い OfflineList 向けに Shift_JIS でも出力できる）
+DAT_OUTPUT_ENCODINGS = {
+    "utf-8": "UTF-8",
+    "cp932": "Shift_JIS",
+}
+DAT_XML_HEADER_TEMPLATE = '<?xml version="1.0" encoding="{encoding}" standalone="no"?>\n' \
+                          '<dat xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" ' \
+                          'xsi:noNamespaceSchemaLocation="datas.xsd">\n'
+DAT_XML_HEADER = DAT_XML_HEADER_TEMPLATE.format(encoding="UTF-8")
+DAT_XML_FOOTER = "\n</dat>\n"
+
+
+def resolve_output_encoding(name: str) -> str:
+    """出力の文字コード名（shift_jis などの別名も可）を DAT_OUTPUT_ENCODINGS のキーにそろえる。"""
+    encoding = normalize_encoding_name(name or "utf-8")
+    if encoding not in DAT_OUTPUT_ENCODINGS:
+        raise ValueError(f"出力できない文字コードです: {name}（utf-8 / cp932 のいずれか）")
+    return encoding
+
 CONFIGURATION_TEMPLATE = """  <configuration>
     <datName>{datName}</datName>
     <imFolder>{imFolder}</imFolder>
@@ -138,9 +652,11 @@ def build_configuration_xml_string(config: dict,
                                    ss_width: str,
                                    ss_height: str,
                                    extension_with_dot: str,
-                                   dat_code: str) -> str:
+                                   dat_code: str,
+                                   dat_version: str = None) -> str:
     base_url = config.get("base_url", "")
-    dat_version = datetime.now().strftime("%Y%m%d")
+    if dat_version is None:
+        dat_version = today_dat_version()
 
     return CONFIGURATION_TEMPLATE.format(
         datName=dat_name,
@@ -157,13 +673,157 @@ def build_configuration_xml_string(config: dict,
 # -------------------------------
 # バージョンファイル生成
 # -------------------------------
-def create_version_file(output_dir: str, dat_code: str):
-    today = datetime.now().strftime("%Y%m%d")
+def today_dat_version() -> str:
+    return datetime.now().strftime("%Y%m%d")
+
+
+def next_dat_version(previous: str = None, today: str = None) -> str:
+    """
+    前回の datVersion（previous）より新しい datVersion を返す。通常は今日の日付（%Y%m%d）。
+    同じ日に内容が変わった場合は 2 桁の連番を付け（20240101 → 2024010101 → 2024010102）、
+    連番を付けた後は日付が変わっても同じ桁数にする（2024010200）。
+    数値として比べても文字列として比べても、前回の値より大きくなる。
+    """
+    if today is None:
+        today = today_dat_version()
+    if not previous or not previous.isdigit() or len(previous) < len(today):
+        return today
+    candidate = today.ljust(len(previous), "0")
+    if int(candidate) > int(previous):
+        return candidate
+    if len(previous) == len(today):
+        return previous + "01"
+    return str(int(previous) + 1)
+
+
+def read_version_file(version_path: str):
+    try:
+        with open(version_path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def create_version_file(output_dir: str, dat_code: str, dat_version: str = None):
+    if dat_version is None:
+        dat_version = today_dat_version()
     version_path = os.path.join(output_dir, f"{dat_code}.txt")
     with open(version_path, "w", encoding="utf-8") as f:
-        f.write(today)
+        f.write(dat_version)
     return version_path
 
+
+# -------------------------------
+# 増分生成（行ごとのハッシュを記録し、変わっていない <game> は前回の出力から流用する）
+# -------------------------------
+DAT_STATE_VERSION = 1
+
+
+class OutputUnchanged(Exception):
+    """増分生成で内容が前回と同じだったため、出力ファイルを置き換えないことを示す。"""
+
+
+def dat_state_path(output_path: str) -> str:
+    return output_path + ".state.json"
+
+
+class DatState:
+    """
+    前回の生成結果（configuration のハッシュ、行ごとのハッシュと出力位置、datVersion）。
+    出力 XML のサイズ・更新日時が記録と異なる場合（手で編集・削除された場合）は使わない。
+    """
+
+    def __init__(self, output_path: str, config_hash: str, required_paths: list = ()):
+        self.output_path = output_path
+        self.config_hash = config_hash
+        self.previous = None
+        self.previous_blocks = {}
+        self.old_file = None
+        self.row_hash_base = None
+        self.hashes = []
+        self.reused = 0
+
+        try:
+            with open(dat_state_path(output_path), "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            st = os.stat(output_path)
+        except (OSError, ValueError):
+            return
+        # 一緒に生成するファイル（zip など）が消えている場合も作り直す
+        if not all(os.path.exists(path) for path in required_paths):
+            return
+        if (previous.get("version") != DAT_STATE_VERSION
+                or previous.get("output_size") != st.st_size
+                or previous.get("output_mtime_ns") != st.st_mtime_ns):
+            return
+
+        self.previous = previous
+        if previous["config_hash"] == config_hash:
+            # configuration が変わっていれば <game> の並びも作り直す
+            for row_hash, offset, length in previous["games"]:
+                self.previous_blocks.setdefault(row_hash, (offset, length))
+
+    def set_header(self, header: list):
+        import hashlib
+
+        self.row_hash_base = hashlib.blake2b(digest_size=16)
+        self.row_hash_base.update(self.config_hash.encode("ascii"))
+        self.row_hash_base.update("\x1f".join(header).encode("utf-8") + b"\x1e")
+
+    def reuse(self, row: list):
+        h = self.row_hash_base.copy()
+        h.update("\x1f".join(row).encode("utf-8"))
+        row_hash = h.hexdigest()
+        self.hashes.append(row_hash)
+
+        span = self.previous_blocks.get(row_hash)
+        if span is None:
+            return None
+        if self.old_file is None:
+            self.old_file = open(self.output_path, "rb")
+        self.old_file.seek(span[0])
+        self.reused += 1
+        return self.old_file.read(span[1])
+
+    @property
+    def changed(self) -> bool:
+        if self.previous is None or self.previous["config_hash"] != self.config_hash:
+            return True
+        return [game[0] for game in self.previous["games"]] != self.hashes
+
+    @property
+    def previous_dat_version(self):
+        return self.previous.get("dat_version") if self.previous else None
+
+    def close(self):
+        if self.old_file is not None:
+            self.old_file.close()
+            self.old_file = None
+
+    def save(self, spans: list, dat_version: str):
+        st = os.stat(self.output_path)
+        state = {
+            "version": DAT_STATE_VERSION,
+            "config_hash": self.config_hash,
+            "dat_version": dat_version,
+            "output_size": st.st_size,
+            "output_mtime_ns": st.st_mtime_ns,
+            "games": [[row_hash, offset, length] for row_hash, (offset, length) in zip(self.hashes, spans)],
+        }
+        with open_output(dat_state_path(self.output_path), "w", encoding="utf-8") as f:
+            json.dump(state, f, separators=(",", ":"))
+
+
+def hash_dat_configuration(*parts: str) -> str:
+    import hashlib
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(DAT_STATE_VERSION).encode("ascii"))
+    for part in parts:
+        h.update(part.encode("utf-8") + b"\x1e")
+    return h.hexdigest()
+
+
 # -------------------------------
 # CSV → XML 全体生成
 # -------------------------------
@@ -174,15 +834,66 @@ def generate_xml_from_csv(csv_path: str,
                           ss_width: str,
                           ss_height: str,
                           extension_suffix: str,
-                          dat_code: str) -> str:
+                          dat_code: str,
+                          config: dict = None,
+                          stats: dict = None,
+                          incremental: bool = None,
+                          zip_output: bool = None,
+                          compress_level: int = None,
+                          profile: StageProfile = None,
+                          progress=None,
+                          output_encoding: str = None,
+                          validate: bool = None) -> str:
+    """
+    CSV と同じフォルダに XML と {datCode}.txt を生成する。
+    output_encoding（省略時は config.json の "output_encoding"、なければ utf-8）に cp932 を指定すると
+    Shift_JIS の DAT を出力する（Shift_JIS にない文字は数値文字参照になる）。
+    validate=True（省略時は config.json の "validate"）のときは、書き出しと同じ走査で CSV を検証し、
+    エラーがあれば出力を確定する前に validator.ValidationFailed（ValueError）を送出する。
+    zip_output=True（省略時は config.json の "zip_output"）のときは、
+    XML を書きながら同じ内容を {datCode}.zip にも圧縮して書き込み、
+    {datCode}.txt と {datCode}.zip の ETag を配信用に記録する（servemanifest.record_served_files）。
+
+    incremental=True（省略時は config.json の "incremental"）のときは増分生成する。
+    内容が前回と同じなら出力を書き換えず、datVersion も前回の値のままにする。
+    内容が変わった場合は、前回の datVersion が今日の日付でも next_dat_version で新しい値にする。
+    生成した datVersion と変更の有無は stats の "dat_version" / "changed" に入る。
+
+    profile（省略時は環境変数 OFFLINELIST_PROFILE）を指定すると、ステージ別の計測結果を
+    {出力 XML}.profile.json に書き出し、そのパスを stats の "profile_path" に入れる。
+
+    progress(件数, 読み込み済みバイト数, CSV のバイト数) は変換中に定期的に呼ばれる。
+    ここから ConversionCancelled を送出すると、出力ファイルを作らずに中止する。
+    """
     if not csv_path:
         raise ValueError("CSV ファイルが指定されていません。")
+    if profile is None:
+        profile = StageProfile.from_env()
+    if profile is not None:
+        profile.begin()
 
     extension_with_dot = "." + extension_suffix.strip().lstrip(".") if extension_suffix.strip() else ""
 
-    config = load_config()
-
-    configuration_xml = build_configuration_xml_string(
+    if config is None:
+        config = load_config()
+    if incremental is None:
+        incremental = bool(config.get("incremental", False))
+    if zip_output is None:
+        zip_output = bool(config.get("zip_output", False))
+    if compress_level is None:
+        compress_level = int(config.get("zip_compress_level", DAT_ZIP_COMPRESS_LEVEL))
+    if output_encoding is None:
+        output_encoding = config.get("output_encoding", "utf-8")
+    output_encoding = resolve_output_encoding(output_encoding)
+    if validate is None:
+        validate = bool(config.get("validate", False))
+    validator = None
+    if validate:
+        from validator import GameValidator
+
+        validator = GameValidator(extension_with_dot)
+
+    configuration_args = dict(
         config=config,
         dat_name=dat_name,
         im_folder=im_folder,
@@ -192,393 +903,1353 @@ def generate_xml_from_csv(csv_path: str,
         extension_with_dot=extension_with_dot,
         dat_code=dat_code,
     )
-
-    games_elem = build_games_from_csv(csv_path, extension_with_dot)
-    games_xml = prettify_element(games_elem)
-
-    header = '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n' \
-             '<dat xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" ' \
-             'xsi:noNamespaceSchemaLocation="datas.xsd">\n'
-    footer = "\n</dat>\n"
-
-    full_xml = header + configuration_xml + "\n" + games_xml + footer
+    header = DAT_XML_HEADER_TEMPLATE.format(encoding=DAT_OUTPUT_ENCODINGS[output_encoding])
+    footer = DAT_XML_FOOTER
 
     # 出力ファイル名は CSV 名ベース
     csv_dir = os.path.dirname(csv_path)
     base_name = os.path.splitext(os.path.basename(csv_path))[0]
     output_name = base_name + ".xml"
     output_path = os.path.join(csv_dir, output_name)
+    zip_path = os.path.join(csv_dir, f"{dat_code}.zip") if zip_output else None
+    version_path = os.path.join(csv_dir, f"{dat_code}.txt")
+
+    state = None
+    spans = None
+    if incremental:
+        # datVersion 以外の configuration が同じかどうかをハッシュで比べる
+        config_hash = hash_dat_configuration(
+            header, build_configuration_xml_string(dat_version="", **configuration_args), footer)
+        state = DatState(output_path, config_hash, [zip_path] if zip_path else [])
+        spans = []
+
+    dat_version = today_dat_version()
+    if state is not None:
+        # 同じ日に内容が変わった場合も、前回公開した datVersion より新しい値にする
+        dat_version = next_dat_version(state.previous_dat_version or read_version_file(version_path), dat_version)
+    configuration_xml = build_configuration_xml_string(dat_version=dat_version, **configuration_args)
 
-    with open(output_path, "w", encoding="utf-8", newline="\n") as f:
-        f.write(full_xml)
-
+    try:
+        with ExitStack() as stack:
+            f = stack.enter_context(open_output(output_path, "wb", buffering=XML_WRITE_BUFFER_SIZE))
+            out = f
+            if zip_path:
+                zip_file = stack.enter_context(open_output(zip_path, "wb"))
+                entry = stack.enter_context(open_zip_entry(zip_file, output_name, compress_level))
+                out = TeeWriter(f, entry)
+
+            out.write(header.encode(output_encoding))
+            out.write(configuration_xml.encode(output_encoding, "xmlcharrefreplace"))
+            games = build_games_from_csv(csv_path, extension_with_dot, state, profile, progress, validator)
+            rows = write_games_xml(out, games, spans, profile, output_encoding)
+            out.write(footer.encode(output_encoding))
+            if validator is not None:
+                validator.raise_for_errors()
+            if zip_path:
+                out.flush()
+            if state is not None:
+                state.close()
+                if not state.changed:
+                    raise OutputUnchanged()
+    except OutputUnchanged:
+        dat_version = state.previous_dat_version
+    else:
+        if state is not None:
+            state.save(spans, dat_version)
+    finally:
+        if state is not None:
+            state.close()
+
+    changed = state is None or state.changed
+    if changed or not os.path.exists(version_path):
+        create_version_file(csv_dir, dat_code, dat_version)
+    if zip_path:
+        # serve コマンドで配信するファイルとして、書き終えた zip とバージョンファイルの ETag を記録する
+        from servemanifest import record_served_files
+
+        record_served_files(csv_dir or ".", [version_path, zip_path])
+
+    if stats is not None:
+        stats["rows"] = rows
+        stats["dat_version"] = dat_version
+        stats["changed"] = changed
+        stats["reused_rows"] = state.reused if state is not None else 0
+        stats["version_path"] = version_path
+        stats["zip_path"] = zip_path
+        stats["output_encoding"] = output_encoding
+        stats["validation_warnings"] = validator.warnings if validator is not None else 0
+    if profile is not None:
+        profile_path = profile.finish(output_path, rows, direction="csv2xml", changed=changed)
+        if stats is not None:
+            stats["profile_path"] = profile_path
     return output_path
 
 
 # -------------------------------
-# XML → CSV（Shift-JIS/UTF-8 自動判別）
+# 文字コード判定（BOM → XML 宣言 → 推定 の順。先頭数 KB だけを読む）
 # -------------------------------
-def read_xml_text_auto(xml_path: str) -> str:
-    with open(xml_path, "rb") as f:
-        data = f.read()
+ENCODING_SNIFF_SIZE = 4096
+ENCODING_SCAN_LIMIT = 1024 * 1024
+
+XML_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+XML_DECLARATION_ENCODING = re.compile(rb"""^\s*<\?xml[^>]*?\sencoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+NON_ASCII_BYTE = re.compile(rb"[\x80-\xff]")
+
+# Shift_JIS と宣言された DAT も Windows で作られたものは機種依存文字を含むため cp932 で読む
+ENCODING_ALIASES = {
+    "shift_jis": "cp932",
+    "shift-jis": "cp932",
+    "sjis": "cp932",
+    "x-sjis": "cp932",
+    "windows-31j": "cp932",
+}
+
+
+def normalize_encoding_name(name: str):
+    name = ENCODING_ALIASES.get(name.lower(), name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def decodes_strictly(data: bytes, encoding: str) -> bool:
+    # 末尾で途切れたマルチバイト文字はエラーにしない
     try:
-        return data.decode("cp932")
+        codecs.getincrementaldecoder(encoding)().decode(data, final=False)
     except UnicodeDecodeError:
-        return data.decode("utf-8", errors="replace")
+        return False
+    return True
+
+
+def read_encoding_sample(f, head: bytes) -> bytes:
+    """
+    判定用のサンプルとして、先頭に加えて最初の非 ASCII 文字の周辺を返す。
+    configuration 部分が ASCII だけの DAT でも、日本語を含む位置で判定できるようにする。
+    """
+    if NON_ASCII_BYTE.search(head):
+        return head
+
+    scanned = len(head)
+    while scanned < ENCODING_SCAN_LIMIT:
+        data = f.read(64 * 1024)
+        if not data:
+            break
+        match = NON_ASCII_BYTE.search(data)
+        if match:
+            start = match.start()
+            sample = data[start:start + ENCODING_SNIFF_SIZE]
+            if len(sample) < ENCODING_SNIFF_SIZE:
+                sample += f.read(ENCODING_SNIFF_SIZE - len(sample))
+            return head + sample
+        scanned += len(data)
+    return head
+
+
+def sniff_encoding(xml_path: str) -> tuple:
+    """
+    XML ファイルの文字コードを判定し、(エンコーディング名, 判定根拠) を返す。
+    判定根拠は "bom" / "declaration" / "heuristic" のいずれか。
+    """
+    with open(xml_path, "rb") as f:
+        head = f.read(ENCODING_SNIFF_SIZE)
+
+        for bom, encoding in XML_BOMS:
+            if head.startswith(bom):
+                return encoding, "bom"
+
+        sample = read_encoding_sample(f, head)
+
+    match = XML_DECLARATION_ENCODING.match(head)
+    if match:
+        encoding = normalize_encoding_name(match.group(1).decode("ascii"))
+        # 宣言と実際の中身が食い違う DAT もあるため、サンプルで確かめてから採用する
+        if encoding and decodes_strictly(sample, encoding):
+            return encoding, "declaration"
+
+    for encoding in ("utf-8", "cp932"):
+        if decodes_strictly(sample, encoding):
+            return encoding, "heuristic"
+    return "utf-8", "heuristic"
+
+
+# -------------------------------
+# 逐次デコード（不正なバイト列は U+FFFD に置換して件数を数える）
+# -------------------------------
+XML_READ_CHUNK_SIZE = 1024 * 1024
+COUNTING_REPLACE_ERRORS = "offlinelist-count-replace"
+
+decoding_state = threading.local()
+
+
+def count_replacement(exc: UnicodeDecodeError) -> tuple:
+    decoding_state.decoder.replacements += 1
+    return "\ufffd", exc.end
+
 
+codecs.register_error(COUNTING_REPLACE_ERRORS, count_replacement)
 
-def generate_csv_from_xml(xml_path: str) -> str:
+
+class XmlTextDecoder:
+    def __init__(self, encoding: str, source: str = ""):
+        self.encoding = encoding
+        self.source = source
+        self.replacements = 0
+        self.bytes_read = 0
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors=COUNTING_REPLACE_ERRORS)
+
+    @classmethod
+    def for_file(cls, xml_path: str):
+        return cls(*sniff_encoding(xml_path))
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        decoding_state.decoder = self
+        return self.decoder.decode(data, final)
+
+    def report(self, stats: dict):
+        stats["encoding"] = self.encoding
+        stats["encoding_source"] = self.source
+        stats["replacements"] = self.replacements
+
+
+def iter_xml_text_chunks(xml_path: str, decoder: XmlTextDecoder, profile: StageProfile = None):
+    # ファイル全体を読み込まず、チャンク単位で 1 回だけデコードする
+    decode = decoder.decode if profile is None else profile.wrap("decode", decoder.decode)
+    with open(xml_path, "rb") as f:
+        read = f.read if profile is None else profile.wrap("read", f.read)
+        while True:
+            data = read(XML_READ_CHUNK_SIZE)
+            if not data:
+                break
+            decoder.bytes_read += len(data)
+            text = decode(data)
+            if text:
+                yield text
+    text = decode(b"", final=True)
+    if text:
+        yield text
+
+
+# -------------------------------
+# XML → CSV
+# -------------------------------
+def iter_games(xml_path: str, decoder: XmlTextDecoder = None, profile: StageProfile = None):
+    """
+    <game> 要素を閉じタグの時点で 1 件ずつ返す（root.findall(".//game") と同じ順序）。
+    返した要素は親から切り離すため、メモリ使用量はファイルサイズに依存しない。
+    """
+    if decoder is None:
+        decoder = XmlTextDecoder.for_file(xml_path)
+    return iter_games_from_text(iter_xml_text_chunks(xml_path, decoder, profile), profile)
+
+
+def iter_games_from_text(chunks, profile: StageProfile = None):
+    """デコード済みの XML テキストを chunks から順に読み、<game> 要素を返す（iter_games の本体）。"""
+    parser = ET.XMLPullParser(events=("start", "end"))
+    feed = parser.feed if profile is None else profile.wrap("parse", parser.feed)
+    close = parser.close if profile is None else profile.wrap("parse", parser.close)
+    stack = []
+    game_depth = 0
+
+    def handle_events():
+        nonlocal game_depth
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                if elem.tag == "game":
+                    game_depth += 1
+                continue
+
+            stack.pop()
+            if elem.tag != "game":
+                continue
+            game_depth -= 1
+            if game_depth:
+                continue
+
+            # 入れ子の <game> も文書順（開始タグ順）で返す
+            yield from elem.iter("game")
+            if stack:
+                stack[-1].remove(elem)
+
+    for text in chunks:
+        feed(text)
+        yield from handle_events()
+    close()
+    yield from handle_events()
+
+
+class GameRowExtractor:
+    """
+    <game> の子要素を 1 回だけ走査し、CSV の 1 行（list）を作る。
+    タグごとの処理は handlers の対応表で振り分ける（同じタグが複数あれば最初のものを使う）。
+    discover_columns=True のときは、未知のタグや 2 件目以降の <romCRC> を列として追加する。
+    """
+
+    def __init__(self, fieldnames: list = None, discover_columns: bool = False):
+        self.columns = list(fieldnames or CSV_FIELDNAMES)
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+        self.discover_columns = discover_columns
+        self.handlers = {
+            "files": self.extract_files,
+            # <files> の外にある romCRC / extension は列の意味が変わるため無視する
+            "romCRC": None,
+            "extension": None,
+        }
+
+    def add_column(self, name: str, row: list):
+        index = self.column_index.get(name)
+        if index is None:
+            index = len(self.columns)
+            self.columns.append(name)
+            self.column_index[name] = index
+        if len(row) < len(self.columns):
+            row.extend([""] * (len(self.columns) - len(row)))
+        return index
+
+    def find_column(self, name: str, row: list):
+        index = self.column_index.get(name)
+        if index is None and self.discover_columns:
+            index = self.add_column(name, row)
+        elif index is not None and index >= len(row):
+            row.extend([""] * (len(self.columns) - len(row)))
+        return index
+
+    def extract(self, game: ET.Element) -> list:
+        row = [""] * len(self.columns)
+        handlers = self.handlers
+        seen = set()
+
+        for child in game:
+            tag = child.tag
+            if tag in seen:
+                continue
+            seen.add(tag)
+
+            if tag in handlers:
+                handler = handlers[tag]
+                if handler is not None:
+                    handler(child, row)
+                continue
+
+            index = self.find_column(tag, row)
+            if index is not None and child.text is not None:
+                row[index] = child.text.strip()
+
+        return row
+
+    def extract_files(self, files: ET.Element, row: list):
+        number = 0
+        for rom in files:
+            if rom.tag != "romCRC":
+                continue
+
+            crc_name, ext_name = rom_column_names(number)
+            crc_index = self.find_column(crc_name, row)
+            ext_index = self.find_column(ext_name, row)
+            if crc_index is None and ext_index is None:
+                break
+            if crc_index is not None:
+                row[crc_index] = (rom.text or "").strip()
+            if ext_index is not None:
+                row[ext_index] = (rom.get("extension") or "").strip()
+            number += 1
+
+
+def pad_csv_rows(source, writer, width: int):
+    for row in csv.reader(source):
+        if len(row) < width:
+            row += [""] * (width - len(row))
+        writer.writerow(row)
+
+
+def write_csv_from_games(games, csv_path: str, discover_columns: bool = False,
+                         profile: StageProfile = None) -> int:
+    extractor = GameRowExtractor(discover_columns=discover_columns)
+    extract = extractor.extract if profile is None else profile.wrap("extract", extractor.extract)
+    count = 0
+
+    with open_output(csv_path, "w", encoding="utf-8", newline="") as f:
+        if not discover_columns:
+            writer = csv.writer(f)
+            writer.writerow(extractor.columns)
+            writerow = writer.writerow if profile is None else profile.wrap("write", writer.writerow)
+            for game in games:
+                writerow(extract(game))
+                count += 1
+        else:
+            # 列が確定するのは全件読み終えた後なので、本体を一時ファイルに書いてからヘッダーを付ける
+            import tempfile
+
+            with tempfile.TemporaryFile("w+", encoding="utf-8", newline="") as body:
+                body_writer = csv.writer(body)
+                writerow = body_writer.writerow if profile is None else profile.wrap("write", body_writer.writerow)
+                first_width = None
+                for game in games:
+                    row = extract(game)
+                    if first_width is None:
+                        first_width = len(row)
+                    writerow(row)
+                    count += 1
+
+                writer = csv.writer(f)
+                writer.writerow(extractor.columns)
+                body.seek(0)
+                if first_width == len(extractor.columns):
+                    shutil.copyfileobj(body, f)
+                else:
+                    # 途中で列が増えた場合は、先に書いた行の不足分を空欄で埋める
+                    pad_csv_rows(body, writer, len(extractor.columns))
+
+        if not count:
+            raise ValueError("<game> タグが見つかりません。")
+
+    return count
+
+
+def generate_csv_from_xml(xml_path: str, stats: dict = None, discover_columns: bool = False,
+                          profile: StageProfile = None, progress=None, parse_workers: int = None,
+                          csv_path: str = None) -> str:
+    """
+    XML と同じフォルダに CSV を生成する（csv_path を指定した場合はそこに生成する）。
+    profile（省略時は環境変数 OFFLINELIST_PROFILE）を指定すると、ステージ別の計測結果を
+    {出力 CSV}.profile.json に書き出し、そのパスを stats の "profile_path" に入れる。
+    progress は generate_xml_from_csv と同じ（ConversionCancelled で中止できる）。
+
+    parse_workers が 2 以上で、XML が PARALLEL_PARSE_MIN_BYTES 以上の場合は、
+    <game> の境界で分割して複数プロセスで解析する（出力は 1 プロセスの場合と同じ）。
+    分割して解析できない XML（<game> の外で宣言した名前空間接頭辞を使っているなど）は 1 プロセスで処理し直す。
+    """
     if not xml_path:
         raise ValueError("XML ファイルが指定されていません。")
+    if profile is None:
+        profile = StageProfile.from_env()
+    if profile is not None:
+        profile.begin()
+
+    if csv_path is None:
+        base, _ = os.path.splitext(xml_path)
+        csv_path = base + ".csv"
+
+    decoder = XmlTextDecoder.for_file(xml_path)
+    rows = None
+    if use_parallel_parse(xml_path, decoder.encoding, parse_workers, discover_columns, profile):
+        try:
+            rows = write_csv_from_xml_parallel(xml_path, csv_path, decoder, parse_workers, progress)
+        except ET.ParseError:
+            decoder = XmlTextDecoder(decoder.encoding, decoder.source)
+
+    if rows is None:
+        games = iter_games(xml_path, decoder, profile)
+        if progress is not None:
+            games = track_progress(games, progress, lambda: decoder.bytes_read, os.path.getsize(xml_path))
+        rows = write_csv_from_games(games, csv_path, discover_columns, profile)
+
+    if stats is not None:
+        stats["rows"] = rows
+        decoder.report(stats)
+    if profile is not None:
+        profile_path = profile.finish(csv_path, rows, direction="xml2csv", encoding=decoder.encoding)
+        if stats is not None:
+            stats["profile_path"] = profile_path
+    return csv_path
 
-    xml_text = read_xml_text_auto(xml_path)
-    root = ET.fromstring(xml_text)
-
-    games = root.findall(".//game")
-    if not games:
-        raise ValueError("<game> タグが見つかりません。")
-
-    fieldnames = [
-        "imageNumber",
-        "releaseNumber",
-        "title",
-        "im1CRC",
-        "im2CRC",
-        "publisher",
-        "sourceRom",
-        "location",
-        "comment",
-        "language",
-        "saveType",
-        "romSize",
-        "romCRC",
-        "extension",
-    ]
-
-    base, _ = os.path.splitext(xml_path)
-    csv_path = base + ".csv"
-
-    with open(csv_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for game in games:
-            row = {key: "" for key in fieldnames}
-
-            files = game.find("files")
-            if files is not None:
-                romcrc = files.find("romCRC")
-                if romcrc is not None:
-                    row["romCRC"] = (romcrc.text or "").strip()
-                    row["extension"] = (romcrc.get("extension") or "").strip()
-
-            for tag_name in fieldnames:
-                if tag_name in ("romCRC", "extension"):
-                    continue
-                tag = game.find(tag_name)
-                if tag is not None and tag.text is not None:
-                    row[tag_name] = tag.text.strip()
 
-            writer.writerow(row)
+# -------------------------------
+# XML → CSV の並列処理（大きな DAT を <game> の境界で分割して複数プロセスで解析）
+# -------------------------------
+# "<" は Shift_JIS（cp932）の 2 バイト目にも UTF-8 のマルチバイト文字にも現れないため、
+# デコードせずにバイト列のまま "<game" / "</game>" を探しても文字の途中に一致しない。
+GAME_TAG_PATTERN = re.compile(rb"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<game(?=[\s>/])|</game\s*>", re.S)
+BYTE_SCAN_ENCODINGS_EXCLUDED = ("utf-16", "utf-32")
+PARALLEL_PARSE_MIN_BYTES = 16 * 1024 * 1024
+PARALLEL_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def iter_game_spans(data, start: int = 0, end: int = None):
+    """
+    data（bytes / mmap）の start〜end から、一番外側の <game> 要素の (開始位置, バイト長) を順に返す。
+    コメントと CDATA の中は無視する。
+    """
+    if end is None:
+        end = len(data)
+    depth = 0
+    game_start = 0
+    for match in GAME_TAG_PATTERN.finditer(data, start, end):
+        token = match.group()
+        if token.startswith(b"<!"):
+            continue
+
+        if token == b"<game":
+            tag_end = data.find(b">", match.end(), end)
+            if tag_end < 0:
+                break
+            if data[tag_end - 1:tag_end] == b"/":
+                # <game/>（中身のない要素）
+                if not depth:
+                    yield match.start(), tag_end + 1 - match.start()
+                continue
+            if not depth:
+                game_start = match.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if not depth:
+                yield game_start, match.end() - game_start
+
+
+def can_scan_bytes(encoding: str) -> bool:
+    return not encoding.replace("_", "-").lower().startswith(BYTE_SCAN_ENCODINGS_EXCLUDED)
+
+
+def check_byte_scan_encoding(encoding: str):
+    if not can_scan_bytes(encoding):
+        raise ValueError(f"{encoding} の DAT はバイト列のまま走査できません。UTF-8 か Shift_JIS で保存してください。")
+
+
+def iter_game_chunks(xml_path: str, chunk_bytes: int = PARALLEL_CHUNK_BYTES):
+    """
+    DAT を 1 回だけ走査し、<game> の (開始位置, バイト長) を約 chunk_bytes ごとの list にまとめて返す。
+    走査し終えた範囲のページは手放し、大きな DAT でも常駐メモリが増えないようにする（対応する OS のみ）。
+    """
+    import mmap
+
+    release = getattr(mmap, "MADV_DONTNEED", None)
+    with open(xml_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            chunk = []
+            chunk_start = None
+            released = 0
+            for offset, length in iter_game_spans(mm):
+                if chunk_start is None:
+                    chunk_start = offset
+                chunk.append((offset, length))
+                if offset + length - chunk_start >= chunk_bytes:
+                    yield chunk
+                    chunk = []
+                    chunk_start = None
+                    end = (offset + length) // mmap.PAGESIZE * mmap.PAGESIZE
+                    if release is not None and end > released:
+                        mm.madvise(release, released, end - released)
+                        released = end
+            if chunk:
+                yield chunk
+
+
+def extract_game_chunk(job: tuple) -> tuple:
+    """
+    ワーカープロセスで 1 チャンク分の <game> を解析し、(CSV テキスト, 件数, 置換件数, 末尾の位置) を返す。
+    各 <game> を <chunk> 要素で包んで解析するため、結果は 1 プロセスで解析した場合と同じになる。
+    """
+    import io
+
+    xml_path, encoding, spans = job
+    start = spans[0][0]
+    end = spans[-1][0] + spans[-1][1]
+    with open(xml_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    decoder = XmlTextDecoder(encoding)
+
+    def texts():
+        yield "<chunk>"
+        for offset, length in spans:
+            yield decoder.decode(data[offset - start:offset - start + length], final=True)
+        yield "</chunk>"
+
+    extractor = GameRowExtractor()
+    out = io.StringIO()
+    writer = csv.writer(out)
+    count = 0
+    for game in iter_games_from_text(texts()):
+        writer.writerow(extractor.extract(game))
+        count += 1
+    return out.getvalue(), count, decoder.replacements, end
+
+
+def write_csv_from_xml_parallel(xml_path: str, csv_path: str, decoder: XmlTextDecoder, workers: int,
+                                progress=None) -> int:
+    """
+    <game> のチャンクをプロセスプールで解析し、元の順序で CSV に書き出す。
+    同時に処理するチャンクは workers の 2 倍までに抑え、メモリ使用量を一定に保つ。
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    total_bytes = os.path.getsize(xml_path)
+    jobs = ((xml_path, decoder.encoding, spans) for spans in iter_game_chunks(xml_path, PARALLEL_CHUNK_BYTES))
+    count = 0
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        with open_output(csv_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerow(CSV_FIELDNAMES)
+            pending = deque()
+
+            def submit_next():
+                job = next(jobs, None)
+                if job is not None:
+                    pending.append(executor.submit(extract_game_chunk, job))
+
+            for _ in range(workers * 2):
+                submit_next()
+            while pending:
+                text, rows, replacements, end = pending.popleft().result()
+                submit_next()
+                f.write(text)
+                count += rows
+                decoder.replacements += replacements
+                decoder.bytes_read = end
+                if progress is not None:
+                    progress(count, end, total_bytes)
+
+            if not count:
+                raise ValueError("<game> タグが見つかりません。")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    decoder.bytes_read = total_bytes
+    return count
+
+
+def use_parallel_parse(xml_path: str, encoding: str, workers: int, discover_columns: bool, profile) -> bool:
+    # 列が途中で増える discover_columns と、プロセスをまたいで計測できない profile は 1 プロセスで処理する
+    return (workers is not None and workers > 1
+            and not discover_columns and profile is None
+            and can_scan_bytes(encoding)
+            and os.path.getsize(xml_path) >= PARALLEL_PARSE_MIN_BYTES)
 
-    return csv_path
 
 # -------------------------------
-# GUI
-# -------------------------------
-class OfflineListGUI:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("OfflineList CSV/XML Converter")
-
-        self.dat_name_var = tk.StringVar(value="")
-        self.system_var = tk.StringVar(value="")
-        self.im_folder_var = tk.StringVar(value="")
-        self.screenshots_width_var = tk.StringVar(value="320")
-        self.screenshots_height_var = tk.StringVar(value="224")
-        self.extension_suffix_var = tk.StringVar(value="")
-        self.dat_code_var = tk.StringVar(value="")
-
-        self.dat_code_manual_override = False
-
-        self.input_path = ""
-        self.mode_var = tk.StringVar(value="未選択")
-
-        self.build_ui()
-        self.setup_bindings()
-        self.handle_initial_argv()
-
-    # -------------------------------
-    # プレースホルダー
-    # -------------------------------
-    def add_placeholder(self, entry, text):
-        entry.insert(0, text)
-        entry.config(fg="gray")
-
-        def on_focus_in(event):
-            if entry.get() == text:
-                entry.delete(0, "end")
-                entry.config(fg="black")
-
-        def on_focus_out(event):
-            if entry.get() == "":
-                entry.insert(0, text)
-                entry.config(fg="gray")
-
-        entry.bind("<FocusIn>", on_focus_in)
-        entry.bind("<FocusOut>", on_focus_out)
-
-    # -------------------------------
-    # ツールチップ
-    # -------------------------------
-    class ToolTip:
-        def __init__(self, widget, text):
-            self.widget = widget
-            self.text = text
-            self.tip = None
-            widget.bind("<Enter>", self.show)
-            widget.bind("<Leave>", self.hide)
-
-        def show(self, event=None):
-            if self.tip is not None:
-                return
-            x = self.widget.winfo_rootx() + 20
-            y = self.widget.winfo_rooty() + 20
-            self.tip = tw = tk.Toplevel(self.widget)
-            tw.wm_overrideredirect(True)
-            tw.wm_geometry(f"+{x}+{y}")
-            label = tk.Label(
-                tw,
-                text=self.text,
-                background="#ffffe0",
-                relief="solid",
-                borderwidth=1,
-                font=("Arial", 10),
-                justify="left",
-                anchor="w"
+# XML / CSV 共通の行の読み込みと、まとめて保持するための列ごとの表
+# -------------------------------
+def iter_game_rows(path: str, fieldnames: list = None):
+    """
+    XML（DAT）でも CSV でも、1 ゲームを fieldnames（既定: CSV_FIELDNAMES）順の list として返す。
+    CSV にない列は空欄にする。
+    """
+    fieldnames = list(fieldnames or CSV_FIELDNAMES)
+    if is_xml(path):
+        extractor = GameRowExtractor(fieldnames)
+        for game in iter_games(path):
+            yield extractor.extract(game)
+        return
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        # 同じ列名が複数あれば最初の列を使う
+        positions = {}
+        for i, name in enumerate(header):
+            positions.setdefault(name, i)
+        indexes = [positions.get(name) for name in fieldnames]
+        width = len(fieldnames)
+        if indexes == list(range(width)) and len(header) == width:
+            for row in reader:
+                if row:
+                    # ヘッダーより多いセルは捨て、足りない分は空欄で埋めて常に fieldnames の長さにする
+                    if len(row) != width:
+                        row = row[:width] + [""] * (width - len(row))
+                    yield row
+            return
+        for row in reader:
+            if row:
+                yield [row[i] if i is not None and i < len(row) else "" for i in indexes]
+
+
+EMPTY_CELL = -1
+IRREGULAR_CELL = -2
+NUMBER_COLUMNS = ("imageNumber", "releaseNumber", "romSize", "location", "language")
+CRC_COLUMNS = ("romCRC", "im1CRC", "im2CRC")
+INTERNED_COLUMNS = ("publisher", "sourceRom", "saveType", "extension", "comment")
+CRC_TEXT_PATTERN = re.compile(r"[0-9A-F]{8}")
+
+
+class TextColumn:
+    """文字列の列。interned=True なら同じ値を 1 つの str にまとめる（publisher など種類の少ない列用）。"""
+
+    __slots__ = ("values", "pool")
+
+    def __init__(self, interned: bool = False):
+        self.values = []
+        self.pool = {} if interned else None
+
+    def append(self, value: str):
+        if self.pool is not None:
+            value = self.pool.setdefault(value, value)
+        self.values.append(value)
+
+    def extend_empty(self, count: int):
+        self.values.extend([""] * count)
+
+    def __getitem__(self, index: int) -> str:
+        return self.values[index]
+
+
+class NumberColumn:
+    """
+    10 進数（先頭に 0 のないもの）または 8 桁の大文字 16 進数（hex=True）の列を 64bit 整数の配列で持つ。
+    空欄は EMPTY_CELL、形式の異なる値は IRREGULAR_CELL として元の文字列を irregular に退避する。
+    """
+
+    __slots__ = ("values", "irregular", "hex")
+
+    def __init__(self, hex: bool = False):
+        from array import array
+
+        self.values = array("q")
+        self.irregular = {}
+        self.hex = hex
+
+    def append(self, value: str):
+        if not value:
+            self.values.append(EMPTY_CELL)
+        elif self.hex and len(value) == 8 and CRC_TEXT_PATTERN.fullmatch(value):
+            self.values.append(int(value, 16))
+        elif (not self.hex and len(value) < 19 and value.isascii() and value.isdigit()
+              and (value == "0" or value[0] != "0")):
+            self.values.append(int(value))
+        else:
+            self.irregular[len(self.values)] = value
+            self.values.append(IRREGULAR_CELL)
+
+    def extend_empty(self, count: int):
+        self.values.extend([EMPTY_CELL] * count)
+
+    def __getitem__(self, index: int) -> str:
+        value = self.values[index]
+        if value >= 0:
+            return f"{value:08X}" if self.hex else str(value)
+        return "" if value == EMPTY_CELL else self.irregular[index]
+
+
+def make_game_column(name: str):
+    if name in CRC_COLUMNS or (name.startswith("romCRC") and ROM_COLUMN_PATTERN.match(name)):
+        return NumberColumn(hex=True)
+    if name in NUMBER_COLUMNS:
+        return NumberColumn()
+    return TextColumn(interned=name in INTERNED_COLUMNS or name.startswith("extension"))
+
+
+class GameTable:
+    """
+    ゲームの一覧を列ごとの配列で保持する（統合・検証などで全件を手元に置く場合用）。
+    番号・CRC は整数、publisher などは共有した str で持つため、行ごとの list / dict / Element より小さい。
+    行の出し入れは CSV と同じ list 形式で行う。
+    """
+
+    def __init__(self, columns: list = None):
+        self.columns = list(columns or CSV_FIELDNAMES)
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+        self.data = [make_game_column(name) for name in self.columns]
+        self.count = 0
+
+    def add_column(self, name: str) -> int:
+        index = self.column_index.get(name)
+        if index is None:
+            index = len(self.columns)
+            self.columns.append(name)
+            self.column_index[name] = index
+            column = make_game_column(name)
+            column.extend_empty(self.count)
+            self.data.append(column)
+        return index
+
+    def append(self, row: list):
+        data = self.data
+        for column, value in zip(data, row):
+            column.append(value)
+        for column in data[len(row):]:
+            column.append("")
+        self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def row(self, index: int) -> list:
+        return [column[index] for column in self.data]
+
+    def value(self, index: int, name: str) -> str:
+        return self.data[self.column_index[name]][index]
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.row(index)
+
+
+def load_game_table(path: str, fieldnames: list = None) -> GameTable:
+    table = GameTable(fieldnames)
+    for row in iter_game_rows(path, table.columns):
+        table.append(row)
+    return table
+
+
+# -------------------------------
+# CSV の書き換え（ROM / 画像の走査結果の反映などに使用）
+# -------------------------------
+def update_csv_rows(csv_path: str, required_columns: list, update_row) -> int:
+    """
+    CSV を 1 件ずつ読み、update_row(row, columns) で行（list）を書き換えて同じパスへ書き戻す。
+    columns は列名 → 位置（同じ列名が複数あれば最初の列）。不足している列は末尾に追加し、
+    行は少なくともヘッダーの列数まで空欄で埋めてから渡す。update_row が True を返した行数を返す。
+    書き換えなかった行は元のテキスト（引用符・改行コード・余分なセルを含む）のまま書き戻す。
+    """
+    import io
+
+    def format_row(row: list, terminator: str) -> str:
+        # 改行を含む値を引用符で囲むかどうかは lineterminator の文字で決まるため、\r\n で書いてから付け替える
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\r\n").writerow(row)
+        return buffer.getvalue()[:-2] + terminator
+
+    def split_terminator(text: str) -> tuple:
+        body = text.rstrip("\r\n")
+        return body, text[len(body):]
+
+    updated = 0
+    with open_output(csv_path, "w", encoding="utf-8", newline="") as dst:
+        # 置き換え前に入力側を閉じる（Windows では開いたままのファイルを置き換えられない）
+        with open(csv_path, newline="", encoding="utf-8") as src:
+            raw_lines = []
+
+            def read_lines():
+                for number, line in enumerate(src):
+                    raw_lines.append(line)
+                    # BOM は書き戻すテキストには残し、列名には含めない
+                    yield line.lstrip("\ufeff") if number == 0 else line
+
+            def take_raw() -> str:
+                text = "".join(raw_lines)
+                raw_lines.clear()
+                return text
+
+            reader = csv.reader(read_lines())
+            header = next(reader, None)
+            if header is None:
+                return 0
+            columns = {}
+            for i, name in enumerate(header):
+                columns.setdefault(name, i)
+            added = [name for name in required_columns if name not in columns]
+            for name in added:
+                columns[name] = len(header)
+                header.append(name)
+
+            body, terminator = split_terminator(take_raw())
+            if added:
+                body += "," + format_row(added, "")
+            dst.write(body + terminator)
+            padding = "," * len(added)
+
+            for row in reader:
+                raw = take_raw()
+                if row:
+                    if len(row) < len(header):
+                        row += [""] * (len(header) - len(row))
+                    if update_row(row, columns):
+                        updated += 1
+                        dst.write(format_row(row, split_terminator(raw)[1]))
+                        continue
+                    if padding:
+                        body, terminator = split_terminator(raw)
+                        raw = body + padding + terminator
+                dst.write(raw)
+
+    return updated
+
+
+# -------------------------------
+# CLI（ヘッドレス一括変換）
+# -------------------------------
+DAT_SETTING_KEYS = (
+    "datName",
+    "system",
+    "imFolder",
+    "screenshotsWidth",
+    "screenshotsHeight",
+    "extension",
+    "datCode",
+)
+
+
+def collect_input_files(paths: list, source: str) -> list:
+    """
+    ファイルとディレクトリの混在した指定を、変換対象ファイルの一覧に展開する。
+    ディレクトリ内は source で指定した種類（csv / xml）のみ対象とする。
+    """
+    matcher = is_csv if source == "csv" else is_xml
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full_path = os.path.join(path, name)
+                if os.path.isfile(full_path) and matcher(full_path):
+                    files.append(full_path)
+        elif os.path.isfile(path) and (is_csv(path) or is_xml(path)):
+            files.append(path)
+        else:
+            raise ValueError(f"CSV / XML ファイルまたはディレクトリではありません: {path}")
+
+    # 同名の CSV と XML を同時に変換すると、互いの出力を上書きしてしまう
+    seen = {}
+    for path in files:
+        stem = os.path.splitext(os.path.abspath(path))[0].lower()
+        if stem in seen and seen[stem] != path:
+            raise ValueError(f"同じ名前の CSV と XML は同時に変換できません:\n{seen[stem]}\n{path}")
+        seen[stem] = path
+
+    return files
+
+
+def load_manifest(manifest_path: str) -> tuple:
+    """
+    マニフェスト（JSON）を読み込み、(共通設定, ファイル別設定) を返す。
+    ファイル別設定のキーは絶対パスに正規化する。
+
+      {
+        "defaults": {"screenshotsWidth": "256"},
+        "files": {"fc.csv": {"datName": "ファミコン", "system": "fc", "extension": "nes"}}
+      }
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    files = {}
+    for path, settings in manifest.get("files", {}).items():
+        files[os.path.normcase(os.path.join(base_dir, path))] = settings
+    return manifest.get("defaults", {}), files
+
+
+def resolve_dat_settings(csv_path: str, cli_settings: dict, defaults: dict, per_file: dict) -> dict:
+    # 優先順位: マニフェストの共通設定 < コマンドライン引数 < マニフェストのファイル別設定
+    settings = dict(defaults)
+    settings.update({key: value for key, value in cli_settings.items() if value is not None})
+    settings.update(per_file.get(os.path.normcase(os.path.abspath(csv_path)), {}))
+
+    # GUI と同じく system から imFolder / datCode を補完する
+    system = str(settings.get("system", "")).strip()
+    if system:
+        settings.setdefault("imFolder", system + "img")
+        settings.setdefault("datCode", system)
+    settings.setdefault("screenshotsWidth", "320")
+    settings.setdefault("screenshotsHeight", "224")
+
+    missing = [key for key in ("datName", "system", "imFolder", "extension", "datCode")
+               if not str(settings.get(key, "")).strip()]
+    if missing:
+        raise ValueError(f"以下の項目が未指定です（{os.path.basename(csv_path)}）: " + ", ".join(missing))
+
+    return {key: str(settings[key]) for key in DAT_SETTING_KEYS}
+
+
+def convert_file(job: dict) -> dict:
+    """
+    1 ファイル分の変換（プロセスプールのワーカーから呼ばれる）。
+    例外は結果に詰めて返し、他のファイルの変換は継続させる。
+    """
+    input_path = job["input"]
+    result = {"input": input_path, "output": None, "rows": 0, "bytes": 0, "seconds": 0.0, "error": None}
+    stats = {}
+    start = time.perf_counter()
+
+    try:
+        profile = StageProfile.from_settings(job.get("profile"), job.get("profile_stage"))
+        result["bytes"] = os.path.getsize(input_path)
+        if is_csv(input_path):
+            settings = job["settings"]
+            output_path = generate_xml_from_csv(
+                csv_path=input_path,
+                dat_name=settings["datName"],
+                im_folder=settings["imFolder"],
+                system=settings["system"],
+                ss_width=settings["screenshotsWidth"],
+                ss_height=settings["screenshotsHeight"],
+                extension_suffix=settings["extension"],
+                dat_code=settings["datCode"],
+                config=job["config"],
+                stats=stats,
+                incremental=job.get("incremental"),
+                zip_output=job.get("zip_output"),
+                compress_level=job.get("compress_level"),
+                profile=profile,
+                output_encoding=job.get("output_encoding"),
+                validate=job.get("validate"),
             )
-            label.pack()
-
-        def hide(self, event=None):
-            if self.tip:
-                self.tip.destroy()
-                self.tip = None
-
-    # -------------------------------
-    # UI 構築
-    # -------------------------------
-    def build_ui(self):
-        pad = 5
-        row = 0
-
-        # datName
-        tk.Label(self.root, text="datName:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
-        datName_entry = tk.Entry(self.root, textvariable=self.dat_name_var, width=40)
-        datName_entry.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
-        self.ToolTip(datName_entry, "例：ファミコン\nOfflineList左下のコンボボックスに表示される名称を入力")
-        row += 1
-
-        # system
-        tk.Label(self.root, text="system:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
-        system_entry = tk.Entry(self.root, textvariable=self.system_var, width=20)
-        system_entry.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
-        self.ToolTip(system_entry, "例：fc\nゲーム機の略称")
-        system_entry.bind("<FocusOut>", self.on_system_focus_out)
-        row += 1
-
-        # imFolder
-        tk.Label(self.root, text="imFolder:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
-        imFolder_entry = tk.Entry(self.root, textvariable=self.im_folder_var, width=40)
-        imFolder_entry.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
-        self.ToolTip(imFolder_entry, "例：fcimg\nサムネイル画像のフォルダ名")
-        row += 1
-
-        # screenshots
-        tk.Label(self.root, text="screenshots:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
-        frame_ss = tk.Frame(self.root)
-        frame_ss.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
-
-        ss_w = tk.Entry(frame_ss, textvariable=self.screenshots_width_var, width=8)
-        ss_w.pack(side="left")
-        tk.Label(frame_ss, text=" x ").pack(side="left")
-        ss_h = tk.Entry(frame_ss, textvariable=self.screenshots_height_var, width=8)
-        ss_h.pack(side="left")
-
-        self.ToolTip(frame_ss, "サムネイル画像の解像度")
-        row += 1
-
-        # extension
-        tk.Label(self.root, text="extension:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
-        frame_ext = tk.Frame(self.root)
-        frame_ext.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
-        tk.Label(frame_ext, text=".").pack(side="left")
-        ext_entry = tk.Entry(frame_ext, textvariable=self.extension_suffix_var, width=10)
-        ext_entry.pack(side="left")
-        self.ToolTip(ext_entry, "例：nes\nROMファイルの拡張子")
-        row += 1
-
-        # datCode
-        tk.Label(self.root, text="datCode:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
-        datCode_entry = tk.Entry(self.root, textvariable=self.dat_code_var, width=20)
-        datCode_entry.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
-        self.ToolTip(datCode_entry, "例：fc\n更新ファイルのファイル名とフォルダ名")
-        row += 1
-
-
-        # ファイル選択
-        tk.Button(self.root, text="CSV / XML を選択", command=self.select_input).grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
-        self.input_label = tk.Label(self.root, text="未選択", anchor="w", width=50)
-        self.input_label.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
-        row += 1
-
-        # モード表示
-        tk.Label(self.root, text="現在のモード:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
-        self.mode_label = tk.Label(self.root, textvariable=self.mode_var, anchor="w")
-        self.mode_label.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
-        row += 1
-
-        # 変換ボタン
-        tk.Button(self.root, text="変換実行", command=self.on_convert).grid(row=row, column=0, columnspan=2, padx=pad, pady=pad)
-        row += 1
-
-        # 説明ラベル
-        info = tk.Label(
-            self.root,
-            text=(
-                "・CSV を選ぶと CSV → XML（DAT）を生成（フォーム必須チェックあり）。\n"
-                "・XML を選ぶと XML → CSV を生成（フォームは無視されます）。\n"
-                "・system を変えると imFolder=system+'img' が自動設定されます。\n"
-                "・system 入力完了後（フォーカスアウト時）に datCode が自動設定されます。\n"
-                "・datCode を手動変更すると自動設定は停止します。\n"
-                "・CSV/XML を exe にドラッグ＆ドロップして起動すると、そのファイルが自動選択されます。"
-            ),
-            justify="left"
-        )
-        info.grid(row=row, column=0, columnspan=2, padx=pad, pady=pad, sticky="w")
-
-        self.root.resizable(False, False)
-
-    # -------------------------------
-    # datCode 手動変更検知
-    # -------------------------------
-    def setup_bindings(self):
-        def on_datcode_change(*args):
-            self.dat_code_manual_override = True
-
-        self.dat_code_var.trace_add("write", on_datcode_change)
-
-    # -------------------------------
-    # system 入力後の自動設定
-    # -------------------------------
-    def on_system_focus_out(self, event):
-        system = self.system_var.get().strip()
-        if system:
-            self.im_folder_var.set(system + "img")
-            if not self.dat_code_manual_override:
-                self.dat_code_var.set(system)
-
-    # -------------------------------
-    # exe ドラッグ＆ドロップ対応
-    # -------------------------------
-    def handle_initial_argv(self):
-        if len(sys.argv) >= 2:
-            path = sys.argv[1]
-            if os.path.isfile(path) and (is_csv(path) or is_xml(path)):
-                self.set_input_file(path)
-
-    # -------------------------------
-    # ファイル選択
-    # -------------------------------
-    def select_input(self):
-        path = filedialog.askopenfilename(
-            title="CSV または XML ファイルを選択",
-            filetypes=[
-                ("CSV and XML", "*.csv *.xml"),
-                ("CSV files", "*.csv"),
-                ("XML files", "*.xml"),
-                ("All files", "*.*"),
-            ]
-        )
-        if path:
-            self.set_input_file(path)
-
-    # -------------------------------
-    # 入力ファイル設定
-    # -------------------------------
-    def set_input_file(self, path: str):
-        self.input_path = path
-        self.input_label.config(text=os.path.basename(path))
-
-        if is_csv(path):
-            self.mode_var.set("CSV → XML")
-        elif is_xml(path):
-            self.mode_var.set("XML → CSV")
         else:
-            self.mode_var.set("未対応の拡張子")
-
-    # -------------------------------
-    # CSV → XML 必須項目チェック
-    # -------------------------------
-    def validate_csv_mode_required_fields(self):
-        missing = []
-        if not self.dat_name_var.get().strip():
-            missing.append("datName")
-        if not self.system_var.get().strip():
-            missing.append("system")
-        if not self.im_folder_var.get().strip():
-            missing.append("imFolder")
-        if not self.extension_suffix_var.get().strip():
-            missing.append("extension")
-        if not self.dat_code_var.get().strip():
-            missing.append("datCode")
-
-        if missing:
-            msg = "以下の項目が未入力です:\n\n" + "\n".join(missing)
-            raise ValueError(msg)
-
-    # -------------------------------
-    # 変換実行
-    # -------------------------------
-    def on_convert(self):
-        if not self.input_path:
-            messagebox.showerror("エラー", "CSV または XML ファイルが選択されていません。")
-            return
+            output_path = generate_csv_from_xml(input_path, stats=stats,
+                                                discover_columns=job.get("discover_columns", False),
+                                                profile=profile,
+                                                parse_workers=job.get("parse_workers"))
+        result["output"] = output_path
+        result["rows"] = stats.get("rows", 0)
+        result["encoding"] = stats.get("encoding")
+        result["replacements"] = stats.get("replacements", 0)
+        result["changed"] = stats.get("changed", True)
+        result["profile_path"] = stats.get("profile_path")
+        result["validation_warnings"] = stats.get("validation_warnings", 0)
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def format_rate(amount: float, seconds: float) -> str:
+    return f"{amount / seconds:,.0f}" if seconds > 0 else "-"
+
+
+def format_convert_result(result: dict) -> str:
+    name = os.path.basename(result["input"])
+    if result["error"]:
+        return f"[NG] {name}: {result['error']}"
+
+    line = (f"[OK] {name} -> {os.path.basename(result['output'])}  "
+            f"{result['rows']:,} 件  {result['seconds']:.2f} 秒  "
+            f"{format_rate(result['rows'], result['seconds'])} 件/秒")
+    if result.get("encoding"):
+        line += f"  文字コード: {result['encoding']}"
+    if not result["changed"]:
+        line += "  （変更なし）"
+    if result.get("replacements"):
+        line += f"  （不正なバイト列を {result['replacements']:,} 箇所置換）"
+    if result.get("validation_warnings"):
+        line += f"  （検証の警告 {result['validation_warnings']:,} 件）"
+    if result.get("profile_path"):
+        line += f"\n     計測結果: {result['profile_path']}"
+    return line
+
+
+def print_convert_summary(results: list, elapsed: float):
+    total_rows = 0
+    total_bytes = 0
+    failed = 0
+
+    for result in results:
+        print(format_convert_result(result))
+        if result["error"]:
+            failed += 1
+            continue
+        total_rows += result["rows"]
+        total_bytes += result["bytes"]
+
+    megabytes = total_bytes / (1024 * 1024)
+    print(f"合計: {len(results)} ファイル（失敗 {failed}）  {total_rows:,} 件  {megabytes:,.1f} MB  "
+          f"{elapsed:.2f} 秒  {format_rate(total_rows, elapsed)} 件/秒  "
+          f"{megabytes / elapsed if elapsed > 0 else 0:,.1f} MB/秒")
+
+
+def build_convert_job(path: str, args, config: dict, manifest: tuple) -> dict:
+    """
+    1 ファイル分の convert_file 用ジョブを作る（CSV の設定が足りなければ ValueError）。
+    manifest は load_manifest の戻り値 (共通設定, ファイル別設定)。
+    """
+    job = {
+        "input": path,
+        "settings": None,
+        "config": None,
+        "discover_columns": args.discover_columns,
+        "incremental": True if args.incremental else None,
+        "zip_output": True if args.zip else None,
+        "compress_level": args.compress_level,
+        "output_encoding": args.output_encoding,
+        "validate": True if args.validate else None,
+        "profile": args.profile or os.environ.get(PROFILE_ENV),
+        "profile_stage": args.profile_stage or os.environ.get(PROFILE_STAGE_ENV),
+        "parse_workers": args.parse_workers,
+    }
+    if is_csv(path):
+        cli_settings = {key: getattr(args, key) for key in DAT_SETTING_KEYS}
+        job["settings"] = resolve_dat_settings(path, cli_settings, *manifest)
+        job["config"] = config
+    return job
+
+
+def build_convert_jobs(args, parser) -> list:
+    manifest = load_manifest(args.manifest) if args.manifest else ({}, {})
+    paths = args.paths or list(manifest[1])
+    if not paths:
+        parser.error("変換するファイルを指定してください。")
+
+    files = collect_input_files(paths, args.source)
+    config = load_config() if any(is_csv(path) for path in files) else None
+    return [build_convert_job(path, args, config, manifest) for path in files]
+
+
+def add_convert_options(parser):
+    """convert と watch に共通の引数（DAT の設定と出力オプション）を追加する。"""
+    parser.add_argument("--manifest", help="ファイル別の datName / system 等を記述した JSON")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="並列に変換するプロセス数（既定: CPU 数）")
+    parser.add_argument("--dat-name", dest="datName")
+    parser.add_argument("--system")
+    parser.add_argument("--im-folder", dest="imFolder")
+    parser.add_argument("--screenshots-width", dest="screenshotsWidth")
+    parser.add_argument("--screenshots-height", dest="screenshotsHeight")
+    parser.add_argument("--extension", help="ROM ファイルの拡張子（例: nes）")
+    parser.add_argument("--dat-code", dest="datCode")
+    parser.add_argument("--incremental", action="store_true",
+                        help="CSV → XML を増分生成する（内容が同じなら出力と datVersion を変えない）")
+    parser.add_argument("--zip", action="store_true",
+                        help="XML と同時に {datCode}.zip（OfflineList の更新用）も生成する")
+    parser.add_argument("--compress-level", type=int, choices=range(0, 10), metavar="0-9",
+                        help=f"zip の圧縮レベル（既定: config.json の zip_compress_level、なければ {DAT_ZIP_COMPRESS_LEVEL}）")
+    parser.add_argument("--output-encoding", choices=tuple(DAT_OUTPUT_ENCODINGS),
+                        help="CSV → XML の出力の文字コード（既定: config.json の output_encoding、なければ utf-8）")
+    parser.add_argument("--validate", action="store_true",
+                        help="CSV → XML の前に CRC・番号・タイトルなどを検証し、エラーがあれば出力しない")
+    parser.add_argument("--discover-columns", action="store_true",
+                        help="XML → CSV で未知のタグや 2 件目以降の romCRC も列として出力する")
+    parser.add_argument("--parse-workers", type=int, default=1,
+                        help=f"XML → CSV で {PARALLEL_PARSE_MIN_BYTES // (1024 * 1024)} MB 以上の XML を"
+                             "分割して解析するプロセス数（既定: 1）")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="ステージ別の処理時間（memory なら割り当てピークも）を {出力}.profile.json に書き出す")
+    parser.add_argument("--profile-stage", metavar="STAGE",
+                        help="指定したステージ（read / decode / parse / extract / build / reuse / validate / write）"
+                             "だけを cProfile で計測し、{出力}.{STAGE}.prof に保存する")
+
+
+def parse_convert_args(parser, argv: list):
+    args = parser.parse_args(argv)
+    if args.profile_stage and not (args.profile or os.environ.get(PROFILE_ENV)):
+        args.profile = "time"
+    return args
+
+
+def run_convert_command(argv: list) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py convert",
+        description="CSV → XML / XML → CSV を GUI なしで一括変換します。",
+    )
+    parser.add_argument("paths", nargs="*", help="変換する CSV / XML ファイル、またはディレクトリ")
+    parser.add_argument("--from", dest="source", choices=("csv", "xml"), default="csv",
+                        help="ディレクトリ指定時に変換対象とするファイルの種類（既定: csv）")
+    add_convert_options(parser)
+    args = parse_convert_args(parser, argv)
+
+    try:
+        jobs = build_convert_jobs(args, parser)
+    except (ValueError, OSError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    if not jobs:
+        print("変換対象のファイルがありません。")
+        return 1
+
+    workers = max(1, min(args.workers, len(jobs)))
+    start = time.perf_counter()
+    if workers == 1:
+        results = [convert_file(job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(convert_file, jobs))
+    elapsed = time.perf_counter() - start
+
+    print_convert_summary(results, elapsed)
+    return 1 if any(result["error"] for result in results) else 0
+
+
+# -------------------------------
+# import 時間の計測（起動時間の予算チェック）
+# -------------------------------
+IMPORT_TIME_BUDGET_MS = 50
+IMPORT_TIME_BUDGET_ENV = "OFFLINELIST_IMPORT_BUDGET_MS"  # 遅いマシン・CI では環境変数で予算を変える
+IMPORT_FORBIDDEN_MODULES = ("tkinter", "bs4", "xml.dom.minidom", "argparse", "concurrent.futures")
+
+
+def import_time_budget_ms() -> float:
+    value = os.environ.get(IMPORT_TIME_BUDGET_ENV, "").strip()
+    if not value:
+        return IMPORT_TIME_BUDGET_MS
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{IMPORT_TIME_BUDGET_ENV} には数値（ミリ秒）を指定してください: {value}")
+
+
+def measure_import_time(module_name: str = "generator") -> dict:
+    """
+    別プロセスで python -X importtime -c "import <module>" を実行し、
+    累積 import 時間（ミリ秒）と読み込まれたモジュール一覧を返す。
+    """
+    import subprocess
+
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=module_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
 
+    # 各行: "import time: self [us] | cumulative | imported package"
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        modules[fields[2].strip()] = int(fields[1].strip()) / 1000
+
+    return {
+        "module": module_name,
+        "total_ms": modules.get(module_name, 0.0),
+        "modules": modules,
+    }
+
+
+def run_importtime_command(argv: list) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py importtime",
+        description="変換処理の import 時間を計測し、予算を超えていないか確認します。",
+    )
+    parser.add_argument("--budget-ms", type=float,
+                        help=f"許容する累積 import 時間（既定: 環境変数 {IMPORT_TIME_BUDGET_ENV}、"
+                             f"なければ {IMPORT_TIME_BUDGET_MS} ms）")
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数（最小値を採用、既定: 5）")
+    args = parser.parse_args(argv)
+    if args.budget_ms is None:
         try:
-            if is_csv(self.input_path):
-                self.validate_csv_mode_required_fields()
-                output_path = generate_xml_from_csv(
-                    csv_path=self.input_path,
-                    dat_name=self.dat_name_var.get(),
-                    im_folder=self.im_folder_var.get(),
-                    system=self.system_var.get(),
-                    ss_width=self.screenshots_width_var.get(),
-                    ss_height=self.screenshots_height_var.get(),
-                    extension_suffix=self.extension_suffix_var.get(),
-                    dat_code=self.dat_code_var.get(),
-                )
-                output_dir = os.path.dirname(output_path)
-                version_file = create_version_file(output_dir, self.dat_code_var.get())
-                messagebox.showinfo("完了", f"CSV → XML 変換が完了しました。\n\n{output_path}")
-
-            elif is_xml(self.input_path):
-                output_path = generate_csv_from_xml(self.input_path)
-                messagebox.showinfo("完了", f"XML → CSV 変換が完了しました。\n\n{output_path}")
+            args.budget_ms = import_time_budget_ms()
+        except ValueError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            return 1
 
-            else:
-                messagebox.showerror("エラー", "CSV / XML 以外のファイルです。")
+    runs = [measure_import_time() for _ in range(max(1, args.repeat))]
+    best = min(runs, key=lambda run: run["total_ms"])
+    forbidden = [name for name in IMPORT_FORBIDDEN_MODULES if name in best["modules"]]
+    slowest = sorted(best["modules"].items(), key=lambda item: item[1], reverse=True)[:10]
+
+    print(f"import generator: {best['total_ms']:.1f} ms（予算 {args.budget_ms:.1f} ms）")
+    for name, ms in slowest:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    ok = True
+    if best["total_ms"] > args.budget_ms:
+        print("NG: import 時間が予算を超えています。")
+        ok = False
+    if forbidden:
+        print("NG: 変換処理の import で読み込むべきでないモジュール: " + ", ".join(forbidden))
+        ok = False
+    return 0 if ok else 1
+
+
+# 別モジュールのサブコマンドは、実行されるときに初めて import する。
+# importlib に文字列で渡すと PyInstaller が依存モジュールとして検出できないため、import 文で書く。
+def run_scan_roms_command(argv: list) -> int:
+    import romscan
+
+    return romscan.main(argv)
+
+
+def run_watch_command(argv: list) -> int:
+    import watcher
+
+    return watcher.main(argv)
+
+
+def run_lookup_command(argv: list) -> int:
+    import datindex
+
+    return datindex.main(argv)
+
+
+def run_merge_command(argv: list) -> int:
+    import datmerge
+
+    return datmerge.main(argv)
+
+
+def run_images_command(argv: list) -> int:
+    import imagepack
+
+    return imagepack.main(argv)
+
+
+def run_validate_command(argv: list) -> int:
+    import validator
+
+    return validator.main(argv)
+
+
+def run_catalog_command(argv: list) -> int:
+    import catalog
+
+    return catalog.main(argv)
+
+
+def run_serve_command(argv: list) -> int:
+    import update_server
+
+    return update_server.main(argv)
+
+
+def run_verify_command(argv: list) -> int:
+    import verify
+
+    return verify.main(argv)
+
+
+def run_bench_command(argv: list) -> int:
+    import benchmark
+
+    return benchmark.main(argv)
+
+
+CLI_COMMANDS = {
+    "convert": run_convert_command,
+    "importtime": run_importtime_command,
+    "scan-roms": run_scan_roms_command,
+    "watch": run_watch_command,
+    "lookup": run_lookup_command,
+    "merge": run_merge_command,
+    "images": run_images_command,
+    "validate": run_validate_command,
+    "catalog": run_catalog_command,
+    "serve": run_serve_command,
+    "verify": run_verify_command,
+    "bench": run_bench_command,
+}
 
-        except Exception as e:
-            messagebox.showerror("エラー", f"変換に失敗しました。\n\n{e}")
 
 # -------------------------------
 # main
 # -------------------------------
-def main():
-    root = tk.Tk()
-    app = OfflineListGUI(root)
-    root.mainloop()
+def main(argv: list = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # 先頭がサブコマンドなら GUI を起動せずに処理する
+    if argv and argv[0] in CLI_COMMANDS:
+        return CLI_COMMANDS[argv[0]](argv[1:])
+
+    import gui
+
+    gui.run()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+
+        multiprocessing.freeze_support()  # PyInstaller の exe でプロセスプールを使うため
+    sys.exit(main())
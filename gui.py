@@ -0,0 +1,478 @@
+import os
+import queue
+import sys
+import threading
+import time
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+from generator import (
+    ConversionCancelled,
+    generate_csv_from_xml,
+    generate_xml_from_csv,
+    is_csv,
+    is_xml,
+)
+
+# ワーカースレッドからの通知を確認する間隔（ミリ秒）
+WORKER_POLL_INTERVAL_MS = 100
+
+
+# -------------------------------
+# GUI
+# -------------------------------
+class OfflineListGUI:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("OfflineList CSV/XML Converter")
+
+        self.dat_name_var = tk.StringVar(value="")
+        self.system_var = tk.StringVar(value="")
+        self.im_folder_var = tk.StringVar(value="")
+        self.screenshots_width_var = tk.StringVar(value="320")
+        self.screenshots_height_var = tk.StringVar(value="224")
+        self.extension_suffix_var = tk.StringVar(value="")
+        self.dat_code_var = tk.StringVar(value="")
+        self.discover_columns_var = tk.BooleanVar(value=False)
+
+        self.dat_code_manual_override = False
+
+        self.input_paths = []
+        self.mode_var = tk.StringVar(value="未選択")
+        self.status_var = tk.StringVar(value="")
+
+        # 変換中の状態（ワーカースレッドとは events キュー経由でやり取りする）
+        self.worker = None
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.file_started = 0.0
+        self.results = []
+        self.closing = False
+
+        self.build_ui()
+        self.setup_bindings()
+        self.handle_initial_argv()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    # -------------------------------
+    # プレースホルダー
+    # -------------------------------
+    def add_placeholder(self, entry, text):
+        entry.insert(0, text)
+        entry.config(fg="gray")
+
+        def on_focus_in(event):
+            if entry.get() == text:
+                entry.delete(0, "end")
+                entry.config(fg="black")
+
+        def on_focus_out(event):
+            if entry.get() == "":
+                entry.insert(0, text)
+                entry.config(fg="gray")
+
+        entry.bind("<FocusIn>", on_focus_in)
+        entry.bind("<FocusOut>", on_focus_out)
+
+    # -------------------------------
+    # ツールチップ
+    # -------------------------------
+    class ToolTip:
+        def __init__(self, widget, text):
+            self.widget = widget
+            self.text = text
+            self.tip = None
+            widget.bind("<Enter>", self.show)
+            widget.bind("<Leave>", self.hide)
+
+        def show(self, event=None):
+            if self.tip is not None:
+                return
+            x = self.widget.winfo_rootx() + 20
+            y = self.widget.winfo_rooty() + 20
+            self.tip = tw = tk.Toplevel(self.widget)
+            tw.wm_overrideredirect(True)
+            tw.wm_geometry(f"+{x}+{y}")
+            label = tk.Label(
+                tw,
+                text=self.text,
+                background="#ffffe0",
+                relief="solid",
+                borderwidth=1,
+                font=("Arial", 10),
+                justify="left",
+                anchor="w"
+            )
+            label.pack()
+
+        def hide(self, event=None):
+            if self.tip:
+                self.tip.destroy()
+                self.tip = None
+
+    # -------------------------------
+    # UI 構築
+    # -------------------------------
+    def build_ui(self):
+        pad = 5
+        row = 0
+
+        # datName
+        tk.Label(self.root, text="datName:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
+        datName_entry = tk.Entry(self.root, textvariable=self.dat_name_var, width=40)
+        datName_entry.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+        self.ToolTip(datName_entry, "例：ファミコン\nOfflineList左下のコンボボックスに表示される名称を入力")
+        row += 1
+
+        # system
+        tk.Label(self.root, text="system:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
+        system_entry = tk.Entry(self.root, textvariable=self.system_var, width=20)
+        system_entry.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+        self.ToolTip(system_entry, "例：fc\nゲーム機の略称")
+        system_entry.bind("<FocusOut>", self.on_system_focus_out)
+        row += 1
+
+        # imFolder
+        tk.Label(self.root, text="imFolder:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
+        imFolder_entry = tk.Entry(self.root, textvariable=self.im_folder_var, width=40)
+        imFolder_entry.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+        self.ToolTip(imFolder_entry, "例：fcimg\nサムネイル画像のフォルダ名")
+        row += 1
+
+        # screenshots
+        tk.Label(self.root, text="screenshots:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
+        frame_ss = tk.Frame(self.root)
+        frame_ss.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+
+        ss_w = tk.Entry(frame_ss, textvariable=self.screenshots_width_var, width=8)
+        ss_w.pack(side="left")
+        tk.Label(frame_ss, text=" x ").pack(side="left")
+        ss_h = tk.Entry(frame_ss, textvariable=self.screenshots_height_var, width=8)
+        ss_h.pack(side="left")
+
+        self.ToolTip(frame_ss, "サムネイル画像の解像度")
+        row += 1
+
+        # extension
+        tk.Label(self.root, text="extension:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
+        frame_ext = tk.Frame(self.root)
+        frame_ext.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+        tk.Label(frame_ext, text=".").pack(side="left")
+        ext_entry = tk.Entry(frame_ext, textvariable=self.extension_suffix_var, width=10)
+        ext_entry.pack(side="left")
+        self.ToolTip(ext_entry, "例：nes\nROMファイルの拡張子")
+        row += 1
+
+        # datCode
+        tk.Label(self.root, text="datCode:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
+        datCode_entry = tk.Entry(self.root, textvariable=self.dat_code_var, width=20)
+        datCode_entry.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+        self.ToolTip(datCode_entry, "例：fc\n更新ファイルのファイル名とフォルダ名")
+        row += 1
+
+        # XML → CSV の列
+        columns_check = tk.Checkbutton(self.root, text="未知のタグも CSV の列にする（XML → CSV）",
+                                       variable=self.discover_columns_var)
+        columns_check.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+        self.ToolTip(columns_check, "languages などの既定外のタグや、2 件目以降の romCRC を\n"
+                                    "列（romCRC2 / extension2 …）として出力します")
+        row += 1
+
+
+        # ファイル選択
+        tk.Button(self.root, text="CSV / XML を選択", command=self.select_input).grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
+        self.input_label = tk.Label(self.root, text="未選択", anchor="w", width=50)
+        self.input_label.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+        row += 1
+
+        # モード表示
+        tk.Label(self.root, text="現在のモード:").grid(row=row, column=0, padx=pad, pady=pad, sticky="e")
+        self.mode_label = tk.Label(self.root, textvariable=self.mode_var, anchor="w")
+        self.mode_label.grid(row=row, column=1, padx=pad, pady=pad, sticky="w")
+        row += 1
+
+        # 変換ボタン / キャンセルボタン
+        frame_buttons = tk.Frame(self.root)
+        frame_buttons.grid(row=row, column=0, columnspan=2, padx=pad, pady=pad)
+        self.convert_button = tk.Button(frame_buttons, text="変換実行", command=self.on_convert)
+        self.convert_button.pack(side="left", padx=pad)
+        self.cancel_button = tk.Button(frame_buttons, text="キャンセル", command=self.on_cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=pad)
+        row += 1
+
+        # 進捗
+        self.progress_bar = ttk.Progressbar(self.root, orient="horizontal", length=420, mode="determinate", maximum=100)
+        self.progress_bar.grid(row=row, column=0, columnspan=2, padx=pad, pady=(0, pad))
+        row += 1
+        tk.Label(self.root, textvariable=self.status_var, anchor="w").grid(row=row, column=0, columnspan=2, padx=pad, sticky="w")
+        row += 1
+
+        # 説明ラベル
+        info = tk.Label(
+            self.root,
+            text=(
+                "・CSV を選ぶと CSV → XML（DAT）を生成（フォーム必須チェックあり）。\n"
+                "・XML を選ぶと XML → CSV を生成（フォームは無視されます）。\n"
+                "・system を変えると imFolder=system+'img' が自動設定されます。\n"
+                "・system 入力完了後（フォーカスアウト時）に datCode が自動設定されます。\n"
+                "・datCode を手動変更すると自動設定は停止します。\n"
+                "・CSV/XML を exe にドラッグ＆ドロップして起動すると、そのファイルが自動選択されます。\n"
+                "・複数のファイルを選択（ドロップ）すると、順番に変換します。"
+            ),
+            justify="left"
+        )
+        info.grid(row=row, column=0, columnspan=2, padx=pad, pady=pad, sticky="w")
+
+        self.root.resizable(False, False)
+
+    # -------------------------------
+    # datCode 手動変更検知
+    # -------------------------------
+    def setup_bindings(self):
+        def on_datcode_change(*args):
+            self.dat_code_manual_override = True
+
+        self.dat_code_var.trace_add("write", on_datcode_change)
+
+    # -------------------------------
+    # system 入力後の自動設定
+    # -------------------------------
+    def on_system_focus_out(self, event):
+        system = self.system_var.get().strip()
+        if system:
+            self.im_folder_var.set(system + "img")
+            if not self.dat_code_manual_override:
+                self.dat_code_var.set(system)
+
+    # -------------------------------
+    # exe ドラッグ＆ドロップ対応
+    # -------------------------------
+    def handle_initial_argv(self):
+        paths = [path for path in sys.argv[1:] if os.path.isfile(path) and (is_csv(path) or is_xml(path))]
+        if paths:
+            self.set_input_files(paths)
+
+    # -------------------------------
+    # ファイル選択
+    # -------------------------------
+    def select_input(self):
+        paths = filedialog.askopenfilenames(
+            title="CSV または XML ファイルを選択",
+            filetypes=[
+                ("CSV and XML", "*.csv *.xml"),
+                ("CSV files", "*.csv"),
+                ("XML files", "*.xml"),
+                ("All files", "*.*"),
+            ]
+        )
+        if paths:
+            self.set_input_files(list(paths))
+
+    # -------------------------------
+    # 入力ファイル設定（複数の場合は順番に変換する）
+    # -------------------------------
+    def set_input_files(self, paths: list):
+        self.input_paths = paths
+        label = os.path.basename(paths[0])
+        if len(paths) > 1:
+            label += f" 他 {len(paths) - 1} 件"
+        self.input_label.config(text=label)
+
+        modes = []
+        if any(is_csv(path) for path in paths):
+            modes.append("CSV → XML")
+        if any(is_xml(path) for path in paths):
+            modes.append("XML → CSV")
+        if not all(is_csv(path) or is_xml(path) for path in paths):
+            modes.append("未対応の拡張子")
+        self.mode_var.set(" / ".join(modes))
+
+    # -------------------------------
+    # CSV → XML 必須項目チェック
+    # -------------------------------
+    def validate_csv_mode_required_fields(self):
+        missing = []
+        if not self.dat_name_var.get().strip():
+            missing.append("datName")
+        if not self.system_var.get().strip():
+            missing.append("system")
+        if not self.im_folder_var.get().strip():
+            missing.append("imFolder")
+        if not self.extension_suffix_var.get().strip():
+            missing.append("extension")
+        if not self.dat_code_var.get().strip():
+            missing.append("datCode")
+
+        if missing:
+            msg = "以下の項目が未入力です:\n\n" + "\n".join(missing)
+            raise ValueError(msg)
+
+    # -------------------------------
+    # 変換実行（ワーカースレッドで実行し、画面は固めない）
+    # -------------------------------
+    def on_convert(self):
+        if self.worker is not None:
+            return
+        if not self.input_paths:
+            messagebox.showerror("エラー", "CSV または XML ファイルが選択されていません。")
+            return
+
+        unsupported = [path for path in self.input_paths if not (is_csv(path) or is_xml(path))]
+        if unsupported:
+            messagebox.showerror("エラー", "CSV / XML 以外のファイルです。\n\n" + "\n".join(unsupported))
+            return
+
+        try:
+            if any(is_csv(path) for path in self.input_paths):
+                self.validate_csv_mode_required_fields()
+        except ValueError as e:
+            messagebox.showerror("エラー", f"変換に失敗しました。\n\n{e}")
+            return
+
+        # Tk の変数はメインスレッドでだけ読む
+        settings = dict(
+            dat_name=self.dat_name_var.get(),
+            im_folder=self.im_folder_var.get(),
+            system=self.system_var.get(),
+            ss_width=self.screenshots_width_var.get(),
+            ss_height=self.screenshots_height_var.get(),
+            extension_suffix=self.extension_suffix_var.get(),
+            dat_code=self.dat_code_var.get(),
+        )
+        discover_columns = self.discover_columns_var.get()
+
+        self.cancel_event.clear()
+        self.results = []
+        self.progress_bar["value"] = 0
+        self.status_var.set("変換を開始します…")
+        self.convert_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.worker = threading.Thread(
+            target=self.run_conversions,
+            args=(list(self.input_paths), settings, discover_columns),
+            daemon=True,
+        )
+        self.worker.start()
+        self.root.after(WORKER_POLL_INTERVAL_MS, self.poll_worker)
+
+    def on_cancel(self):
+        if self.worker is not None:
+            self.cancel_event.set()
+            self.cancel_button.config(state="disabled")
+            self.status_var.set("キャンセルしています…")
+
+    def on_close(self):
+        # 変換中に閉じる場合は、一時ファイルを片付けてから終了する
+        if self.worker is None:
+            self.root.destroy()
+            return
+        self.closing = True
+        self.on_cancel()
+
+    # -------------------------------
+    # ワーカースレッド（Tk には触れず、events に結果を積むだけ）
+    # -------------------------------
+    def run_conversions(self, paths: list, settings: dict, discover_columns: bool):
+        for index, path in enumerate(paths):
+            if self.cancel_event.is_set():
+                self.events.put(("cancelled", index, path))
+                return
+            self.events.put(("start", index, path))
+
+            def progress(rows, bytes_done, bytes_total, index=index):
+                if self.cancel_event.is_set():
+                    raise ConversionCancelled()
+                self.events.put(("progress", index, rows, bytes_done, bytes_total))
+
+            stats = {}
+            try:
+                if is_csv(path):
+                    output_path = generate_xml_from_csv(csv_path=path, stats=stats, progress=progress, **settings)
+                    message = f"CSV → XML: {output_path}\n{stats['version_path']}"
+                    if stats["zip_path"]:
+                        message += f"\n{stats['zip_path']}"
+                    if not stats["changed"]:
+                        message += f"\n前回から変更がないため、datVersion は {stats['dat_version']} のままです。"
+                else:
+                    output_path = generate_csv_from_xml(path, stats=stats, progress=progress,
+                                                        discover_columns=discover_columns,
+                                                        parse_workers=os.cpu_count())
+                    message = f"XML → CSV: {output_path}\n文字コード: {stats['encoding']}"
+                    if stats["replacements"]:
+                        message += f"\n※ 不正なバイト列を {stats['replacements']:,} 箇所「\ufffd」に置換しました。"
+                if stats.get("profile_path"):
+                    message += f"\n計測結果: {stats['profile_path']}"
+            except ConversionCancelled:
+                self.events.put(("cancelled", index, path))
+                return
+            except Exception as e:
+                self.events.put(("error", index, path, str(e) or type(e).__name__))
+                continue
+            self.events.put(("done", index, path, message))
+        self.events.put(("finished",))
+
+    # -------------------------------
+    # 進捗の反映（root.after で定期的に呼ばれる）
+    # -------------------------------
+    def poll_worker(self):
+        total_files = len(self.input_paths)
+        finished = False
+        try:
+            while True:
+                event = self.events.get_nowait()
+                kind = event[0]
+                if kind == "start":
+                    self.file_started = time.perf_counter()
+                    self.status_var.set(f"[{event[1] + 1}/{total_files}] {os.path.basename(event[2])}")
+                elif kind == "progress":
+                    _, index, rows, bytes_done, bytes_total = event
+                    fraction = bytes_done / bytes_total if bytes_total else 1.0
+                    self.progress_bar["value"] = (index + fraction) / total_files * 100
+                    elapsed = time.perf_counter() - self.file_started
+                    rate = f"{rows / elapsed:,.0f} 件/秒" if elapsed > 0 else "-"
+                    self.status_var.set(f"[{index + 1}/{total_files}] {os.path.basename(self.input_paths[index])}  "
+                                        f"{rows:,} 件  {rate}")
+                elif kind == "done":
+                    self.results.append(("OK", event[2], event[3]))
+                elif kind == "error":
+                    self.results.append(("NG", event[2], event[3]))
+                else:
+                    finished = True
+                    self.finish_conversions(kind == "cancelled", event)
+                    break
+        except queue.Empty:
+            pass
+
+        if not finished:
+            self.root.after(WORKER_POLL_INTERVAL_MS, self.poll_worker)
+
+    def finish_conversions(self, cancelled: bool, event: tuple):
+        self.worker = None
+        self.convert_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+        if self.closing:
+            self.root.destroy()
+            return
+
+        lines = [f"[{status}] {os.path.basename(path)}\n{detail}" for status, path, detail in self.results]
+        if cancelled:
+            self.status_var.set("キャンセルしました。")
+            lines.append(f"{os.path.basename(event[2])} の変換をキャンセルしました（出力ファイルは作成されていません）。")
+            messagebox.showinfo("キャンセル", "\n\n".join(lines))
+            return
+
+        self.progress_bar["value"] = 100
+        failed = sum(1 for status, _, _ in self.results if status == "NG")
+        self.status_var.set(f"完了: {len(self.results)} ファイル（失敗 {failed}）")
+        if failed:
+            messagebox.showerror("エラー", "変換に失敗したファイルがあります。\n\n" + "\n\n".join(lines))
+        else:
+            messagebox.showinfo("完了", "変換が完了しました。\n\n" + "\n\n".join(lines))
+
+# -------------------------------
+# 起動
+# -------------------------------
+def run():
+    root = tk.Tk()
+    app = OfflineListGUI(root)
+    root.mainloop()
@@ -0,0 +1,391 @@
+"""
+画像（スクリーンショット）の CRC 計算と、OfflineList の画像 zip の作成。
+
+  python generator.py images fcimg fc.csv --dat-code fc --width 256 --height 240
+
+画像フォルダ（サブフォルダを含む）の {imageNumber}a.png / {imageNumber}b.png の CRC32 を
+スレッドプールで計算して CSV の im1CRC / im2CRC に書き込み、
+imURL（{base_url}{datCode}/）に置く 1-500.zip, 501-1000.zip … を {datCode}/ に作成する。
+CRC と画像サイズはキャッシュし、中身が変わった範囲の zip だけを作り直す。
+"""
+import json
+import os
+import re
+import struct
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from generator import XmlTextDecoder, iter_xml_text_chunks, load_config, open_output, update_csv_rows
+from romscan import FileHashCache, crc32_file, format_crc
+from servemanifest import record_served_files
+
+
+# -------------------------------
+# 画像サイズ（PIL を使わずにヘッダーから読む）
+# -------------------------------
+IMAGE_HEADER_SIZE = 64 * 1024
+
+
+def read_jpeg_size(f):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        while marker[1] == 0xFF:
+            marker = marker[1:] + f.read(1)
+        code = marker[1]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        # SOF0〜SOF15（DHT / JPG / DAC を除く）に画像サイズがある
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(path: str):
+    """PNG / GIF / BMP / JPEG の (幅, 高さ) を返す。読めない形式なら None。"""
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"BM") and len(head) >= 26:
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height)
+        if head.startswith(b"\xff\xd8"):
+            return read_jpeg_size(f)
+    return None
+
+
+# -------------------------------
+# 画像フォルダの走査
+# -------------------------------
+IMAGE_NAME_PATTERN = re.compile(r"^(\d+)([ab])\.(png|jpe?g|gif|bmp)$", re.IGNORECASE)
+IMAGE_CACHE_NAME = ".offlinelist_imagescan.json"
+
+
+def iter_image_files(image_dir: str):
+    for dir_path, dir_names, file_names in os.walk(image_dir):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith("."))
+        for name in sorted(file_names):
+            match = IMAGE_NAME_PATTERN.match(name)
+            if match:
+                full_path = os.path.join(dir_path, name)
+                rel_path = os.path.relpath(full_path, image_dir).replace(os.sep, "/")
+                yield rel_path, full_path, int(match.group(1)), match.group(2).lower()
+
+
+def scan_image_file(full_path: str) -> list:
+    crc, size = crc32_file(full_path)
+    dimensions = read_image_size(full_path)
+    return [format_crc(crc), size, list(dimensions) if dimensions else None]
+
+
+def scan_image_directory(image_dir: str, workers: int = None, use_cache: bool = True, stats: dict = None) -> list:
+    """
+    画像フォルダを走査し、{"number", "side"（a / b）, "crc", "size", "dimensions", "path"} の一覧を返す。
+    CRC 計算はスレッドプールで並列に行い、サイズと更新日時が同じ画像はキャッシュを使う。
+    """
+    cache = FileHashCache(os.path.join(image_dir, IMAGE_CACHE_NAME) if use_cache else None)
+    images = []
+    pending = []
+    cached_images = 0
+    for rel_path, full_path, number, side in iter_image_files(image_dir):
+        st = os.stat(full_path)
+        image = {"number": number, "side": side, "path": full_path, "rel_path": rel_path}
+        cached = cache.get(rel_path, st)
+        if cached is not None:
+            image["crc"], image["size"], image["dimensions"] = cached
+            cached_images += 1
+        else:
+            pending.append((image, st))
+        images.append(image)
+
+    errors = []
+
+    def scan(item):
+        image, st = item
+        try:
+            return scan_image_file(image["path"])
+        except OSError as e:
+            errors.append(f"{image['rel_path']}: {e}")
+            return None
+
+    hashed_images = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (image, st), data in zip(pending, executor.map(scan, pending)):
+            if data is None:
+                images.remove(image)
+                continue
+            image["crc"], image["size"], image["dimensions"] = data
+            cache.put(image["rel_path"], st, data)
+            hashed_images += 1
+    cache.save()
+
+    # 同じ番号・同じ面の画像が複数あれば、先に見つかったものを使う
+    unique = {}
+    duplicates = []
+    for image in images:
+        key = (image["number"], image["side"])
+        if key in unique:
+            duplicates.append(image["rel_path"])
+        else:
+            unique[key] = image
+
+    if stats is not None:
+        stats["images"] = len(unique)
+        stats["hashed"] = hashed_images
+        stats["cached"] = cached_images
+        stats["duplicates"] = duplicates
+        stats["errors"] = errors
+    return sorted(unique.values(), key=lambda image: (image["number"], image["side"]))
+
+
+# -------------------------------
+# CSV への反映とサイズの確認
+# -------------------------------
+IMAGE_CSV_COLUMNS = {"a": "im1CRC", "b": "im2CRC"}
+
+
+def merge_images_into_csv(csv_path: str, images: list) -> dict:
+    # 画像がある番号は、見つからなかった面の CRC を空欄にする
+    crcs = {}
+    for image in images:
+        values = crcs.setdefault(str(image["number"]), {column: "" for column in IMAGE_CSV_COLUMNS.values()})
+        values[IMAGE_CSV_COLUMNS[image["side"]]] = image["crc"]
+
+    missing = []
+
+    def update_row(row: list, columns: dict) -> bool:
+        number_index = columns.get("imageNumber")
+        number = row[number_index].strip() if number_index is not None else ""
+        values = crcs.get(number)
+        if values is None:
+            missing.append(number)
+            return False
+        changed = False
+        for column, crc in values.items():
+            index = columns[column]
+            if row[index] != crc:
+                row[index] = crc
+                changed = True
+        return changed
+
+    updated = update_csv_rows(csv_path, list(IMAGE_CSV_COLUMNS.values()), update_row)
+    return {"updated_rows": updated, "missing_numbers": missing}
+
+
+SCREENSHOT_SIZE_KEYS = ("screenshotsWidth", "screenshotsHeight")
+DEFAULT_SCREENSHOT_SIZE = (320, 224)
+
+
+def read_dat_screenshot_size(xml_path: str) -> dict:
+    """DAT の <configuration> から screenshotsWidth / screenshotsHeight を読む（<games> の手前で読むのをやめる）。"""
+    parser = ET.XMLPullParser(events=("start", "end"))
+    values = {}
+    for text in iter_xml_text_chunks(xml_path, XmlTextDecoder.for_file(xml_path)):
+        parser.feed(text)
+        for event, elem in parser.read_events():
+            if event == "end" and elem.tag in SCREENSHOT_SIZE_KEYS:
+                values[elem.tag] = (elem.text or "").strip()
+            elif (event == "end" and elem.tag == "configuration") or (event == "start" and elem.tag == "games"):
+                return values
+    return values
+
+
+def parse_screenshot_size(value):
+    try:
+        number = int(str(value).strip())
+    except ValueError:
+        return None
+    return number if number > 0 else None
+
+
+def resolve_screenshot_size(csv_path: str, config: dict, width: int = None, height: int = None) -> tuple:
+    """
+    画像の期待サイズを決める。優先順位: 引数（--width / --height）
+    > CSV から生成した DAT（{CSV 名}.xml）の configuration > config.json > 320x224。
+    """
+    sources = []
+    xml_path = os.path.splitext(csv_path)[0] + ".xml"
+    if os.path.isfile(xml_path):
+        try:
+            sources.append(read_dat_screenshot_size(xml_path))
+        except (OSError, ValueError, ET.ParseError):
+            pass
+    sources.append(config)
+
+    size = []
+    for value, key, default in zip((width, height), SCREENSHOT_SIZE_KEYS, DEFAULT_SCREENSHOT_SIZE):
+        for source in sources:
+            if value is not None:
+                break
+            value = parse_screenshot_size(source.get(key, ""))
+        size.append(default if value is None else value)
+    return tuple(size)
+
+
+def find_size_mismatches(images: list, width: int, height: int) -> list:
+    return [image for image in images
+            if image["dimensions"] is None or tuple(image["dimensions"]) != (width, height)]
+
+
+# -------------------------------
+# 範囲ごとの画像 zip（1-500.zip など）
+# -------------------------------
+IMAGE_RANGE_SIZE = 500
+IMAGE_PACK_STATE_NAME = ".offlinelist_imagepack.json"
+# 画像は圧縮済みなので無圧縮で格納し、日時を固定して内容が同じなら同じ zip にする
+ZIP_FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def image_range(number: int, range_size: int = IMAGE_RANGE_SIZE) -> tuple:
+    start = (number - 1) // range_size * range_size + 1
+    return start, start + range_size - 1
+
+
+def group_images_by_range(images: list, range_size: int = IMAGE_RANGE_SIZE) -> dict:
+    groups = {}
+    for image in images:
+        if image["number"] >= 1:
+            groups.setdefault(image_range(image["number"], range_size), []).append(image)
+    return groups
+
+
+def range_signature(images: list) -> str:
+    import hashlib
+
+    h = hashlib.blake2b(digest_size=16)
+    for image in images:
+        h.update(f"{image['number']}{image['side']}:{image['crc']}:{image['size']}\n".encode("ascii"))
+    return h.hexdigest()
+
+
+def write_image_zip(zip_path: str, images: list):
+    with open_output(zip_path, "wb") as f:
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as zf:
+            for image in images:
+                extension = os.path.splitext(image["path"])[1].lower()
+                info = zipfile.ZipInfo(f"{image['number']}{image['side']}{extension}", ZIP_FIXED_DATE_TIME)
+                with open(image["path"], "rb") as source, zf.open(info, "w") as entry:
+                    while True:
+                        data = source.read(1024 * 1024)
+                        if not data:
+                            break
+                        entry.write(data)
+
+
+def pack_image_ranges(images: list, output_dir: str, range_size: int = IMAGE_RANGE_SIZE,
+                      workers: int = None, stats: dict = None) -> list:
+    """
+    output_dir に {start}-{end}.zip を作成し、作成した zip のパスを返す。
+    前回と同じ画像（番号・CRC・サイズ）の範囲は、zip が残っていれば作り直さない。
+    zip の ETag は serve コマンド用に output_dir の親フォルダの .offlinelist_serve.json に記録する。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, IMAGE_PACK_STATE_NAME)
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+
+    signatures = {}
+    pending = []
+    for (start, end), group in sorted(group_images_by_range(images, range_size).items()):
+        name = f"{start}-{end}.zip"
+        signatures[name] = range_signature(group)
+        zip_path = os.path.join(output_dir, name)
+        if previous.get(name) != signatures[name] or not os.path.exists(zip_path):
+            pending.append((zip_path, group))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda item: write_image_zip(*item), pending))
+
+    if signatures != previous:
+        with open_output(state_path, "w", encoding="utf-8") as f:
+            json.dump(signatures, f, ensure_ascii=False)
+
+    # serve コマンドで配信するときの ETag を記録する（{datCode} フォルダの親が配信のルート）
+    record_served_files(os.path.dirname(os.path.abspath(output_dir)),
+                        [os.path.join(output_dir, name) for name in sorted(signatures)])
+
+    if stats is not None:
+        stats["ranges"] = len(signatures)
+        stats["written"] = len(pending)
+    return [zip_path for zip_path, _ in pending]
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv: list) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py images",
+        description="画像フォルダの CRC32 を計算して CSV の im1CRC / im2CRC を埋め、"
+                    "OfflineList 用の画像 zip（1-500.zip …）を作成します。",
+    )
+    parser.add_argument("image_dir", help="画像フォルダ（{imageNumber}a.png / {imageNumber}b.png）")
+    parser.add_argument("csv_path", help="更新する CSV")
+    parser.add_argument("--dat-code", dest="datCode", required=True, help="画像 zip を置くフォルダ名（datCode）")
+    parser.add_argument("--output", help="{datCode} フォルダを作成する場所（既定: CSV と同じフォルダ）")
+    parser.add_argument("--width", type=int,
+                        help="screenshotsWidth（既定: CSV から生成した DAT の設定、config.json、なければ 320）")
+    parser.add_argument("--height", type=int,
+                        help="screenshotsHeight（既定: CSV から生成した DAT の設定、config.json、なければ 224）")
+    parser.add_argument("--range-size", type=int, default=IMAGE_RANGE_SIZE,
+                        help=f"1 つの zip に入れる番号の範囲（既定: {IMAGE_RANGE_SIZE}）")
+    parser.add_argument("--workers", type=int, default=None, help="CRC 計算・zip 作成のスレッド数")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わずにすべての画像を計算する")
+    parser.add_argument("--no-zip", action="store_true", help="CSV の更新だけを行い、zip は作成しない")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.image_dir):
+        print(f"エラー: フォルダではありません: {args.image_dir}", file=sys.stderr)
+        return 1
+
+    stats = {}
+    start = time.perf_counter()
+    try:
+        config = load_config() if args.width is None or args.height is None else {}
+        width, height = resolve_screenshot_size(args.csv_path, config, args.width, args.height)
+        images = scan_image_directory(args.image_dir, workers=args.workers, use_cache=not args.no_cache,
+                                      stats=stats)
+        scan_seconds = time.perf_counter() - start
+        result = merge_images_into_csv(args.csv_path, images)
+        pack_stats = {}
+        if not args.no_zip:
+            output_dir = os.path.join(args.output or os.path.dirname(os.path.abspath(args.csv_path)), args.datCode)
+            pack_image_ranges(images, output_dir, args.range_size, args.workers, pack_stats)
+    except (ValueError, OSError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    print(f"画像: {stats['images']:,} 件（計算 {stats['hashed']:,} 件 / キャッシュ利用 "
+          f"{stats['cached']:,} 件）  {scan_seconds:.2f} 秒")
+    print(f"CSV: {result['updated_rows']:,} 行を更新  画像のない行 {len(result['missing_numbers']):,} 行")
+    if pack_stats:
+        print(f"zip: {pack_stats['ranges']:,} 範囲中 {pack_stats['written']:,} 個を作成 → {output_dir}")
+    for image in find_size_mismatches(images, width, height):
+        size = "x".join(map(str, image["dimensions"])) if image["dimensions"] else "不明"
+        print(f"  [サイズ] {image['rel_path']}: {size}（期待値 {width}x{height}）")
+    for rel_path in stats["duplicates"]:
+        print(f"  [重複] {rel_path}")
+    for error in stats["errors"]:
+        print(f"  [NG] {error}")
+    return 1 if stats["errors"] else 0
@@ -0,0 +1,338 @@
+import json
+import mmap
+import os
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from generator import normalize_rom_key, open_output, update_csv_rows
+
+
+# -------------------------------
+# CRC32 計算（mmap + 大きな読み込みバッファ）
+# -------------------------------
+CRC_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def crc32_stream(f) -> int:
+    crc = 0
+    buffer = bytearray(CRC_BLOCK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        n = f.readinto(buffer)
+        if not n:
+            break
+        crc = zlib.crc32(view[:n], crc)
+    return crc
+
+
+def crc32_file(path: str) -> tuple:
+    """
+    ファイルの (CRC32, サイズ) を返す。
+    mmap で読めるファイルはコピーせずにブロック単位で計算する（zlib.crc32 は計算中に GIL を解放する）。
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0, 0
+
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return crc32_stream(f), size
+
+        with mm:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            crc = 0
+            view = memoryview(mm)
+            try:
+                for offset in range(0, size, CRC_BLOCK_SIZE):
+                    crc = zlib.crc32(view[offset:offset + CRC_BLOCK_SIZE], crc)
+            finally:
+                view.release()
+        return crc, size
+
+
+def format_crc(crc: int) -> str:
+    return f"{crc:08X}"
+
+
+# -------------------------------
+# 走査結果のキャッシュ（サイズと更新日時が同じファイルは再計算しない）
+# -------------------------------
+class FileHashCache:
+    VERSION = 1
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.files = {}
+        self.seen = set()
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    self.files = data.get("files", {})
+            except (OSError, ValueError):
+                self.files = {}
+
+    def get(self, key: str, st: os.stat_result):
+        self.seen.add(key)
+        entry = self.files.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["data"]
+        return None
+
+    def put(self, key: str, st: os.stat_result, data):
+        self.seen.add(key)
+        self.files[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "data": data}
+        self.dirty = True
+
+    def save(self):
+        if not self.path:
+            return
+        # 今回見つからなかったファイルの記録は捨てる
+        stale = [key for key in self.files if key not in self.seen]
+        for key in stale:
+            del self.files[key]
+        if not self.dirty and not stale:
+            return
+
+        with open_output(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "files": self.files}, f, ensure_ascii=False)
+        self.dirty = False
+
+
+# -------------------------------
+# ROM ディレクトリの走査
+# -------------------------------
+ROM_CACHE_NAME = ".offlinelist_romscan.json"
+
+
+class RomScanCache(FileHashCache):
+    # 2: zip の中身は拡張子で絞り込む前の一覧を記録する（--extensions を変えても使い回せる）
+    VERSION = 2
+
+
+def filter_rom_entries(entries: list, extensions: set = None) -> list:
+    if not extensions:
+        return entries
+    return [entry for entry in entries if os.path.splitext(entry[0])[1].lower() in extensions]
+
+
+def is_rom_file(path: str, extensions: set = None) -> bool:
+    suffix = os.path.splitext(path)[1].lower()
+    return not extensions or suffix == ".zip" or suffix in extensions
+
+
+def iter_rom_files(rom_dir: str):
+    for dir_path, dir_names, file_names in os.walk(rom_dir):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith("."))
+        for name in sorted(file_names):
+            if name.startswith("."):
+                continue
+            full_path = os.path.join(dir_path, name)
+            yield os.path.relpath(full_path, rom_dir).replace(os.sep, "/"), full_path
+
+
+def scan_rom_file(full_path: str, extensions: set = None) -> list:
+    """
+    1 ファイル分の [[ROM 名, CRC, サイズ], ...] を返す。
+    zip は中央ディレクトリに記録された CRC とサイズを使い、展開はしない。
+    """
+    if full_path.lower().endswith(".zip"):
+        entries = []
+        with zipfile.ZipFile(full_path) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                name = os.path.basename(info.filename)
+                if extensions and os.path.splitext(name)[1].lower() not in extensions:
+                    continue
+                entries.append([name, format_crc(info.CRC), info.file_size])
+        return entries
+
+    crc, size = crc32_file(full_path)
+    return [[os.path.basename(full_path), format_crc(crc), size]]
+
+
+def scan_rom_directory(rom_dir: str,
+                       workers: int = None,
+                       extensions: set = None,
+                       use_cache: bool = True,
+                       stats: dict = None) -> list:
+    """
+    ROM ディレクトリ（サブディレクトリと zip の中を含む）を走査し、
+    {"name", "crc", "size", "path"} の一覧を返す。CRC 計算はスレッドプールで並列に行う。
+    """
+    cache = RomScanCache(os.path.join(rom_dir, ROM_CACHE_NAME) if use_cache else None)
+    results = {}
+    pending = []
+    cached_files = 0
+    hashed_bytes = 0
+
+    for rel_path, full_path in iter_rom_files(rom_dir):
+        if not is_rom_file(rel_path, extensions):
+            # 対象外の拡張子のファイルもキャッシュには残す（--extensions を変えて走査し直しても使い回せる）
+            cache.seen.add(rel_path)
+            continue
+        st = os.stat(full_path)
+        cached = cache.get(rel_path, st)
+        if cached is not None:
+            results[rel_path] = filter_rom_entries(cached, extensions)
+            cached_files += 1
+        else:
+            pending.append((rel_path, full_path, st))
+
+    errors = []
+
+    def scan(item):
+        rel_path, full_path, st = item
+        try:
+            # キャッシュには絞り込む前の一覧を入れる
+            return scan_rom_file(full_path)
+        except (OSError, zipfile.BadZipFile) as e:
+            errors.append(f"{rel_path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (rel_path, full_path, st), entries in zip(pending, executor.map(scan, pending)):
+            if entries is None:
+                continue
+            results[rel_path] = filter_rom_entries(entries, extensions)
+            cache.put(rel_path, st, entries)
+            if not full_path.lower().endswith(".zip"):
+                hashed_bytes += st.st_size
+
+    cache.save()
+
+    roms = []
+    for rel_path in sorted(results):
+        for name, crc, size in results[rel_path]:
+            roms.append({"name": name, "crc": crc, "size": size, "path": rel_path})
+
+    if stats is not None:
+        stats["files"] = len(results)
+        stats["cached"] = cached_files
+        stats["hashed_bytes"] = hashed_bytes
+        stats["errors"] = errors
+    return roms
+
+
+# -------------------------------
+# CSV への反映（タイトルまたはファイル名で照合）
+# -------------------------------
+ROM_CSV_COLUMNS = ["romCRC", "romSize", "extension"]
+
+
+def merge_roms_into_csv(csv_path: str,
+                        roms: list,
+                        match_column: str = "title",
+                        only_empty: bool = False) -> dict:
+    """
+    ROM ファイル名（拡張子を除く）と CSV の match_column の値を照合し、
+    一致した行の romCRC / romSize / extension を埋める。
+    """
+    index = {}
+    duplicates = []
+    for rom in roms:
+        key = normalize_rom_key(os.path.splitext(rom["name"])[0])
+        if key in index:
+            duplicates.append(rom)
+        else:
+            index[key] = rom
+
+    matched = set()
+    unmatched_rows = 0
+
+    def find_rom(value: str):
+        rom = index.get(normalize_rom_key(value))
+        if rom is None:
+            # ファイル名の列なら拡張子付きで書かれていることもある
+            stem, suffix = os.path.splitext(value)
+            if suffix:
+                rom = index.get(normalize_rom_key(stem))
+        return rom
+
+    def update_row(row: list, columns: dict) -> bool:
+        nonlocal unmatched_rows
+        match_index = columns.get(match_column)
+        rom = find_rom(row[match_index] if match_index is not None else "")
+        if rom is None:
+            unmatched_rows += 1
+            return False
+
+        matched.add(id(rom))
+        values = {
+            "romCRC": rom["crc"],
+            "romSize": str(rom["size"]),
+            "extension": os.path.splitext(rom["name"])[1],
+        }
+        changed = False
+        for column, value in values.items():
+            index = columns[column]
+            if only_empty and row[index].strip():
+                continue
+            if row[index] != value:
+                row[index] = value
+                changed = True
+        return changed
+
+    updated = update_csv_rows(csv_path, ROM_CSV_COLUMNS, update_row)
+
+    return {
+        "updated_rows": updated,
+        "unmatched_rows": unmatched_rows,
+        "unmatched_roms": [rom for rom in index.values() if id(rom) not in matched],
+        "duplicate_roms": duplicates,
+    }
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv: list) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py scan-roms",
+        description="ROM ディレクトリを走査して CRC32 / サイズを計算し、CSV の romCRC / romSize / extension を埋めます。",
+    )
+    parser.add_argument("rom_dir", help="ROM ディレクトリ（zip の中も走査します）")
+    parser.add_argument("csv_path", help="更新する CSV")
+    parser.add_argument("--match-column", default="title",
+                        help="ROM ファイル名と照合する CSV の列（既定: title）")
+    parser.add_argument("--extensions", help="対象にする拡張子（カンマ区切り、例: nes,fds）")
+    parser.add_argument("--workers", type=int, default=None, help="CRC 計算のスレッド数")
+    parser.add_argument("--only-empty", action="store_true", help="空欄のセルだけを埋める")
+    parser.add_argument("--no-cache", action="store_true", help="走査キャッシュを使わずに全ファイルを計算する")
+    args = parser.parse_args(argv)
+
+    extensions = None
+    if args.extensions:
+        extensions = {"." + ext.strip().lstrip(".").lower() for ext in args.extensions.split(",") if ext.strip()}
+
+    stats = {}
+    start = time.perf_counter()
+    roms = scan_rom_directory(args.rom_dir, workers=args.workers, extensions=extensions,
+                              use_cache=not args.no_cache, stats=stats)
+    scan_seconds = time.perf_counter() - start
+    result = merge_roms_into_csv(args.csv_path, roms, match_column=args.match_column,
+                                 only_empty=args.only_empty)
+
+    megabytes = stats["hashed_bytes"] / (1024 * 1024)
+    rate = megabytes / scan_seconds if scan_seconds > 0 else 0
+    print(f"走査: {stats['files']:,} ファイル / ROM {len(roms):,} 件"
+          f"（キャッシュ利用 {stats['cached']:,} ファイル）  {megabytes:,.1f} MB を計算  "
+          f"{scan_seconds:.2f} 秒  {rate:,.1f} MB/秒")
+    print(f"CSV: {result['updated_rows']:,} 行を更新  照合できなかった行 {result['unmatched_rows']:,} 行")
+    for rom in result["unmatched_roms"]:
+        print(f"  [未使用] {rom['path']}: {rom['name']}")
+    for rom in result["duplicate_roms"]:
+        print(f"  [重複] {rom['path']}: {rom['name']}")
+    for error in stats["errors"]:
+        print(f"  [NG] {error}")
+    return 1 if stats["errors"] else 0
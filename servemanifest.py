@@ -0,0 +1,87 @@
+"""
+serve コマンドで配信するファイルの記録（.offlinelist_serve.json）。
+
+zip の出力（--zip / images コマンド）の後に、配信してよいファイルとその ETag をここに記録する。
+update_server は記録されたファイルだけを配信し、記録済みの ETag で If-None-Match を判定する。
+変換処理（generator / imagepack）はこのモジュールだけを使い、サーバー本体には依存しない。
+"""
+import os
+from contextlib import contextmanager
+
+from romscan import FileHashCache
+
+
+SERVE_MANIFEST_NAME = ".offlinelist_serve.json"
+ETAG_READ_SIZE = 1024 * 1024
+
+
+# -------------------------------
+# ETag
+# -------------------------------
+def new_etag_hash():
+    import hashlib
+
+    return hashlib.blake2b(digest_size=16)
+
+
+def format_etag(h) -> str:
+    return f'"{h.hexdigest()}"'
+
+
+def compute_etag(f) -> str:
+    h = new_etag_hash()
+    while True:
+        data = f.read(ETAG_READ_SIZE)
+        if not data:
+            break
+        h.update(data)
+    return format_etag(h)
+
+
+# -------------------------------
+# 記録
+# -------------------------------
+def served_key(root_dir: str, path: str) -> str:
+    return os.path.relpath(path, root_dir).replace(os.sep, "/")
+
+
+@contextmanager
+def lock_manifest(root_dir: str):
+    """.offlinelist_serve.json の読み書きを、ほかのプロセス（並列変換のワーカー）と排他にする。"""
+    with open(os.path.join(root_dir, SERVE_MANIFEST_NAME + ".lock"), "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def record_served_files(root_dir: str, paths: list):
+    """
+    root_dir 以下の書き終えたファイル（paths）の ETag を root_dir/.offlinelist_serve.json に記録する。
+    ETag はサイズと更新日時が記録と違うファイルだけ計算し直す。消えたファイルの記録は捨てる。
+    記録はロックした上で読み直し、一時ファイル経由で置き換える。
+    """
+    with lock_manifest(root_dir):
+        cache = FileHashCache(os.path.join(root_dir, SERVE_MANIFEST_NAME))
+        cache.seen.update(key for key in cache.files if os.path.isfile(os.path.join(root_dir, key)))
+        for path in paths:
+            key = served_key(root_dir, path)
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if cache.get(key, st) is None:
+                    cache.put(key, st, compute_etag(f))
+        cache.save()
@@ -0,0 +1,37 @@
+import csv
+import os
+import sys
+
+import pytest
+
+# テストはリポジトリ直下のモジュール（generator.py など）をそのまま import する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+import generator  # noqa: E402
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """rows（先頭はヘッダー）を UTF-8 の CSV に書き、そのパスを返す。"""
+
+    def write(rows: list, name: str = "games.csv") -> str:
+        path = tmp_path / name
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows)
+        return str(path)
+
+    return write
+
+
+@pytest.fixture
+def convert_csv():
+    """ベンチマークと同じ設定で CSV → XML を変換する（増分生成・zip は既定で無効）。"""
+
+    def convert(csv_path: str, stats: dict = None, **kwargs) -> str:
+        options = dict(config={}, stats=stats, incremental=False, zip_output=False, output_encoding="utf-8")
+        options.update(kwargs)
+        return generator.generate_xml_from_csv(
+            csv_path=csv_path, extension_suffix=benchmark.BENCH_EXTENSION, **options, **benchmark.BENCH_SETTINGS)
+
+    return convert
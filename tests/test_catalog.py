@@ -0,0 +1,116 @@
+import csv
+
+import pytest
+
+import benchmark
+import catalog
+import generator
+
+SETTINGS = {
+    "datName": benchmark.BENCH_SETTINGS["dat_name"],
+    "imFolder": benchmark.BENCH_SETTINGS["im_folder"],
+    "system": benchmark.BENCH_SETTINGS["system"],
+    "screenshotsWidth": benchmark.BENCH_SETTINGS["ss_width"],
+    "screenshotsHeight": benchmark.BENCH_SETTINGS["ss_height"],
+    "extension": benchmark.BENCH_EXTENSION,
+    "datCode": benchmark.BENCH_SETTINGS["dat_code"],
+}
+
+
+def read_bytes(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read_rows(path) -> list:
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture
+def games_csv(tmp_path) -> str:
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 300)
+    return csv_path
+
+
+@pytest.fixture
+def conn(tmp_path, games_csv):
+    conn = catalog.open_catalog(str(tmp_path / "games.db"), create=True)
+    assert catalog.import_games(conn, [games_csv], settings=SETTINGS) == 300
+    yield conn
+    conn.close()
+
+
+def test_round_trip_matches_direct_conversion(tmp_path, monkeypatch, conn, games_csv, convert_csv):
+    monkeypatch.setattr(generator, "today_dat_version", lambda: "20240101")
+    monkeypatch.setattr(catalog, "today_dat_version", lambda: "20240101")
+
+    csv_path = str(tmp_path / "exported.csv")
+    assert catalog.export_catalog_csv(conn, csv_path) == 300
+    assert read_rows(csv_path) == read_rows(games_csv)
+
+    # カタログから書き出した DAT は、CSV を直接変換した DAT と同じになる
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    xml_path = str(out_dir / "games.xml")
+    settings = catalog.load_settings(conn)
+    assert settings == SETTINGS
+    assert catalog.export_catalog_xml(conn, xml_path, settings, {}) == 300
+    assert read_bytes(xml_path) == read_bytes(convert_csv(games_csv))
+    assert read_bytes(out_dir / (SETTINGS["datCode"] + ".txt")) == b"20240101"
+
+    # 書き出した DAT を取り込み直しても同じ内容になる
+    catalog.import_games(conn, [xml_path], replace=True)
+    assert catalog.export_catalog_csv(conn, csv_path) == 300
+    assert read_rows(csv_path) == read_rows(games_csv)
+
+
+def test_query_and_update(tmp_path, conn, games_csv):
+    rows = read_rows(games_csv)[1:]
+    crc_column = generator.CSV_FIELDNAMES.index("romCRC")
+    target = rows[41]
+
+    where, params = catalog.build_where(crc=target[crc_column].lower())
+    assert [list(row) for row in catalog.iter_catalog_rows(conn, where, params)] == [target]
+    assert catalog.update_games(conn, {"publisher": "更新した会社", "im2CRC": ""}, where, params) == 1
+
+    where, params = catalog.build_where(publisher="更新した会社")
+    found = list(catalog.iter_catalog_rows(conn, where, params))
+    assert [row[0] for row in found] == [target[0]]
+
+    # im2CRC を空欄にした 1 件も、空欄の列の検索に含まれる
+    im2_column = generator.CSV_FIELDNAMES.index("im2CRC")
+    missing = sum(1 for row in rows if not row[im2_column].strip() or row is target)
+    where, params = catalog.build_where(missing=["im2CRC"])
+    assert conn.execute(f"SELECT count(*) FROM games{where}", params).fetchone()[0] == missing
+
+    # 更新は書き出しにも反映される
+    where, params = catalog.build_where(image=target[0])
+    csv_path = str(tmp_path / "one.csv")
+    assert catalog.export_catalog_csv(conn, csv_path, where, params) == 1
+    exported = read_rows(csv_path)[1]
+    assert exported[generator.CSV_FIELDNAMES.index("publisher")] == "更新した会社"
+
+
+def test_invalid_column_and_missing_catalog(tmp_path, conn):
+    with pytest.raises(ValueError):
+        catalog.build_where(missing=["unknown"])
+    with pytest.raises(ValueError):
+        catalog.update_games(conn, {"unknown": "x"}, "", [])
+    with pytest.raises(ValueError):
+        catalog.open_catalog(str(tmp_path / "missing.db"))
+
+
+def test_catalog_command(tmp_path, games_csv, capsys):
+    db_path = str(tmp_path / "cli.db")
+    assert catalog.main(["import", db_path, games_csv, "--dat-name", "x"]) == 0
+    assert catalog.main(["query", db_path, "--image", "7", "--format", "json"]) == 0
+    capsys.readouterr()
+    # 条件なしの一括変更は --all が必要
+    assert catalog.main(["update", db_path, "--set", "comment=x"]) == 1
+    assert "--all" in capsys.readouterr().err
+    assert catalog.main(["update", db_path, "--image", "7", "--set", "comment=変更"]) == 0
+    assert catalog.main(["query", db_path, "--where", "comment = '変更'", "--count"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "1"
+    assert catalog.main(["query", db_path, "--image", "9999"]) == 1
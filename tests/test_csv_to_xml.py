@@ -0,0 +1,55 @@
+import pytest
+
+import benchmark
+import generator
+
+# 特殊文字・空欄・複数行の値・列の順序違いを含む CSV
+EDGE_ROWS = [
+    ["imageNumber", "title", "publisher", "romCRC", "comment", "extension", "romSize"],
+    ["1", "A & B <x> \"q\" 'a'", "", "ABCD1234", "multi\nline\n\nblank", "", ""],
+    ["2", "", "  ", "", "   ", ".n&s", ""],
+    ["3", "ソフト sep", "pub\ttab", "  ", "xy", "\"e\"", "5"],
+    ["4", "trail\n", "\nlead", "1", "c", ".a\nb", "6"],
+]
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# -------------------------------
+# <game> の組み立て（ET + minidom の従来の出力と同じバイト列になること）
+# -------------------------------
+def test_serializer_matches_minidom_reference_synthetic(tmp_path, convert_csv):
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 500)
+    output_path = convert_csv(csv_path)
+    reference_path = str(tmp_path / "reference.xml")
+    assert benchmark.write_reference_xml(csv_path, reference_path) == 500
+    assert read_bytes(output_path) == read_bytes(reference_path)
+
+
+def test_serializer_matches_minidom_reference_edge_cases(tmp_path, write_csv, convert_csv):
+    csv_path = write_csv(EDGE_ROWS)
+    stats = {}
+    output_path = convert_csv(csv_path, stats)
+    reference_path = str(tmp_path / "reference.xml")
+    benchmark.write_reference_xml(csv_path, reference_path)
+    assert read_bytes(output_path) == read_bytes(reference_path)
+    assert stats["rows"] == len(EDGE_ROWS) - 1
+
+
+def test_serializer_matches_minidom_reference_empty_game(tmp_path, write_csv, convert_csv):
+    # extension の列だけなら子要素がないので <game/> になる（改行を含む行も同じ）
+    csv_path = write_csv([["extension"], [".nes"], [""], ["a\nb"]])
+    output_path = convert_csv(csv_path)
+    reference_path = str(tmp_path / "reference.xml")
+    benchmark.write_reference_xml(csv_path, reference_path)
+    assert read_bytes(output_path) == read_bytes(reference_path)
+    assert read_bytes(output_path).count(b"  <game/>\n") == 3
+
+
+def test_empty_csv_path_is_rejected():
+    with pytest.raises(ValueError):
+        generator.generate_xml_from_csv("", "", "", "", "", "", "", "", config={})
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+import datindex
+
+DAT = """<?xml version="1.0" encoding="{declaration}"?>
+<dat>
+  <configuration><datName>x</datName></configuration>
+  <!-- <game><title>コメント内</title></game> -->
+  <games>
+    <game>
+      <imageNumber>1</imageNumber>
+      <releaseNumber>0001</releaseNumber>
+      <title>ドラゴン クエスト</title>
+      <files><romCRC extension=".nes">0123abcd</romCRC><romCRC extension=".fds">FFFF0000</romCRC></files>
+    </game>
+    <game>
+      <imageNumber>2</imageNumber>
+      <releaseNumber>0002</releaseNumber>
+      <title>Dragon Slayer</title>
+      <files><romCRC extension=".nes">11112222</romCRC></files>
+    </game>
+    <game>
+      <imageNumber>3</imageNumber>
+      <releaseNumber>0003</releaseNumber>
+      <title>ＤＲＡＧＯＮ  ＳＬＡＹＥＲ</title>
+      <files><romCRC extension=".nes">33334444</romCRC></files>
+    </game>
+  </games>
+</dat>
+"""
+
+
+def write_dat(tmp_path, encoding: str = "utf-8") -> str:
+    path = tmp_path / "games.xml"
+    declaration = "Shift_JIS" if encoding == "cp932" else "UTF-8"
+    path.write_bytes(DAT.format(declaration=declaration).encode(encoding))
+    return str(path)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp932"])
+def test_build_and_lookup(tmp_path, encoding):
+    index = datindex.DatIndex.build(write_dat(tmp_path, encoding))
+    assert len(index.spans) == 3
+    # romCRC は大文字・小文字を区別せず、2 件目以降の <romCRC> も引ける
+    assert index.find("romCRC", "0123ABCD") == [0]
+    assert index.find("romCRC", "ffff0000") == [0]
+    assert index.find("releaseNumber", "0002") == [1]
+    assert index.find("imageNumber", "3") == [2]
+    # タイトルは全角・半角、大文字・小文字、連続する空白の違いを無視する
+    assert index.find("title", "dragon slayer") == [1, 2]
+    assert index.find("title", "クエスト", contains=True) == [0]
+    assert index.find("title", "missing") == []
+
+    texts = dict(index.read_games([2, 0]))
+    assert texts[0].startswith("<game>") and "ドラゴン クエスト" in texts[0]
+    assert texts[2].endswith("</game>") and "33334444" in texts[2]
+
+
+def test_saved_index_is_reused_until_dat_changes(tmp_path):
+    dat_path = write_dat(tmp_path)
+    stats = {}
+    first = datindex.open_index(dat_path, stats=stats)
+    assert stats == {"built": True, "games": 3}
+    assert os.path.exists(datindex.index_path(dat_path))
+
+    stats = {}
+    loaded = datindex.open_index(dat_path, stats=stats)
+    assert stats["built"] is False
+    assert loaded.spans == first.spans
+    assert loaded.keys == first.keys
+
+    # DAT が変わったら作り直す
+    with open(dat_path, "ab") as f:
+        f.write(b"\n")
+    stats = {}
+    datindex.open_index(dat_path, stats=stats)
+    assert stats["built"] is True
+
+
+def test_empty_dat_is_rejected(tmp_path):
+    path = tmp_path / "games.xml"
+    path.write_bytes(b"<dat><games/></dat>")
+    with pytest.raises(ValueError):
+        datindex.DatIndex.build(str(path))
+
+
+def test_lookup_command(tmp_path, capsys):
+    dat_path = write_dat(tmp_path)
+    assert datindex.main([dat_path, "--title", "DRAGON SLAYER", "--release", "0003", "--format", "json"]) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert len(out) == 1
+    game = json.loads(out[0])
+    assert (game["imageNumber"], game["romCRC"], game["extension"]) == ("3", "33334444", ".nes")
+
+    assert datindex.main([dat_path, "--crc", "00000000"]) == 1
+    assert "見つかりませんでした。" in capsys.readouterr().err
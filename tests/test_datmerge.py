@@ -0,0 +1,109 @@
+import csv
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import datmerge
+import generator
+
+HEADER = ["imageNumber", "releaseNumber", "title", "romSize", "romCRC", "extension"]
+
+SECOND_DAT = """<?xml version="1.0" encoding="UTF-8"?>
+<dat>
+  <games>
+    <game>
+      <imageNumber>1</imageNumber><releaseNumber>1</releaseNumber><title>ＡＬＰＨＡ</title><romSize>10</romSize>
+      <files><romCRC extension=".nes">0000aaaa</romCRC></files>
+    </game>
+    <game>
+      <imageNumber>2</imageNumber><releaseNumber>2</releaseNumber><title>Other Title</title><romSize>20</romSize>
+      <files><romCRC extension=".nes">0000BBBB</romCRC></files>
+    </game>
+    <game>
+      <imageNumber>3</imageNumber><releaseNumber>3</releaseNumber><title>Gamma</title><romSize>30</romSize>
+      <files><romCRC extension=".nes">0000CCCC</romCRC></files>
+    </game>
+  </games>
+</dat>
+"""
+
+
+@pytest.fixture
+def inputs(tmp_path, write_csv):
+    first = write_csv([
+        HEADER,
+        ["10", "10", "Alpha", "10", "0000AAAA", ".nes"],
+        ["11", "11", "Beta", "", "0000BBBB", ".nes"],
+        ["12", "12", "No CRC", "", "", ""],
+    ], "first.csv")
+    second = tmp_path / "second.xml"
+    second.write_text(SECOND_DAT, encoding="utf-8")
+    return [first, str(second)]
+
+
+def read_csv(path: str, encoding: str = "utf-8") -> list:
+    with open(path, newline="", encoding=encoding) as f:
+        return list(csv.reader(f))
+
+
+def test_overlapping_crcs_keep_the_first_input(tmp_path, inputs):
+    output_path = str(tmp_path / "merged.csv")
+    plan = datmerge.merge_dats(inputs, output_path)
+
+    rows = read_csv(output_path)
+    assert rows[0] == generator.CSV_FIELDNAMES
+    column = datmerge.COLUMN
+    assert [(row[column["title"]], row[column["romCRC"]]) for row in rows[1:]] == [
+        ("Alpha", "0000AAAA"), ("Beta", "0000BBBB"), ("No CRC", ""), ("Gamma", "0000CCCC")]
+    # 番号は 1 から振り直す
+    assert [row[column["imageNumber"]] for row in rows[1:]] == ["1", "2", "3", "4"]
+    assert [row[column["releaseNumber"]] for row in rows[1:]] == ["1", "2", "3", "4"]
+    assert (plan.games, plan.duplicates, plan.without_crc, plan.written) == (6, 2, 1, 4)
+
+    # 大文字・小文字の違いだけの CRC や、全角・半角の違いだけのタイトルは衝突にしない
+    assert [(c["romCRC"], c["fields"], c["kept_source"], c["kept_number"], c["number"]) for c in plan.conflicts] == [
+        ("0000BBBB", ["title"], 0, 1, 1)]
+
+
+def test_keep_numbers_and_number_map(tmp_path, inputs):
+    output_path = str(tmp_path / "merged.csv")
+    map_path = str(tmp_path / "numbers.csv")
+    datmerge.merge_dats(inputs, output_path, renumber=False, number_map_path=map_path)
+    rows = read_csv(output_path)
+    assert [row[datmerge.COLUMN["imageNumber"]] for row in rows[1:]] == ["10", "11", "12", "3"]
+
+    datmerge.merge_dats(inputs, output_path, number_map_path=map_path)
+    assert read_csv(map_path, "utf-8-sig") == [
+        ["source", "imageNumber", "releaseNumber", "newNumber"],
+        [inputs[0], "10", "10", "1"],
+        [inputs[0], "11", "11", "2"],
+        [inputs[0], "12", "12", "3"],
+        [inputs[1], "3", "3", "4"],
+    ]
+
+
+def test_merge_into_dat(tmp_path, inputs):
+    output_path = str(tmp_path / "merged.xml")
+    settings = {"datName": "統合版", "imFolder": "img", "system": "fc", "screenshotsWidth": "256",
+                "screenshotsHeight": "240", "extension": "nes", "datCode": "merged"}
+    datmerge.merge_dats(inputs, output_path, settings, config={})
+    root = ET.parse(output_path).getroot()
+    assert root.findtext("configuration/datName") == "統合版"
+    games = root.findall("games/game")
+    assert [game.findtext("title") for game in games] == ["Alpha", "Beta", "No CRC", "Gamma"]
+    # extension 列の値をそのまま使う（空欄のまま）
+    assert [game.find("files/romCRC").get("extension") for game in games] == [".nes", ".nes", "", ".nes"]
+
+
+def test_output_must_differ_from_inputs(inputs):
+    with pytest.raises(ValueError):
+        datmerge.merge_dats(inputs, inputs[0])
+
+
+def test_merge_command_writes_conflicts(tmp_path, inputs, capsys):
+    output_path = str(tmp_path / "merged.csv")
+    conflicts_path = str(tmp_path / "conflicts.csv")
+    assert datmerge.main(inputs + ["-o", output_path, "--conflicts", conflicts_path]) == 0
+    assert "重複を 2 件除外" in capsys.readouterr().out
+    assert read_csv(conflicts_path, "utf-8-sig")[1] == [
+        "0000BBBB", "title", inputs[0], "2", inputs[1], "2", "Other Title", "20"]
@@ -0,0 +1,57 @@
+import csv
+
+import pytest
+
+import generator
+
+GAMES = """<dat>
+  <games>
+    <game><imageNumber>1</imageNumber><title>ソフト &amp; ゲーム</title></game>
+    <game><imageNumber>2</imageNumber><title>①機種依存文字</title></game>
+  </games>
+</dat>
+"""
+
+
+def write_bytes(tmp_path, data: bytes) -> str:
+    path = tmp_path / "games.xml"
+    path.write_bytes(data)
+    return str(path)
+
+
+def read_titles(csv_path: str) -> list:
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [row[2] for row in csv.reader(f)][1:]
+
+
+@pytest.mark.parametrize("data, expected", [
+    ("﻿" + GAMES, ("utf-8-sig", "bom")),
+    ('<?xml version="1.0" encoding="Shift_JIS"?>\n' + GAMES, ("cp932", "declaration")),
+    ('<?xml version="1.0" encoding="UTF-8"?>\n' + GAMES, ("utf-8", "declaration")),
+    (GAMES, ("utf-8", "heuristic")),
+])
+def test_sniff_encoding(tmp_path, data, expected):
+    encoding = "cp932" if "Shift_JIS" in data else "utf-8"
+    assert generator.sniff_encoding(write_bytes(tmp_path, data.encode(encoding))) == expected
+
+
+def test_sniff_encoding_without_declaration_falls_back_to_cp932(tmp_path):
+    assert generator.sniff_encoding(write_bytes(tmp_path, GAMES.encode("cp932"))) == ("cp932", "heuristic")
+
+
+def test_declaration_that_does_not_match_content_is_ignored(tmp_path):
+    # UTF-8 と宣言されていても、中身が Shift_JIS なら中身から判定する
+    data = ('<?xml version="1.0" encoding="UTF-8"?>\n' + GAMES).encode("cp932")
+    assert generator.sniff_encoding(write_bytes(tmp_path, data)) == ("cp932", "heuristic")
+
+
+@pytest.mark.parametrize("data", [
+    ("﻿" + GAMES).encode("utf-8"),
+    GAMES.encode("cp932"),
+    ('<?xml version="1.0" encoding="Shift_JIS"?>\n' + GAMES).encode("cp932"),
+])
+def test_generate_csv_from_xml_detects_encoding(tmp_path, data):
+    stats = {}
+    csv_path = generator.generate_csv_from_xml(write_bytes(tmp_path, data), stats)
+    assert read_titles(csv_path) == ["ソフト & ゲーム", "①機種依存文字"]
+    assert stats["replacements"] == 0
@@ -0,0 +1,51 @@
+import csv
+
+import catalog
+import datmerge
+import generator
+
+WIDTH = len(generator.CSV_FIELDNAMES)
+
+
+def standard_rows() -> list:
+    # CSV_FIELDNAMES と同じ並びのヘッダーで、セルが多すぎる行と少なすぎる行を含む
+    full = [str(i) for i in range(WIDTH)]
+    return [
+        generator.CSV_FIELDNAMES,
+        full + ["extra", "cells"],
+        full[:3],
+        full,
+    ]
+
+
+def test_iter_game_rows_always_matches_fieldnames(write_csv):
+    csv_path = write_csv(standard_rows())
+    rows = list(generator.iter_game_rows(csv_path))
+    assert [len(row) for row in rows] == [WIDTH] * 3
+    assert rows[0] == [str(i) for i in range(WIDTH)]
+    assert rows[1] == ["0", "1", "2"] + [""] * (WIDTH - 3)
+
+
+def test_iter_game_rows_reorders_columns(write_csv):
+    csv_path = write_csv([["title", "imageNumber", "title"], ["A", "1", "B", "extra"], ["C"]])
+    rows = list(generator.iter_game_rows(csv_path, ["imageNumber", "title", "romCRC"]))
+    assert rows == [["1", "A", ""], ["", "C", ""]]
+
+
+def test_catalog_imports_rows_with_extra_cells(tmp_path, write_csv):
+    csv_path = write_csv(standard_rows())
+    conn = catalog.open_catalog(str(tmp_path / "games.sqlite"), create=True)
+    try:
+        assert catalog.import_games(conn, [csv_path]) == 3
+    finally:
+        conn.close()
+
+
+def test_merged_csv_has_no_extra_cells(tmp_path, write_csv):
+    csv_path = write_csv(standard_rows())
+    output_path = str(tmp_path / "merged.csv")
+    datmerge.merge_dats([csv_path], output_path, renumber=False)
+    with open(output_path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == generator.CSV_FIELDNAMES
+    assert all(len(row) == WIDTH for row in rows)
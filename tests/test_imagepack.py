@@ -0,0 +1,50 @@
+import benchmark
+import generator
+import imagepack
+
+
+def write_dat(tmp_path, width: str, height: str, encoding: str = "utf-8") -> str:
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 3)
+    settings = dict(benchmark.BENCH_SETTINGS, ss_width=width, ss_height=height)
+    generator.generate_xml_from_csv(csv_path=csv_path, extension_suffix="nes", config={}, incremental=False,
+                                    zip_output=False, output_encoding=encoding, **settings)
+    return csv_path
+
+
+def test_screenshot_size_defaults_to_320x224(tmp_path):
+    csv_path = str(tmp_path / "games.csv")
+    assert imagepack.resolve_screenshot_size(csv_path, {}) == (320, 224)
+
+
+def test_screenshot_size_from_config(tmp_path):
+    csv_path = str(tmp_path / "games.csv")
+    config = {"screenshotsWidth": "256", "screenshotsHeight": ""}
+    assert imagepack.resolve_screenshot_size(csv_path, config) == (256, 224)
+
+
+def test_screenshot_size_from_dat_settings(tmp_path):
+    csv_path = write_dat(tmp_path, "256", "240", "cp932")
+    config = {"screenshotsWidth": "160", "screenshotsHeight": "144"}
+    assert imagepack.resolve_screenshot_size(csv_path, config) == (256, 240)
+    # 引数で指定した値が優先される
+    assert imagepack.resolve_screenshot_size(csv_path, config, height=480) == (256, 480)
+
+
+def test_scan_counts_hashed_and_cached_images(tmp_path):
+    image_dir = tmp_path / "img"
+    (image_dir / "sub").mkdir(parents=True)
+    for name in ("1a.png", "1b.png", "2a.png", "sub/1a.png"):
+        (image_dir / name).write_bytes(name.encode("ascii"))
+
+    stats = {}
+    images = imagepack.scan_image_directory(str(image_dir), stats=stats)
+    # sub/1a.png は 1a.png と同じ番号・面なので一覧には入らないが、CRC は計算している
+    assert len(images) == stats["images"] == 3
+    assert stats["duplicates"] == ["sub/1a.png"]
+    assert (stats["hashed"], stats["cached"]) == (4, 0)
+
+    (image_dir / "2a.png").write_bytes(b"changed")
+    stats = {}
+    imagepack.scan_image_directory(str(image_dir), stats=stats)
+    assert (stats["hashed"], stats["cached"]) == (1, 3)
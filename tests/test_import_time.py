@@ -0,0 +1,35 @@
+import os
+import py_compile
+
+import generator
+
+# 共有の CI などでは計測がぶれるため、テストでは CLI の予算に余裕を持たせる
+# （環境変数 OFFLINELIST_IMPORT_BUDGET_MS を設定した場合はその値をそのまま使う）
+IMPORT_TIME_HEADROOM = 2
+
+
+def test_import_time_within_budget():
+    # 通常の実行と同じく .pyc がある状態で測る（PYTHONDONTWRITEBYTECODE が設定されていても）
+    py_compile.compile(generator.__file__, doraise=True)
+    if os.environ.get(generator.IMPORT_TIME_BUDGET_ENV, "").strip():
+        budget = generator.import_time_budget_ms()
+    else:
+        budget = generator.IMPORT_TIME_BUDGET_MS * IMPORT_TIME_HEADROOM
+    # 数回計測した最小値で比べる（importtime コマンドと同じ）
+    runs = [generator.measure_import_time("generator") for _ in range(5)]
+    best = min(run["total_ms"] for run in runs)
+    assert best <= budget
+
+
+def test_import_budget_from_environment(monkeypatch):
+    monkeypatch.setenv(generator.IMPORT_TIME_BUDGET_ENV, "120")
+    assert generator.import_time_budget_ms() == 120
+    monkeypatch.setenv(generator.IMPORT_TIME_BUDGET_ENV, "")
+    assert generator.import_time_budget_ms() == generator.IMPORT_TIME_BUDGET_MS
+
+
+def test_import_does_not_load_heavy_modules():
+    modules = generator.measure_import_time("generator")["modules"]
+    assert "generator" in modules
+    loaded = [name for name in generator.IMPORT_FORBIDDEN_MODULES if name in modules]
+    assert loaded == []
@@ -0,0 +1,137 @@
+import csv
+import os
+
+import benchmark
+import generator
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def set_today(monkeypatch, dat_version: str):
+    monkeypatch.setattr(generator, "today_dat_version", lambda: dat_version)
+
+
+def test_incremental_keeps_output_when_unchanged(tmp_path, monkeypatch, convert_csv):
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 300)
+
+    set_today(monkeypatch, "20240101")
+    stats = {}
+    output_path = convert_csv(csv_path, stats, incremental=True)
+    assert stats["changed"]
+    assert os.path.exists(generator.dat_state_path(output_path))
+    first = read_bytes(output_path)
+
+    set_today(monkeypatch, "20240102")
+    stats = {}
+    convert_csv(csv_path, stats, incremental=True)
+    assert not stats["changed"]
+    assert stats["dat_version"] == "20240101"
+    assert read_bytes(output_path) == first
+    with open(stats["version_path"], encoding="utf-8") as f:
+        assert f.read() == "20240101"
+
+
+def test_incremental_matches_full_conversion_after_edit(tmp_path, monkeypatch, convert_csv):
+    set_today(monkeypatch, "20240101")
+    rows = [generator.CSV_FIELDNAMES] + [list(row) for row in benchmark.synthetic_games(300)]
+    csv_path = str(tmp_path / "games.csv")
+
+    def write_rows():
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows)
+
+    write_rows()
+    output_path = convert_csv(csv_path, incremental=True)
+
+    # 1 行を書き換え、1 行を削除し、末尾に 1 行を追加する
+    rows[10][2] = "書き換えたタイトル & <記号>"
+    del rows[20]
+    rows.append(list(rows[-1]))
+    rows[-1][0] = "9999"
+    write_rows()
+    set_today(monkeypatch, "20240102")
+    stats = {}
+    convert_csv(csv_path, stats, incremental=True)
+    assert stats["changed"]
+    assert stats["dat_version"] == "20240102"
+    assert 0 < stats["reused_rows"] < len(rows) - 1
+
+    full_dir = tmp_path / "full"
+    full_dir.mkdir()
+    full_csv = str(full_dir / "games.csv")
+    with open(csv_path, "rb") as src, open(full_csv, "wb") as dst:
+        dst.write(src.read())
+    assert read_bytes(output_path) == read_bytes(convert_csv(full_csv))
+
+
+def test_incremental_rebuilds_edited_output(tmp_path, monkeypatch, convert_csv):
+    set_today(monkeypatch, "20240101")
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 50)
+    output_path = convert_csv(csv_path, incremental=True)
+    expected = read_bytes(output_path)
+
+    # 出力 XML を手で編集した場合は、前回の出力を使わずに作り直す
+    with open(output_path, "r+b") as f:
+        f.seek(len(expected) // 2)
+        f.write(b"XXXX")
+    stats = {}
+    convert_csv(csv_path, stats, incremental=True)
+    assert stats["changed"]
+    assert stats["reused_rows"] == 0
+    # 作り直した出力は公開済みのものと変わるため、同じ日でも datVersion を進める
+    assert stats["dat_version"] == "2024010101"
+    assert read_bytes(output_path) == expected.replace(b">20240101<", b">2024010101<")
+
+
+def test_same_day_edit_bumps_dat_version(tmp_path, monkeypatch, convert_csv):
+    rows = [generator.CSV_FIELDNAMES] + [list(row) for row in benchmark.synthetic_games(20)]
+    csv_path = str(tmp_path / "games.csv")
+
+    def convert_edit(title: str) -> dict:
+        rows[1][2] = title
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows)
+        stats = {}
+        output_path = convert_csv(csv_path, stats, incremental=True)
+        with open(stats["version_path"], encoding="utf-8") as f:
+            assert f.read() == stats["dat_version"]
+        assert f"<datVersion>{stats['dat_version']}</datVersion>" in read_bytes(output_path).decode("utf-8")
+        return stats
+
+    set_today(monkeypatch, "20240101")
+    assert convert_edit("a")["dat_version"] == "20240101"
+    # 同じ日に内容が変わったら、OfflineList が更新を検出できるように datVersion を進める
+    assert convert_edit("b")["dat_version"] == "2024010101"
+    assert convert_edit("c")["dat_version"] == "2024010102"
+    stats = convert_edit("c")
+    assert (stats["changed"], stats["dat_version"]) == (False, "2024010102")
+    set_today(monkeypatch, "20240102")
+    assert convert_edit("d")["dat_version"] == "2024010200"
+
+
+def test_same_day_rebuild_uses_version_file(tmp_path, monkeypatch, convert_csv):
+    set_today(monkeypatch, "20240101")
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 10)
+    output_path = convert_csv(csv_path, incremental=True)
+    # 記録が使えない（出力を消した）場合も、{datCode}.txt の値より新しくする
+    os.remove(output_path)
+    stats = {}
+    convert_csv(csv_path, stats, incremental=True)
+    assert stats["dat_version"] == "2024010101"
+
+
+def test_next_dat_version():
+    assert generator.next_dat_version(None, "20240101") == "20240101"
+    assert generator.next_dat_version("20231231", "20240101") == "20240101"
+    assert generator.next_dat_version("20240101", "20240101") == "2024010101"
+    assert generator.next_dat_version("2024010199", "20240101") == "2024010200"
+    assert generator.next_dat_version("2024010200", "20240102") == "2024010201"
+    assert generator.next_dat_version("2024010101", "20240105") == "2024010500"
+    # 日付以外の値（手で付けた版など）はそのまま今日の日付にする
+    assert generator.next_dat_version("v1", "20240101") == "20240101"
@@ -0,0 +1,69 @@
+import pytest
+
+import benchmark
+import generator
+
+# コメント・CDATA の中の <game> と、入れ子の <game> を含む DAT
+SPLIT_DAT = """<?xml version="1.0" encoding="UTF-8"?>
+<dat>
+  <configuration><datName>x</datName></configuration>
+  <!-- <game><title>コメント内</title></game> -->
+  <games>
+    <game><imageNumber>1</imageNumber><title>A &amp; B</title></game>
+    <game><imageNumber>2</imageNumber><title><![CDATA[<game> & ソフト]]></title><comment/></game>
+    <group><game><imageNumber>3</imageNumber><title>入れ子</title></game></group>
+  </games>
+</dat>
+"""
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp932"])
+def test_parallel_parse_matches_single_process(tmp_path, monkeypatch, encoding):
+    xml_path = str(tmp_path / "games.xml")
+    benchmark.write_synthetic_dat(xml_path, 500, encoding)
+    serial_path = generator.generate_csv_from_xml(xml_path, csv_path=str(tmp_path / "serial.csv"))
+
+    # 小さなファイルでも分割されるように、しきい値とチャンクの大きさを下げる
+    monkeypatch.setattr(generator, "PARALLEL_PARSE_MIN_BYTES", 0)
+    monkeypatch.setattr(generator, "PARALLEL_CHUNK_BYTES", 4096)
+    assert len(list(generator.iter_game_chunks(xml_path, 4096))) > 2
+    calls = []
+    write_parallel = generator.write_csv_from_xml_parallel
+
+    def spy(*args, **kwargs):
+        calls.append(args)
+        return write_parallel(*args, **kwargs)
+
+    monkeypatch.setattr(generator, "write_csv_from_xml_parallel", spy)
+
+    stats = {}
+    parallel_path = generator.generate_csv_from_xml(
+        xml_path, stats, parse_workers=2, csv_path=str(tmp_path / "parallel.csv"))
+    assert calls
+    assert stats["rows"] == 500
+    with open(serial_path, "rb") as serial, open(parallel_path, "rb") as parallel:
+        assert parallel.read() == serial.read()
+
+
+def test_parallel_parse_chunks_cover_every_game(tmp_path):
+    xml_path = tmp_path / "games.xml"
+    xml_path.write_bytes(SPLIT_DAT.encode("utf-8"))
+    spans = [span for chunk in generator.iter_game_chunks(str(xml_path), 16) for span in chunk]
+    data = xml_path.read_bytes()
+    games = [data[offset:offset + length] for offset, length in spans]
+    # コメントや CDATA の中の <game> は数えない
+    assert len(games) == 3
+    assert all(game.startswith(b"<game") and game.endswith(b"</game>") for game in games)
+
+
+def test_small_file_is_parsed_in_one_process(tmp_path, monkeypatch):
+    xml_path = str(tmp_path / "games.xml")
+    benchmark.write_synthetic_dat(xml_path, 20, "utf-8")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("小さなファイルは分割しない")
+
+    monkeypatch.setattr(generator, "write_csv_from_xml_parallel", fail)
+    stats = {}
+    generator.generate_csv_from_xml(xml_path, stats, parse_workers=4)
+    assert stats["rows"] == 20
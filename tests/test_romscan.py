@@ -0,0 +1,101 @@
+import csv
+import os
+import zipfile
+import zlib
+
+import romscan
+
+
+def make_rom_dir(tmp_path) -> str:
+    rom_dir = tmp_path / "roms"
+    (rom_dir / "sub").mkdir(parents=True)
+    (rom_dir / "Alpha.nes").write_bytes(b"alpha rom")
+    (rom_dir / "empty.nes").write_bytes(b"")
+    (rom_dir / "readme.txt").write_bytes(b"not a rom")
+    with zipfile.ZipFile(rom_dir / "sub" / "pack.zip", "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("Beta.fds", b"beta disk" * 100)
+        zf.writestr("dir/Gamma.nes", b"gamma")
+        zf.writestr("notes.txt", b"notes")
+    return str(rom_dir)
+
+
+def crc_of(data: bytes) -> str:
+    return romscan.format_crc(zlib.crc32(data))
+
+
+def test_crc32_file_plain_and_mmap_fallback(tmp_path, monkeypatch):
+    path = tmp_path / "rom.bin"
+    data = os.urandom(3 * 1024 + 7)
+    path.write_bytes(data)
+    assert romscan.crc32_file(str(path)) == (zlib.crc32(data), len(data))
+    # ブロックの境界をまたいでも同じ値になる
+    monkeypatch.setattr(romscan, "CRC_BLOCK_SIZE", 1000)
+    assert romscan.crc32_file(str(path)) == (zlib.crc32(data), len(data))
+    with open(path, "rb") as f:
+        assert romscan.crc32_stream(f) == zlib.crc32(data)
+
+
+def test_scan_plain_files_and_zip_entries(tmp_path):
+    rom_dir = make_rom_dir(tmp_path)
+    roms = romscan.scan_rom_directory(rom_dir, use_cache=False)
+    found = {rom["name"]: (rom["crc"], rom["size"], rom["path"]) for rom in roms}
+    assert found == {
+        "Alpha.nes": (crc_of(b"alpha rom"), 9, "Alpha.nes"),
+        "empty.nes": ("00000000", 0, "empty.nes"),
+        "readme.txt": (crc_of(b"not a rom"), 9, "readme.txt"),
+        # zip の中は中央ディレクトリの CRC とサイズを使う（フォルダ名は付けない）
+        "Beta.fds": (crc_of(b"beta disk" * 100), 900, "sub/pack.zip"),
+        "Gamma.nes": (crc_of(b"gamma"), 5, "sub/pack.zip"),
+        "notes.txt": (crc_of(b"notes"), 5, "sub/pack.zip"),
+    }
+
+
+def test_extensions_filter(tmp_path):
+    rom_dir = make_rom_dir(tmp_path)
+    roms = romscan.scan_rom_directory(rom_dir, extensions={".nes", ".fds"}, use_cache=False)
+    assert sorted(rom["name"] for rom in roms) == ["Alpha.nes", "Beta.fds", "Gamma.nes", "empty.nes"]
+
+
+def test_second_run_uses_cache(tmp_path):
+    rom_dir = make_rom_dir(tmp_path)
+    stats = {}
+    first = romscan.scan_rom_directory(rom_dir, stats=stats)
+    assert (stats["files"], stats["cached"]) == (4, 0)
+    assert os.path.exists(os.path.join(rom_dir, romscan.ROM_CACHE_NAME))
+
+    stats = {}
+    assert romscan.scan_rom_directory(rom_dir, stats=stats) == first
+    assert (stats["cached"], stats["hashed_bytes"]) == (4, 0)
+
+    # キャッシュは絞り込む前の一覧なので、--extensions を変えても使い回せる
+    stats = {}
+    roms = romscan.scan_rom_directory(rom_dir, extensions={".fds"}, stats=stats)
+    assert [rom["name"] for rom in roms] == ["Beta.fds"]
+    assert stats["cached"] == 1
+
+    # 変更したファイルだけ計算し直す
+    with open(os.path.join(rom_dir, "Alpha.nes"), "ab") as f:
+        f.write(b"!")
+    stats = {}
+    roms = romscan.scan_rom_directory(rom_dir, stats=stats)
+    assert (stats["cached"], stats["hashed_bytes"]) == (3, 10)
+    assert {rom["name"]: rom["crc"] for rom in roms}["Alpha.nes"] == crc_of(b"alpha rom!")
+
+
+def test_scan_roms_command_fills_csv(tmp_path, write_csv, capsys):
+    rom_dir = make_rom_dir(tmp_path)
+    csv_path = write_csv([
+        ["imageNumber", "title", "romCRC", "romSize", "extension"],
+        ["1", "ALPHA", "", "", ""],
+        ["2", "Ｂｅｔａ", "", "", ""],
+        ["3", "Unknown", "", "", ""],
+    ])
+    assert romscan.main([rom_dir, csv_path, "--extensions", "nes, .FDS"]) == 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    # 全角・半角と大文字・小文字の違いは無視して照合する
+    assert rows[1][2:] == [crc_of(b"alpha rom"), "9", ".nes"]
+    assert rows[2][2:] == [crc_of(b"beta disk" * 100), "900", ".fds"]
+    assert rows[3][2:] == ["", "", ""]
+    out = capsys.readouterr().out
+    assert "照合できなかった行 1 行" in out
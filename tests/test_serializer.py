@@ -0,0 +1,52 @@
+import pytest
+
+import generator
+
+HEADER = ["imageNumber", "title", "romCRC", "extension", "romCRC2", "extension2", "comment"]
+
+
+def reference_block(header: list, row: list, extension_with_dot: str = ".nes") -> str:
+    plan = generator.plan_csv_columns(header)
+    return generator.finish_game_block(generator.build_game_lines(row, plan, extension_with_dot), 2)
+
+
+@pytest.mark.parametrize("row", [
+    ["1", "ソフト", "0123ABCD", ".nes", "", "", "c"],
+    ["2", "", "", "", "FFFFFFFF", ".fds", ""],
+    ["3", "A & B <x>", "0123ABCD", ".n\"s", "", "", "'q'"],
+    ["4", "multi\nline", "", "", "", "", "\n"],
+])
+def test_template_matches_reference_lines(row):
+    serializer = generator.GameSerializer(HEADER, ".nes")
+    assert serializer.template is not None
+    assert serializer.serialize(row, 2) == reference_block(HEADER, row)
+
+
+def test_header_with_braces_and_special_chars():
+    # タグ名の { } は str.format の置換にならないようにする
+    header = ["imageNumber", "note{0}"]
+    serializer = generator.GameSerializer(header, ".nes")
+    assert serializer.serialize(["1", "x"], 2) == reference_block(header, ["1", "x"])
+    # 拡張子の既定値に特殊文字があれば、すべての行を基準の実装で生成する
+    serializer = generator.GameSerializer(HEADER, ".a&b")
+    assert serializer.template is None
+    row = ["1", "t", "", "", "", "", ""]
+    assert serializer.serialize(row, 2) == reference_block(HEADER, row, ".a&b")
+
+
+def test_control_character_is_rejected():
+    serializer = generator.GameSerializer(HEADER, ".nes")
+    with pytest.raises(ValueError, match="7 行目"):
+        serializer.serialize(["1", "bad\x01", "", "", "", "", ""], 7)
+
+
+def test_cp932_output(write_csv, convert_csv):
+    csv_path = write_csv([["imageNumber", "title", "comment"], ["1", "♥ ソフト", "①"]])
+    output_path = convert_csv(csv_path, output_encoding="cp932")
+    with open(output_path, "rb") as f:
+        data = f.read()
+    assert data.startswith(b'<?xml version="1.0" encoding="Shift_JIS"')
+    text = data.decode("cp932")
+    # Shift_JIS にない文字は数値文字参照になる（cp932 の機種依存文字はそのまま）
+    assert "<title>&#9829; ソフト</title>" in text
+    assert "<comment>①</comment>" in text
@@ -0,0 +1,63 @@
+import generator
+import romscan
+
+# 引用符の有無・CRLF と LF の混在・同じ列名・余分なセル・値の中の改行を含む CSV
+SOURCE = (
+    '﻿imageNumber,title,romCRC,title,"romSize"\r\n'
+    '1,"Alpha",,dup,10,extra\r\n'
+    '2,"Beta ""2""",,dup2\n'
+    '\r\n'
+    '3,"multi\r\nline",,,,x,y'
+)
+
+
+def write_source(tmp_path, text: str = SOURCE) -> str:
+    path = tmp_path / "games.csv"
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+
+def test_untouched_rows_are_kept_byte_for_byte(tmp_path):
+    csv_path = write_source(tmp_path)
+    updated = generator.update_csv_rows(csv_path, ["romCRC"], lambda row, columns: False)
+    assert updated == 0
+    with open(csv_path, "rb") as f:
+        assert f.read() == SOURCE.encode("utf-8")
+
+
+def test_updated_rows_keep_duplicate_columns_and_extra_cells(tmp_path):
+    csv_path = write_source(tmp_path)
+    seen = []
+
+    def update_row(row: list, columns: dict) -> bool:
+        seen.append(list(row))
+        if row[columns["imageNumber"]] in ("1", "3"):
+            row[columns["romCRC"]] = "0123ABCD"
+            row[columns["extension"]] = ".nes"
+            return True
+        return False
+
+    assert generator.update_csv_rows(csv_path, ["romCRC", "extension"], update_row) == 2
+    # 不足している列は末尾に追加し、短い行はヘッダーの列数まで埋めて渡す
+    assert seen[1] == ["2", 'Beta "2"', "", "dup2", "", ""]
+    with open(csv_path, "rb") as f:
+        assert f.read().decode("utf-8") == (
+            '﻿imageNumber,title,romCRC,title,"romSize",extension\r\n'
+            '1,Alpha,0123ABCD,dup,10,.nes\r\n'
+            '2,"Beta ""2""",,dup2,\n'
+            '\r\n'
+            '3,"multi\r\nline",0123ABCD,,,.nes,y'
+        )
+
+
+def test_merge_roms_into_csv_with_duplicate_columns(tmp_path):
+    csv_path = write_source(tmp_path)
+    roms = [{"name": "Alpha.nes", "crc": "0123ABCD", "size": 24592, "path": "Alpha.nes"}]
+    result = romscan.merge_roms_into_csv(csv_path, roms)
+    assert result["updated_rows"] == 1
+    assert result["unmatched_rows"] == 2
+    with open(csv_path, "rb") as f:
+        lines = f.read().decode("utf-8").split("\r\n")
+    assert lines[0] == '﻿imageNumber,title,romCRC,title,"romSize",extension'
+    # 追加した extension 列の位置にあった余分なセルは、その列の値として扱う
+    assert lines[1] == "1,Alpha,0123ABCD,dup,24592,.nes"
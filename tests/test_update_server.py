@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+import servemanifest
+import update_server
+
+PREFIX = "/dats/"
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "fc").mkdir()
+    (tmp_path / "fc.txt").write_bytes(b"20240101")
+    # sendfile で送られる大きさの zip（メモリには保持しない）
+    (tmp_path / "fc.zip").write_bytes(os.urandom(update_server.SERVE_MEMORY_CACHE_BYTES + 4096))
+    (tmp_path / "fc" / "1-500.zip").write_bytes(b"PK images")
+    servemanifest.record_served_files(str(tmp_path), [
+        str(tmp_path / "fc.txt"), str(tmp_path / "fc.zip"), str(tmp_path / "fc" / "1-500.zip")])
+    # 記録にないファイルは配信しない
+    (tmp_path / "fc.csv").write_bytes(b"imageNumber,title\n")
+    (tmp_path / "other.zip").write_bytes(b"PK other")
+    return tmp_path
+
+
+async def fetch(port: int, method: str, path: str, headers: dict = None) -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", "Connection: close"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+
+    head, _, body = data.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    response_headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    return int(status_line.split(" ")[1]), response_headers, body
+
+
+def run_server(root_dir: str, requests) -> tuple:
+    """サーバーを 127.0.0.1 の空いているポートで起動し、requests(port) の結果と UpdateServer を返す。"""
+
+    async def main():
+        server, handler = await update_server.start_update_server(root_dir, "127.0.0.1", 0, PREFIX)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await requests(port), handler
+
+    return asyncio.run(main())
+
+
+def test_get_returns_body_and_recorded_etag(root):
+    manifest = json.loads((root / servemanifest.SERVE_MANIFEST_NAME).read_text(encoding="utf-8"))
+
+    async def requests(port):
+        return await fetch(port, "GET", PREFIX + "fc.txt")
+
+    (status, headers, body), _ = run_server(str(root), requests)
+    assert status == 200
+    assert body == b"20240101"
+    assert headers["content-length"] == "8"
+    assert headers["etag"] == manifest["files"]["fc.txt"]["data"]
+
+
+def test_if_none_match_returns_304(root):
+    async def requests(port):
+        _, headers, _ = await fetch(port, "GET", PREFIX + "fc/1-500.zip")
+        etag = headers["etag"]
+        return (await fetch(port, "GET", PREFIX + "fc/1-500.zip", {"If-None-Match": etag}),
+                await fetch(port, "GET", PREFIX + "fc/1-500.zip", {"If-None-Match": "W/" + etag}),
+                await fetch(port, "GET", PREFIX + "fc/1-500.zip", {"If-None-Match": '"other"'}))
+
+    (matched, weak, other), _ = run_server(str(root), requests)
+    assert (matched[0], matched[2]) == (304, b"")
+    assert matched[1]["etag"]
+    assert weak[0] == 304
+    assert (other[0], other[2]) == (200, b"PK images")
+
+
+@pytest.mark.parametrize("path", [
+    "nope.zip",
+    "fc.csv",
+    "other.zip",
+    servemanifest.SERVE_MANIFEST_NAME,
+    "../fc.txt",
+    "fc/../fc.txt",
+    "%2e%2e/fc.txt",
+    "fc/..%2ffc.txt",
+])
+def test_unknown_and_traversal_paths_return_404(root, path):
+    async def requests(port):
+        return await fetch(port, "GET", PREFIX + path)
+
+    (status, _, _), _ = run_server(str(root), requests)
+    assert status == 404
+
+
+def test_outside_prefix_returns_404(root):
+    async def requests(port):
+        return await fetch(port, "GET", "/fc.txt")
+
+    (status, _, _), _ = run_server(str(root), requests)
+    assert status == 404
+
+
+def test_other_methods_return_405(root):
+    async def requests(port):
+        return await fetch(port, "POST", PREFIX + "fc.txt")
+
+    (status, headers, _), _ = run_server(str(root), requests)
+    assert status == 405
+    assert headers["allow"] == "GET, HEAD"
+
+
+def test_head_returns_headers_only(root):
+    async def requests(port):
+        return await fetch(port, "HEAD", PREFIX + "fc.zip")
+
+    (status, headers, body), _ = run_server(str(root), requests)
+    assert status == 200
+    assert headers["content-length"] == str(os.path.getsize(root / "fc.zip"))
+    assert body == b""
+
+
+def test_large_file_is_sent_with_sendfile(root):
+    async def requests(port):
+        return await fetch(port, "GET", PREFIX + "fc.zip")
+
+    (status, headers, body), handler = run_server(str(root), requests)
+    assert status == 200
+    assert body == (root / "fc.zip").read_bytes()
+    # 大きなファイルは中身をメモリに持たず、loop.sendfile で送る
+    assert handler.files.files["fc.zip"].body is None
+    with open(root / "fc.zip", "rb") as f:
+        assert headers["etag"] == servemanifest.compute_etag(f)
+
+
+def test_newly_recorded_file_is_served_without_restart(root):
+    async def requests(port):
+        before = await fetch(port, "GET", PREFIX + "other.zip")
+        servemanifest.record_served_files(str(root), [str(root / "other.zip")])
+        return before, await fetch(port, "GET", PREFIX + "other.zip")
+
+    (before, after), _ = run_server(str(root), requests)
+    assert before[0] == 404
+    assert (after[0], after[2]) == (200, b"PK other")
+
+
+def test_concurrent_writers_keep_each_others_entries(tmp_path):
+    # 並列変換のワーカーが同時に記録しても、ロックで互いの記録を消さない
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"dat{i}.zip"
+        path.write_bytes(f"zip {i}".encode("ascii"))
+        paths.append(str(path))
+    errors = []
+
+    def writer(path: str):
+        try:
+            for i in range(50):
+                # 毎回書き換えて、記録の読み込みから保存までを実際に行わせる
+                with open(path, "wb") as f:
+                    f.write(b"zip" * (i + 1))
+                servemanifest.record_served_files(str(tmp_path), [path])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(path,)) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    manifest = json.loads((tmp_path / servemanifest.SERVE_MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert sorted(manifest["files"]) == ["dat0.zip", "dat1.zip"]
+    for path in paths:
+        with open(path, "rb") as f:
+            assert manifest["files"][os.path.basename(path)]["data"] == servemanifest.compute_etag(f)
@@ -0,0 +1,123 @@
+import csv
+import os
+
+import pytest
+
+import benchmark
+import generator
+import validator
+
+HEADER = ["imageNumber", "title", "romCRC", "extension", "romSize"]
+
+
+def rules(result) -> list:
+    return [(violation.rule, violation.column, violation.line) for violation in result.violations]
+
+
+def test_valid_csv_has_no_violations(tmp_path):
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 300)
+    result = validator.validate_file(csv_path)
+    assert result.rows == 300
+    assert (result.errors, result.warnings) == (0, 0)
+
+
+def test_reports_each_rule_with_line_numbers(write_csv):
+    csv_path = write_csv([
+        HEADER,
+        ["1", "ok", "0123ABCD", ".nes", "10"],
+        ["2", "", "XYZ", ".nes", "ten"],
+        ["1", "dup", "0123abcd", ".fds", ""],
+        ["", "multi\nline", "", "nes", ""],
+        ["5", "bad\x01char", "", "", ""],
+    ])
+    result = validator.validate_file(csv_path, ".nes")
+    assert rules(result) == [
+        ("crc", "romCRC", 3),
+        ("number", "romSize", 3),
+        ("empty-title", "title", 3),
+        ("duplicate-image-number", "imageNumber", 4),
+        ("duplicate-rom-crc", "romCRC", 4),
+        ("extension-mismatch", "extension", 4),
+        # 値に改行がある行は、その行の始まりの行番号で報告する
+        ("extension", "extension", 5),
+        ("empty-image-number", "imageNumber", 5),
+        ("extension-mismatch", "extension", 5),
+        ("invalid-char", "title", 7),
+    ]
+    assert (result.errors, result.warnings) == (7, 3)
+
+
+def test_missing_required_columns(write_csv):
+    result = validator.validate_file(write_csv([["romCRC"], ["0123ABCD"]]))
+    assert [(violation.rule, violation.column) for violation in result.violations] == [
+        ("missing-column", "imageNumber"), ("missing-column", "title")]
+
+
+def test_batched_check_finds_single_error(tmp_path):
+    # まとめた検査で見つけた違反も、1 行ずつ調べ直して正しい行番号で報告する
+    count = validator.VALIDATION_BATCH_ROWS * 2 + 10
+    rows = [generator.CSV_FIELDNAMES] + [list(row) for row in benchmark.synthetic_games(count)]
+    target = validator.VALIDATION_BATCH_ROWS + 5
+    rows[target][generator.CSV_FIELDNAMES.index("im1CRC")] = "12345G78"
+    csv_path = str(tmp_path / "games.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+    result = validator.validate_file(csv_path)
+    assert rules(result) == [("crc", "im1CRC", target + 1)]
+
+
+def test_validate_xml(tmp_path):
+    xml_path = str(tmp_path / "games.xml")
+    benchmark.write_synthetic_dat(xml_path, 100, "cp932")
+    result = validator.validate_file(xml_path)
+    assert result.rows == 100
+    assert result.errors == 0
+
+
+def test_convert_with_validate_stops_before_output(tmp_path, write_csv):
+    csv_path = write_csv([HEADER, ["1", "ok", "BAD", ".nes", ""]])
+    with pytest.raises(validator.ValidationFailed) as e:
+        generator.generate_xml_from_csv(csv_path, "x", "x", "x", "", "", "nes", "x",
+                                        config={}, incremental=False, zip_output=False, validate=True)
+    assert e.value.validator.errors == 1
+    assert not os.path.exists(str(tmp_path / "games.xml"))
+    assert not os.path.exists(str(tmp_path / "x.txt"))
+
+
+def test_dat_violations_are_reported_by_game(tmp_path):
+    xml_path = tmp_path / "games.xml"
+    xml_path.write_text("""<?xml version="1.0" encoding="UTF-8"?>
+<dat><games>
+<game><imageNumber>1</imageNumber><title>a</title></game>
+<game><imageNumber>1</imageNumber><title>b</title><files><romCRC extension=".nes">XYZ</romCRC></files></game>
+</games></dat>
+""", encoding="utf-8")
+    result = validator.validate_file(str(xml_path))
+    assert [(v.rule, v.game, v.line) for v in result.violations] == [
+        ("crc", 2, None), ("duplicate-image-number", 2, None)]
+    assert result.violations[0].format() == "2 件目の <game>: [error] romCRC: CRC は 16 進数 8 桁で指定してください（'XYZ'）"
+
+
+def test_validate_command_exit_codes(write_csv, capsys):
+    valid = write_csv([HEADER, ["1", "ok", "0123ABCD", ".nes", "10"]], "valid.csv")
+    warning = write_csv([HEADER, ["1", "ok", "0123ABCD", ".fds", "10"]], "warning.csv")
+    error = write_csv([HEADER, ["1", "ok", "BAD", ".nes", "10"]], "error.csv")
+
+    assert validator.main([valid, "--extension", "nes"]) == 0
+    # 警告だけなら成功、--strict なら失敗
+    assert validator.main([warning, "--extension", "nes"]) == 0
+    assert validator.main([warning, "--extension", "nes", "--strict"]) == 1
+    assert validator.main([error, "--quiet"]) == 1
+    out = capsys.readouterr().out
+    assert "2 行目: [warning] extension:" in out
+    assert "error.csv: 1 件  エラー 1 件  警告 0 件" in out
+    # --quiet では違反の一覧を表示しない
+    assert "[error]" not in out
+
+
+def test_validate_command_rejects_other_files(tmp_path, capsys):
+    path = tmp_path / "games.txt"
+    path.write_text("x", encoding="utf-8")
+    assert validator.main([str(path)]) == 1
+    assert "エラー: CSV / XML ファイルではありません" in capsys.readouterr().err
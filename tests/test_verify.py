@@ -0,0 +1,113 @@
+import pytest
+
+import benchmark
+import generator
+import verify
+
+DAT_A = """<?xml version="1.0" encoding="UTF-8"?>
+<dat>
+  <games>
+    <game><imageNumber>1</imageNumber><title>Alpha</title><publisher>P</publisher>
+      <files><romCRC extension=".nes">0000aaaa</romCRC></files></game>
+    <game><imageNumber>2</imageNumber><title>Beta</title><files><romCRC extension=".nes">0000BBBB</romCRC></files></game>
+    <game><imageNumber>3</imageNumber><title>Gamma</title><files><romCRC extension=".nes">0000CCCC</romCRC></files></game>
+  </games>
+</dat>
+"""
+
+# 並び順・前後の空白・CRC の大文字小文字・空欄の " " の違いは同じ内容として扱う
+DAT_B = """<?xml version="1.0" encoding="UTF-8"?>
+<dat>
+  <games>
+    <game><title> Beta </title><imageNumber>2</imageNumber><comment> </comment>
+      <files><romCRC extension=".nes">0000bbbb</romCRC></files></game>
+    <game><imageNumber>1</imageNumber><title>Alpha</title><publisher>Q</publisher>
+      <files><romCRC extension=".nes">0000AAAA</romCRC></files></game>
+    <game><imageNumber>4</imageNumber><title>Delta</title><files><romCRC extension=".nes">0000DDDD</romCRC></files></game>
+  </games>
+</dat>
+"""
+
+
+def write_text(tmp_path, name: str, text: str) -> str:
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("use_spans", [True, False])
+def test_detects_added_removed_and_changed_games(tmp_path, use_spans):
+    path_a = write_text(tmp_path, "a.xml", DAT_A)
+    path_b = write_text(tmp_path, "b.xml", DAT_B)
+    result = verify.compare_files(path_a, path_b, use_spans=use_spans)
+
+    assert (result.games_a, result.games_b) == (3, 3)
+    assert result.changed == [("romCRC=0000AAAA", 1)]
+    assert result.removed == [("romCRC=0000CCCC", 2)]
+    assert result.added == [("romCRC=0000DDDD", 2)]
+    assert not result.identical
+    before = result.fields_a["romCRC=0000AAAA"]
+    after = result.fields_b["romCRC=0000AAAA"]
+    assert verify.format_field_changes(before, after) == ["publisher: 'P' → 'Q'"]
+    assert result.fields_b["romCRC=0000DDDD"]["title"] == "Delta"
+
+
+def test_digest_ignores_order_whitespace_and_crc_case():
+    digester = verify.GameDigester(["title", "romCRC", "comment"])
+    key, digest = digester.digest(digester.normalize([" Alpha ", "0000aaaa", " "], strip=True))
+    other = verify.GameDigester(["comment", "romCRC", "title"])
+    assert other.digest(other.normalize(["", "0000AAAA", "Alpha"], strip=True)) == (key, digest)
+    assert key == "romCRC=0000AAAA"
+    changed = digester.digest(digester.normalize(["Alpha!", "0000AAAA", ""], strip=True))
+    assert changed[0] == key and changed[1] != digest
+
+
+def test_csv_matches_its_converted_dat(tmp_path, convert_csv):
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 200)
+    result = verify.compare_files(csv_path, convert_csv(csv_path))
+    assert result.identical
+    assert result.games_a == result.games_b == 200
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp932"])
+def test_round_trip_command(tmp_path, capsys, monkeypatch, encoding):
+    # config.json は実行ファイルの隣から読むため、テストでは空の設定で変換する
+    monkeypatch.setattr(generator, "load_config", lambda: {})
+    xml_path = str(tmp_path / "games.xml")
+    benchmark.write_synthetic_dat(xml_path, 300, encoding)
+    assert verify.main([xml_path, "--round-trip", "--workers", "1"]) == 0
+    out = capsys.readouterr().out
+    assert "追加 0 件  削除 0 件  変更 0 件" in out
+    # 往復変換の作業ファイルは元の DAT の隣に残さない
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["games.xml"]
+
+
+def test_verify_command_reports_mismatch(tmp_path, capsys):
+    path_a = write_text(tmp_path, "a.xml", DAT_A)
+    path_b = write_text(tmp_path, "b.xml", DAT_B)
+    assert verify.main([path_a, path_b, "--workers", "1"]) == 1
+    out = capsys.readouterr().out
+    assert "追加 1 件  削除 1 件  変更 1 件" in out
+    assert "[変更] romCRC=0000AAAA 「Alpha」" in out
+    assert "publisher: 'P' → 'Q'" in out
+    assert "[削除] romCRC=0000CCCC 「Gamma」" in out
+
+
+def test_parallel_digests_match_serial(tmp_path, monkeypatch):
+    path_a = str(tmp_path / "a.xml")
+    benchmark.write_synthetic_dat(path_a, 500, "utf-8")
+    path_b = str(tmp_path / "b.xml")
+    text = open(path_a, encoding="utf-8").read()
+    # 1 件だけタイトルを変える
+    start = text.index("<title>", text.index("<imageNumber>250</imageNumber>"))
+    with open(path_b, "w", encoding="utf-8") as f:
+        f.write(text[:start] + "<title>変更" + text[start + len("<title>"):])
+
+    serial = verify.verify_files(path_a, path_b, workers=1)
+    monkeypatch.setattr(verify, "PARALLEL_PARSE_MIN_BYTES", 0)
+    monkeypatch.setattr(verify, "PARALLEL_CHUNK_BYTES", 4096)
+    parallel = verify.verify_files(path_a, path_b, workers=2)
+    assert [key for key, _ in parallel.changed] == [key for key, _ in serial.changed]
+    assert len(serial.changed) == 1
+    assert (parallel.added, parallel.removed) == ([], [])
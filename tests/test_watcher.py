@@ -0,0 +1,138 @@
+import argparse
+import os
+from concurrent.futures import Future
+
+import pytest
+
+import benchmark
+import generator
+import watcher
+
+
+class ImmediateExecutor:
+    """submit した変換をその場で実行する（プロセスプールの代わり）。"""
+
+    def __init__(self):
+        self.inputs = []
+
+    def submit(self, fn, job):
+        self.inputs.append(os.path.basename(job["input"]))
+        future = Future()
+        future.set_result(fn(job))
+        return future
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watcher.time, "monotonic", clock)
+    return clock
+
+
+def make_watcher(directory, source: str = "csv"):
+    parser = argparse.ArgumentParser()
+    generator.add_convert_options(parser)
+    args = generator.parse_convert_args(parser, [
+        "--dat-name", "x", "--system", "s", "--im-folder", "i", "--extension", "nes", "--dat-code", "x"])
+    executor = ImmediateExecutor()
+    logs = []
+
+    def make_job(path: str) -> dict:
+        return generator.build_convert_job(path, args, {}, ({}, {}))
+
+    watch = watcher.Watcher([str(directory)], watcher.WATCH_MATCHERS[source], make_job, executor,
+                            debounce=2.0, log=logs.append)
+    return watch, executor, logs
+
+
+def write_games(path, count: int):
+    benchmark.write_synthetic_csv(str(path), count)
+
+
+def test_debounce_waits_until_saves_settle(tmp_path, clock):
+    csv_path = tmp_path / "games.csv"
+    write_games(csv_path, 10)
+    watch, executor, _ = make_watcher(tmp_path)
+    watch.start()
+    watch.poll()
+    assert executor.inputs == []
+
+    write_games(csv_path, 11)
+    watch.poll()
+    clock.now += 1.5
+    # デバウンス中にもう一度保存されたら、そこから数え直す
+    write_games(csv_path, 12)
+    watch.poll()
+    clock.now += 1.5
+    watch.poll()
+    assert executor.inputs == []
+
+    clock.now += 0.5
+    watch.poll()
+    assert executor.inputs == ["games.csv"]
+    assert (tmp_path / "games.xml").exists()
+
+    # 内容が同じなら（更新日時だけ変わっても）変換し直さない
+    os.utime(csv_path, ns=(0, 0))
+    watch.poll()
+    clock.now += 2.0
+    watch.poll()
+    assert executor.inputs == ["games.csv"]
+
+
+def test_initial_converts_existing_files(tmp_path, clock):
+    write_games(tmp_path / "games.csv", 10)
+    watch, executor, _ = make_watcher(tmp_path)
+    watch.start(convert_existing=True)
+    watch.poll()
+    assert executor.inputs == ["games.csv"]
+
+
+def test_own_outputs_are_not_converted_again(tmp_path, clock):
+    # CSV と XML の両方を監視していても、自分で書き出した XML は変換しない
+    write_games(tmp_path / "games.csv", 10)
+    watch, executor, logs = make_watcher(tmp_path, "all")
+    watch.start(convert_existing=True)
+    watch.poll()
+    assert executor.inputs == ["games.csv"]
+
+    # 完了した変換は次の確認で回収し、その出力を自分の出力として登録する
+    watch.poll()
+    assert len(logs) == 1
+    assert str(tmp_path / "games.xml") in watch.files
+    clock.now += 2.0
+    watch.poll()
+    clock.now += 2.0
+    watch.poll()
+    assert executor.inputs == ["games.csv"]
+
+    # 手で書き換えた XML は変換する
+    (tmp_path / "games.xml").write_bytes((tmp_path / "games.xml").read_bytes().replace(b"</dat>", b"</dat>\n"))
+    watch.poll()
+    clock.now += 2.0
+    watch.poll()
+    assert executor.inputs == ["games.csv", "games.xml"]
+
+
+def test_invalid_settings_are_logged_once(tmp_path, clock):
+    write_games(tmp_path / "games.csv", 10)
+    watch, executor, logs = make_watcher(tmp_path)
+
+    def make_job(path: str) -> dict:
+        raise ValueError("datName が指定されていません。")
+
+    watch.make_job = make_job
+    watch.start(convert_existing=True)
+    watch.poll()
+    clock.now += 2.0
+    watch.poll()
+    assert executor.inputs == []
+    assert logs == ["[NG] games.csv: datName が指定されていません。"]
@@ -0,0 +1,99 @@
+import csv
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import benchmark
+import generator
+
+NESTED_DAT = """<?xml version="1.0" encoding="UTF-8"?>
+<dat>
+  <configuration><datName>x</datName></configuration>
+  <!-- <game><title>コメント内</title></game> -->
+  <games>
+    <game>
+      <imageNumber>1</imageNumber>
+      <title> A &amp; B &lt;x&gt; </title>
+      <files><romCRC extension=".nes">0123ABCD</romCRC><romCRC extension=".fds">FFFFFFFF</romCRC></files>
+      <title>2 件目の title は使わない</title>
+      <romCRC>外の romCRC は無視する</romCRC>
+    </game>
+    <game><imageNumber>2</imageNumber><title><![CDATA[<game> & ソフト]]></title><comment/></game>
+    <group><game><imageNumber>3</imageNumber><title>入れ子</title></game></group>
+  </games>
+</dat>
+"""
+
+
+def reference_rows(xml_path: str) -> list:
+    # ファイル全体を読み込む従来の方法（ET.parse + findall）の結果
+    extractor = generator.GameRowExtractor()
+    return [extractor.extract(game) for game in ET.parse(xml_path).getroot().findall(".//game")]
+
+
+def read_csv(path: str) -> list:
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def write_text(tmp_path, text: str, encoding: str = "utf-8", name: str = "games.xml") -> str:
+    path = tmp_path / name
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def test_iter_games_matches_findall(tmp_path):
+    xml_path = write_text(tmp_path, NESTED_DAT)
+    extractor = generator.GameRowExtractor()
+    rows = [extractor.extract(game) for game in generator.iter_games(xml_path)]
+    assert rows == reference_rows(xml_path)
+    assert [row[0] for row in rows] == ["1", "2", "3"]
+    assert rows[0][2] == "A & B <x>"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_iter_games_from_small_chunks(tmp_path, chunk_size):
+    xml_path = write_text(tmp_path, NESTED_DAT)
+    chunks = (NESTED_DAT[i:i + chunk_size] for i in range(0, len(NESTED_DAT), chunk_size))
+    extractor = generator.GameRowExtractor()
+    rows = [extractor.extract(game) for game in generator.iter_games_from_text(chunks)]
+    assert rows == reference_rows(xml_path)
+
+
+def test_iter_games_yields_before_reading_whole_file():
+    # <game> は閉じタグを読んだ時点で返し、ファイル全体を読み込むのを待たない
+    read = []
+
+    def chunks():
+        read.append("<dat><games>")
+        yield read[-1]
+        for number in range(1, 10001):
+            read.append(f"<game><imageNumber>{number}</imageNumber><title>t{number}</title></game>")
+            yield read[-1]
+        yield "</games></dat>"
+
+    games = generator.iter_games_from_text(chunks())
+    first = next(games)
+    assert first.findtext("imageNumber") == "1"
+    assert len(read) < 10
+    assert sum(1 for _ in games) == 9999
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp932"])
+def test_generate_csv_from_xml(tmp_path, encoding):
+    xml_path = str(tmp_path / "games.xml")
+    benchmark.write_synthetic_dat(xml_path, 300, encoding)
+    stats = {}
+    csv_path = generator.generate_csv_from_xml(xml_path, stats)
+
+    rows = read_csv(csv_path)
+    assert rows[0] == generator.CSV_FIELDNAMES
+    assert rows[1:] == list(benchmark.synthetic_games(300))
+    assert stats["rows"] == 300
+
+
+def test_generate_csv_from_xml_without_games(tmp_path):
+    xml_path = write_text(tmp_path, "<dat><games/></dat>")
+    with pytest.raises(ValueError):
+        generator.generate_csv_from_xml(xml_path)
+    assert not (tmp_path / "games.csv").exists()
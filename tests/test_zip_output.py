@@ -0,0 +1,64 @@
+import json
+import os
+import zipfile
+
+import benchmark
+import servemanifest
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_zip_contains_the_generated_xml(tmp_path, convert_csv):
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 300)
+    stats = {}
+    output_path = convert_csv(csv_path, stats, zip_output=True)
+
+    assert stats["zip_path"] == str(tmp_path / (benchmark.BENCH_SETTINGS["dat_code"] + ".zip"))
+    with zipfile.ZipFile(stats["zip_path"]) as zf:
+        assert zf.testzip() is None
+        (info,) = zf.infolist()
+        assert info.filename == "games.xml"
+        assert info.compress_type == zipfile.ZIP_DEFLATED
+        # シーク可能なファイルに書くので、データディスクリプタ（フラグのビット 3）は使わない
+        assert info.flag_bits & 0x08 == 0
+        assert zf.read(info) == read_bytes(output_path)
+
+
+def test_zip_and_version_file_are_recorded_for_serve(tmp_path, convert_csv):
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 50)
+    stats = {}
+    convert_csv(csv_path, stats, zip_output=True)
+
+    with open(tmp_path / servemanifest.SERVE_MANIFEST_NAME, encoding="utf-8") as f:
+        files = json.load(f)["files"]
+    assert sorted(files) == sorted(os.path.basename(stats[key]) for key in ("zip_path", "version_path"))
+    for key in ("zip_path", "version_path"):
+        with open(stats[key], "rb") as f:
+            assert files[os.path.basename(stats[key])]["data"] == servemanifest.compute_etag(f)
+
+
+def test_incremental_keeps_zip_when_unchanged(tmp_path, convert_csv):
+    csv_path = str(tmp_path / "games.csv")
+    benchmark.write_synthetic_csv(csv_path, 50)
+    stats = {}
+    convert_csv(csv_path, stats, zip_output=True, incremental=True)
+    zip_path = stats["zip_path"]
+    mtime_ns = os.stat(zip_path).st_mtime_ns
+
+    stats = {}
+    convert_csv(csv_path, stats, zip_output=True, incremental=True)
+    assert not stats["changed"]
+    assert os.stat(zip_path).st_mtime_ns == mtime_ns
+
+    # zip が消えていれば、内容が同じでも作り直す
+    os.remove(zip_path)
+    stats = {}
+    convert_csv(csv_path, stats, zip_output=True, incremental=True)
+    assert stats["changed"]
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
@@ -0,0 +1,326 @@
+"""
+OfflineList の DAT 更新（newDat の URL）をローカルで試すための HTTP サーバー。
+
+  python generator.py serve out/ --port 8080
+
+出力フォルダの {datCode}.txt / {datCode}.zip / {datCode}/1-500.zip … を、
+config.json の base_url のパス部分（--prefix で変更可）の下に配信する。
+ETag は生成時（zip の出力・images コマンド）に計算して .offlinelist_serve.json に記録しておき（servemanifest）、
+If-None-Match が一致すれば 304 を返す。小さなファイルは中身をメモリに保持し、
+大きな zip は loop.sendfile でコピーせずに送る。1 つのイベントループで多数の接続を同時に扱う。
+"""
+import os
+import sys
+
+from romscan import FileHashCache
+from servemanifest import SERVE_MANIFEST_NAME, compute_etag
+
+
+# -------------------------------
+# 配信するファイル
+# -------------------------------
+SERVE_MEMORY_CACHE_BYTES = 256 * 1024
+CONTENT_TYPES = {
+    ".txt": "text/plain; charset=utf-8",
+    ".zip": "application/zip",
+    ".xml": "application/xml",
+}
+
+
+class ServedFile:
+    """1 ファイル分の応答（ETag とヘッダーは作成済み。小さいファイルは中身も保持する）。"""
+
+    def __init__(self, path: str, st: os.stat_result, etag: str, body: bytes = None):
+        from email.utils import formatdate
+
+        self.path = path
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.etag = etag
+        self.body = body
+        content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+        self.headers = (
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {self.size}\r\n"
+            f"ETag: {etag}\r\n"
+            f"Last-Modified: {formatdate(st.st_mtime, usegmt=True)}\r\n"
+            "Cache-Control: no-cache\r\n"
+        ).encode("ascii")
+        self.not_modified_headers = f"ETag: {etag}\r\n".encode("ascii")
+
+    def matches(self, st: os.stat_result) -> bool:
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+
+class ServedFiles:
+    """
+    URL のパスから配信するファイルを探す。配信するのは生成時に .offlinelist_serve.json へ
+    記録したファイルだけ（元の CSV・XML や .state.json などが --host でネットワークに出ないようにする）。
+    ETag は記録を使い、ファイルが記録より新しい場合だけ計算する（結果はファイルが変わるまでメモリに保持する）。
+    """
+
+    def __init__(self, root_dir: str, prefix: str = "/"):
+        self.root_dir = os.path.abspath(root_dir)
+        self.prefix = "/" + prefix.strip("/") + "/" if prefix.strip("/") else "/"
+        self.manifest_path = os.path.join(self.root_dir, SERVE_MANIFEST_NAME)
+        self.manifest = None
+        self.manifest_signature = None
+        self.files = {}
+
+    def refresh_manifest(self):
+        """記録が書き換わっていれば（配信中に変換・images を実行した場合）読み直す。"""
+        try:
+            st = os.stat(self.manifest_path)
+            signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            signature = None
+        if self.manifest is None or signature != self.manifest_signature:
+            self.manifest = FileHashCache(self.manifest_path)
+            self.manifest_signature = signature
+
+    def resolve(self, target: str):
+        """URL のパスを記録のキーにする。配信しないパス（記録にないファイル）は None。"""
+        from urllib.parse import unquote, urlsplit
+
+        path = unquote(urlsplit(target).path)
+        if not path.startswith(self.prefix):
+            return None
+        parts = path[len(self.prefix):].split("/")
+        if any(not part or part.startswith(".") or "\\" in part or "\0" in part for part in parts):
+            return None
+        key = "/".join(parts)
+        self.refresh_manifest()
+        if key not in self.manifest.files:
+            return None
+        return key
+
+    def load(self, key: str, f) -> ServedFile:
+        st = os.fstat(f.fileno())
+        served = self.files.get(key)
+        if served is not None and served.matches(st):
+            return served
+
+        etag = self.manifest.get(key, st)
+        body = None
+        if st.st_size <= SERVE_MEMORY_CACHE_BYTES:
+            body = f.read()
+            if etag is None:
+                import io
+
+                etag = compute_etag(io.BytesIO(body))
+        elif etag is None:
+            etag = compute_etag(f)
+        served = self.files[key] = ServedFile(f.name, st, etag, body)
+        return served
+
+    def open(self, key: str):
+        path = os.path.join(self.root_dir, *key.split("/"))
+        if not os.path.isfile(path):
+            return None
+        return open(path, "rb")
+
+
+# -------------------------------
+# HTTP
+# -------------------------------
+SERVE_DEFAULT_HOST = "127.0.0.1"
+SERVE_DEFAULT_PORT = 8080
+REQUEST_HEAD_LIMIT = 16 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    431: "Request Header Fields Too Large",
+}
+
+
+class BadRequest(Exception):
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
+
+
+def parse_request_head(head: bytes) -> tuple:
+    """リクエストの先頭部分から (メソッド, パス, バージョン, ヘッダー) を返す（ヘッダー名は小文字）。"""
+    try:
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise BadRequest(400)
+    if not version.startswith("HTTP/1."):
+        raise BadRequest(400)
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise BadRequest(400)
+        headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+def wants_keep_alive(version: str, headers: dict) -> bool:
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # 弱い比較（W/ を無視する）
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+
+def response_head(status: int, headers: bytes, keep_alive: bool) -> bytes:
+    connection = b"Connection: keep-alive\r\n" if keep_alive else b"Connection: close\r\n"
+    return f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n".encode("ascii") + headers + connection + b"\r\n"
+
+
+def error_response(status: int, keep_alive: bool) -> bytes:
+    body = f"{status} {STATUS_TEXT[status]}\n".encode("ascii")
+    headers = f"Content-Type: text/plain\r\nContent-Length: {len(body)}\r\n"
+    if status == 405:
+        headers += "Allow: GET, HEAD\r\n"
+    return response_head(status, headers.encode("ascii"), keep_alive) + body
+
+
+class UpdateServer:
+    def __init__(self, files: ServedFiles, log=None):
+        self.files = files
+        self.log = log
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        import asyncio
+
+        try:
+            while await self.handle_request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader, writer) -> bool:
+        """1 リクエストを処理し、接続を続けるなら True を返す。"""
+        import asyncio
+
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                writer.write(error_response(400, False))
+            return False
+        except asyncio.LimitOverrunError:
+            writer.write(error_response(431, False))
+            return False
+
+        self.requests += 1
+        try:
+            method, target, version, headers = parse_request_head(head)
+        except BadRequest as e:
+            writer.write(error_response(e.status, False))
+            return False
+        keep_alive = wants_keep_alive(version, headers)
+        # 本文のあるリクエストは扱わない（接続を閉じて読み飛ばしを避ける）
+        if "content-length" in headers or "transfer-encoding" in headers:
+            keep_alive = False
+
+        status, size = await self.respond(writer, method, target, headers, keep_alive)
+        if self.log is not None:
+            self.log(f"{method} {target} {status} {size}")
+        await writer.drain()
+        return keep_alive
+
+    async def respond(self, writer, method: str, target: str, headers: dict, keep_alive: bool) -> tuple:
+        if method not in ("GET", "HEAD"):
+            writer.write(error_response(405, keep_alive))
+            return 405, 0
+        key = self.files.resolve(target)
+        f = self.files.open(key) if key is not None else None
+        if f is None:
+            writer.write(error_response(404, keep_alive))
+            return 404, 0
+
+        with f:
+            served = self.files.load(key, f)
+            if_none_match = headers.get("if-none-match")
+            if if_none_match is not None and etag_matches(served.etag, if_none_match):
+                writer.write(response_head(304, served.not_modified_headers, keep_alive))
+                return 304, 0
+
+            writer.write(response_head(200, served.headers, keep_alive))
+            if method == "HEAD":
+                return 200, 0
+            if served.body is not None:
+                writer.write(served.body)
+            else:
+                import asyncio
+
+                await writer.drain()
+                await asyncio.get_running_loop().sendfile(writer.transport, f, 0, served.size)
+            return 200, served.size
+
+
+async def start_update_server(root_dir: str, host: str = SERVE_DEFAULT_HOST, port: int = SERVE_DEFAULT_PORT,
+                              prefix: str = "/", log=None):
+    """サーバーを起動して (asyncio.Server, UpdateServer) を返す（port=0 なら空いているポート）。"""
+    import asyncio
+
+    handler = UpdateServer(ServedFiles(root_dir, prefix), log)
+    server = await asyncio.start_server(handler.handle, host, port, limit=REQUEST_HEAD_LIMIT)
+    return server, handler
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def default_prefix(config: dict) -> str:
+    from urllib.parse import urlsplit
+
+    return urlsplit(config.get("base_url", "")).path or "/"
+
+
+def main(argv: list) -> int:
+    import argparse
+    import asyncio
+
+    from generator import load_config
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py serve",
+        description="出力フォルダの {datCode}.txt / {datCode}.zip / 画像 zip を HTTP で配信します（DAT 更新の確認用）。",
+    )
+    parser.add_argument("root_dir", nargs="?", default=".", help="配信するフォルダ（既定: カレントフォルダ）")
+    parser.add_argument("--host", default=SERVE_DEFAULT_HOST, help=f"待ち受けるアドレス（既定: {SERVE_DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=SERVE_DEFAULT_PORT, help=f"ポート番号（既定: {SERVE_DEFAULT_PORT}）")
+    parser.add_argument("--prefix", help="URL のパス（既定: config.json の base_url のパス部分）")
+    parser.add_argument("--quiet", action="store_true", help="リクエストごとのログを表示しない")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root_dir):
+        print(f"エラー: フォルダではありません: {args.root_dir}", file=sys.stderr)
+        return 1
+    prefix = args.prefix if args.prefix is not None else default_prefix(load_config())
+
+    async def serve():
+        server, handler = await start_update_server(args.root_dir, args.host, args.port, prefix,
+                                                    None if args.quiet else print)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"配信中: http://{host}:{port}{handler.files.prefix} → {handler.files.root_dir}（Ctrl+C で終了）")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except OSError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
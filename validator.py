@@ -0,0 +1,385 @@
+"""
+DAT / CSV の検証。
+
+  python generator.py validate fc.csv --extension nes
+  python generator.py validate fc.xml sfc.csv --strict
+
+1 回の走査ですべての規則を調べ、違反を行番号（DAT は何件目の <game> か）付きで報告する。
+ファイル全体は読み込まず、重複の判定に使う imageNumber / romCRC の値だけを集合で保持する。
+CSV → XML の変換で validate=True（CLI では --validate）を指定すると、
+エラーがあった場合は出力ファイルを作らずに中止する。
+"""
+import csv
+import re
+import sys
+from itertools import chain
+
+from generator import (
+    CRC_COLUMNS,
+    CSV_FIELDNAMES,
+    NUMBER_COLUMNS,
+    ROM_COLUMN_PATTERN,
+    XML_INVALID_CHARS,
+    GameRowExtractor,
+    is_csv,
+    is_xml,
+    iter_games,
+)
+
+
+# -------------------------------
+# 規則
+# -------------------------------
+CRC_VALUE_PATTERN = re.compile(r"\s*[0-9A-Fa-f]{8}\s*")
+NUMBER_VALUE_PATTERN = re.compile(r"\s*[0-9]+\s*")
+EXTENSION_VALUE_PATTERN = re.compile(r"\s*\.[0-9A-Za-z_+-]+\s*")
+
+# まとめて検査するときの 1 つの値のパターン（上の規則より厳しく、前後の空白は半角スペースだけを許す）。
+# romCRC は重複の判定にそのまま使うため、前後の空白も許さない
+BATCH_CELL_PATTERNS = {
+    "crc": r" *(?:[0-9A-Fa-f]{8} *)?",
+    "number": r" *(?:[0-9]+ *)?",
+    "extension": r" *(?:\.[0-9A-Za-z_+-]+ *)?",
+    "title": r"[^\n]*\S[^\n]*",
+    "imageNumber": r" *[0-9]+ *",
+    "romCRC": r"(?:[0-9A-Fa-f]{8})?",
+}
+VALUE_PATTERNS = {
+    "crc": CRC_VALUE_PATTERN,
+    "number": NUMBER_VALUE_PATTERN,
+    "extension": EXTENSION_VALUE_PATTERN,
+}
+VALIDATION_BATCH_ROWS = 1024
+
+ERROR = "error"
+WARNING = "warning"
+
+RULE_MESSAGES = {
+    "missing-column": "必須の列がありません",
+    "invalid-char": "XML に使用できない制御文字が含まれています",
+    "crc": "CRC は 16 進数 8 桁で指定してください",
+    "number": "数値ではありません",
+    "extension": "拡張子の形式が正しくありません（例: .nes）",
+    "empty-title": "title が空です",
+    "empty-image-number": "imageNumber が空です",
+    "duplicate-image-number": "imageNumber が重複しています",
+    "duplicate-rom-crc": "romCRC が重複しています",
+    "extension-mismatch": "拡張子が DAT の設定と異なります",
+}
+# ここにない規則はエラー（OfflineList で読み込めない、または CSV → XML の変換に失敗する）
+RULE_LEVELS = {
+    "duplicate-rom-crc": WARNING,
+    "extension-mismatch": WARNING,
+}
+REQUIRED_COLUMNS = ("imageNumber", "title")
+MAX_KEPT_VIOLATIONS = 1000
+FAILURE_REPORT_LINES = 20
+
+
+def compile_batch_pattern(cell: str):
+    # 改行でつないだ列の値全体に一致するパターン（件数は呼び出し側で改行の数から確かめる）
+    return re.compile(f"(?:{cell}\n)*{cell}")
+
+
+class Violation:
+    def __init__(self, rule: str, column: str, value: str, game: int, line: int = None):
+        self.rule = rule
+        self.column = column
+        self.value = value
+        self.game = game    # 何件目のゲームか（1 始まり、ヘッダーは 0）
+        self.line = line    # CSV の行番号（DAT では None）
+
+    @property
+    def level(self) -> str:
+        return RULE_LEVELS.get(self.rule, ERROR)
+
+    def format(self, path: str = "") -> str:
+        position = f"{self.line} 行目" if self.line is not None else f"{self.game} 件目の <game>"
+        text = f"{path}: {position}" if path else position
+        text += f": [{self.level}] {self.column}: {RULE_MESSAGES[self.rule]}"
+        if self.value:
+            text += f"（{self.value!r}）"
+        return text
+
+
+class ValidationFailed(ValueError):
+    """検証でエラーが見つかったため、変換を中止したことを示す。"""
+
+    def __init__(self, validator):
+        self.validator = validator
+        lines = [f"検証エラーが {validator.errors:,} 件あります（警告 {validator.warnings:,} 件）。"
+                 "出力ファイルは作成していません。"]
+        errors = [violation for violation in validator.violations if violation.level == ERROR]
+        lines.extend(violation.format() for violation in errors[:FAILURE_REPORT_LINES])
+        if validator.errors > FAILURE_REPORT_LINES:
+            lines.append(f"…ほか {validator.errors - FAILURE_REPORT_LINES:,} 件")
+        super().__init__("\n".join(lines))
+
+
+# -------------------------------
+# 検証器（列ごとの検査をヘッダーから一度だけ組み立てる）
+# -------------------------------
+class GameValidator:
+    """
+    set_header(header) のあと check(row, line) を行ごとに呼び、最後に finish() を呼ぶ。
+    行は VALIDATION_BATCH_ROWS 件ずつまとめ、列ごとに改行でつないだ値を 1 つの正規表現で調べる。
+    まとめた検査に通らなかった場合だけ、その範囲を 1 行ずつ調べ直して違反を特定する。
+    違反は report（省略可）に 1 件ずつ渡し、先頭の MAX_KEPT_VIOLATIONS 件を violations に残す。
+    extension_with_dot を渡すと、extension 列がそれと異なる行を警告する。
+    """
+
+    def __init__(self, extension_with_dot: str = None, report=None, keep: int = MAX_KEPT_VIOLATIONS):
+        self.expected_extension = (extension_with_dot or "").strip().lower() or None
+        self.report = report
+        self.keep = keep
+        self.violations = []
+        self.errors = 0
+        self.warnings = 0
+        self.rows = 0
+        self.image_numbers = set()
+        self.rom_crcs = set()
+        self.header_names = []
+        self.width = 0
+        self.checks = []
+        self.batch_checks = []
+        self.extension_indexes = []
+        self.title_index = None
+        self.image_index = None
+        self.rom_index = None
+        self.pending = []
+        self.pending_lines = []
+
+    def add(self, rule: str, column: str, value: str, line: int = None, game: int = 0):
+        violation = Violation(rule, column, value, game, line)
+        if violation.level == ERROR:
+            self.errors += 1
+        else:
+            self.warnings += 1
+        if len(self.violations) < self.keep:
+            self.violations.append(violation)
+        if self.report is not None:
+            self.report(violation)
+
+    def set_header(self, header: list):
+        self.header_names = list(header)
+        self.width = len(header)
+        positions = {}
+        for i, name in enumerate(header):
+            positions.setdefault(name, i)
+        for name in REQUIRED_COLUMNS:
+            if name not in positions:
+                self.add("missing-column", name, "", line=1)
+
+        self.title_index = positions.get("title")
+        self.image_index = positions.get("imageNumber")
+        self.rom_index = positions.get("romCRC")
+
+        # (列番号, 列名, 規則)。空欄は検査しない
+        self.checks = []
+        for i, name in enumerate(header):
+            if positions[name] != i:
+                continue
+            match = ROM_COLUMN_PATTERN.match(name)
+            if name in CRC_COLUMNS or (match and match.group(1) == "romCRC"):
+                self.checks.append((i, name, "crc"))
+            elif name in NUMBER_COLUMNS:
+                self.checks.append((i, name, "number"))
+            elif match:
+                self.checks.append((i, name, "extension"))
+        self.extension_indexes = [(i, name) for i, name, rule in self.checks if rule == "extension"]
+
+        cells = {i: BATCH_CELL_PATTERNS[rule] for i, _, rule in self.checks}
+        if self.title_index is not None:
+            cells[self.title_index] = BATCH_CELL_PATTERNS["title"]
+        if self.image_index is not None:
+            cells[self.image_index] = BATCH_CELL_PATTERNS["imageNumber"]
+        if self.rom_index is not None:
+            cells[self.rom_index] = BATCH_CELL_PATTERNS["romCRC"]
+        self.batch_checks = [(i, compile_batch_pattern(cell)) for i, cell in sorted(cells.items())]
+
+    def check(self, row: list, line: int = None):
+        self.rows += 1
+        if len(row) < self.width:
+            row = row + [""] * (self.width - len(row))
+        self.pending.append(row)
+        self.pending_lines.append(line)
+        if len(self.pending) >= VALIDATION_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        batch = self.pending
+        lines = self.pending_lines
+        self.pending = []
+        self.pending_lines = []
+        if not batch or self.check_batch(batch):
+            return
+        first_game = self.rows - len(batch) + 1
+        for n, (row, line) in enumerate(zip(batch, lines)):
+            self.check_row(row, line, first_game + n)
+
+    def finish(self):
+        self.flush()
+
+    def check_batch(self, batch: list) -> bool:
+        """
+        batch の全行に違反がなければ True を返し、重複の判定用の集合に値を加える。
+        False の場合は集合を変更しない（check_row で 1 行ずつ調べ直す）。
+        """
+        count = len(batch)
+        if XML_INVALID_CHARS.search("\t".join(chain.from_iterable(batch))) is not None:
+            return False
+
+        columns = list(zip(*batch))
+        texts = {}
+        for i, pattern in self.batch_checks:
+            text = texts[i] = "\n".join(columns[i])
+            if text.count("\n") != count - 1 or pattern.fullmatch(text) is None:
+                return False
+
+        image_numbers = None
+        if self.image_index is not None:
+            image_numbers = set(map(int, columns[self.image_index]))
+            if len(image_numbers) != count or not self.image_numbers.isdisjoint(image_numbers):
+                return False
+
+        rom_crcs = None
+        if self.rom_index is not None:
+            crcs = texts[self.rom_index].upper().split("\n")
+            rom_crcs = set(crcs)
+            rom_crcs.discard("")
+            if len(rom_crcs) != count - crcs.count("") or not self.rom_crcs.isdisjoint(rom_crcs):
+                return False
+
+        if self.expected_extension is not None:
+            allowed = {"", self.expected_extension}
+            for i, _ in self.extension_indexes:
+                if not set(texts[i].lower().split("\n")) <= allowed:
+                    return False
+
+        if image_numbers is not None:
+            self.image_numbers |= image_numbers
+        if rom_crcs is not None:
+            self.rom_crcs |= rom_crcs
+        return True
+
+    def check_row(self, row: list, line: int, game: int):
+        if XML_INVALID_CHARS.search("\t".join(row)) is not None:
+            for i, value in enumerate(row):
+                if XML_INVALID_CHARS.search(value) is not None:
+                    self.add("invalid-char", self.column_name(i), value, line, game)
+
+        for i, name, rule in self.checks:
+            value = row[i]
+            if value and VALUE_PATTERNS[rule].fullmatch(value) is None and not value.isspace():
+                self.add(rule, name, value, line, game)
+
+        if self.title_index is not None:
+            title = row[self.title_index]
+            if not title or title.isspace():
+                self.add("empty-title", "title", "", line, game)
+
+        if self.image_index is not None:
+            number = row[self.image_index].strip()
+            if not number:
+                self.add("empty-image-number", "imageNumber", "", line, game)
+            else:
+                count = len(self.image_numbers)
+                self.image_numbers.add(int(number) if number.isascii() and number.isdigit() else number)
+                if len(self.image_numbers) == count:
+                    self.add("duplicate-image-number", "imageNumber", number, line, game)
+
+        if self.rom_index is not None:
+            crc = row[self.rom_index].strip().upper()
+            if crc:
+                count = len(self.rom_crcs)
+                self.rom_crcs.add(crc)
+                if len(self.rom_crcs) == count:
+                    self.add("duplicate-rom-crc", "romCRC", crc, line, game)
+
+        if self.expected_extension is not None:
+            for i, name in self.extension_indexes:
+                extension = row[i].strip()
+                if extension and extension.lower() != self.expected_extension:
+                    self.add("extension-mismatch", name, extension, line, game)
+
+    def column_name(self, index: int) -> str:
+        return self.header_names[index] if index < len(self.header_names) else f"列 {index + 1}"
+
+    def raise_for_errors(self):
+        self.finish()
+        if self.errors:
+            raise ValidationFailed(self)
+
+
+# -------------------------------
+# ファイルの検証
+# -------------------------------
+def validate_file(path: str, extension_with_dot: str = None, report=None) -> GameValidator:
+    """CSV / DAT を 1 回だけ走査して検証し、件数と違反を持つ GameValidator を返す。"""
+    validator = GameValidator(extension_with_dot, report)
+    if is_xml(path):
+        validator.set_header(CSV_FIELDNAMES)
+        extractor = GameRowExtractor()
+        for game in iter_games(path):
+            validator.check(extractor.extract(game))
+        validator.finish()
+        return validator
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return validator
+        validator.set_header(header)
+        # 値の中に改行がある行も、その行の始まりの行番号で報告する
+        line = reader.line_num + 1
+        for row in reader:
+            if row:
+                validator.check(row, line)
+            line = reader.line_num + 1
+    validator.finish()
+    return validator
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def main(argv: list) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py validate",
+        description="CSV / DAT の CRC・番号・タイトル・拡張子を検証し、違反を行番号付きで表示します。",
+    )
+    parser.add_argument("paths", nargs="+", help="検証する CSV / DAT（XML）")
+    parser.add_argument("--extension", help="DAT の拡張子（例: nes）。extension 列と異なる行を警告する")
+    parser.add_argument("--strict", action="store_true", help="警告もエラーとして扱う（終了コード 1）")
+    parser.add_argument("--quiet", action="store_true", help="違反の一覧を表示せず、件数だけを表示する")
+    args = parser.parse_args(argv)
+
+    extension_with_dot = None
+    if args.extension and args.extension.strip():
+        extension_with_dot = "." + args.extension.strip().lstrip(".")
+
+    failed = False
+    for path in args.paths:
+        if not (is_csv(path) or is_xml(path)):
+            print(f"エラー: CSV / XML ファイルではありません: {path}", file=sys.stderr)
+            failed = True
+            continue
+
+        def report(violation: Violation):
+            print(violation.format(path))
+
+        try:
+            validator = validate_file(path, extension_with_dot, None if args.quiet else report)
+        except (ValueError, OSError, SyntaxError) as e:
+            # SyntaxError は DAT の解析エラー（xml.etree.ElementTree.ParseError）
+            print(f"エラー: {path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+
+        print(f"{path}: {validator.rows:,} 件  エラー {validator.errors:,} 件  警告 {validator.warnings:,} 件")
+        if validator.errors or (args.strict and validator.warnings):
+            failed = True
+    return 1 if failed else 0
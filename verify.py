@@ -0,0 +1,414 @@
+"""
+2 つの DAT（または CSV）のゲームの内容の比較（XML → CSV → XML の往復で失われたものがないかの確認）。
+
+  python generator.py verify fc.xml fc_new.xml
+  python generator.py verify fc.xml --round-trip
+
+<game> ごとに項目を正規化（前後の空白・空欄の " "・項目の順序・CRC の大文字小文字を無視）して
+ダイジェストを作り、romCRC（なければ imageNumber、title）をキーに突き合わせる。
+ゲームの並び順は比較しない。大きな DAT は <game> の境界で分割して複数プロセスで計算する。
+保持するのは比較元のキーとダイジェスト、各 <game> の位置だけで、比較先は読みながら突き合わせる。
+追加・削除・変更のあったゲームの項目は、表示する分の <game> だけを読み直して求める。
+"""
+import csv
+import hashlib
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+
+from generator import (
+    PARALLEL_CHUNK_BYTES,
+    PARALLEL_PARSE_MIN_BYTES,
+    GameRowExtractor,
+    XmlTextDecoder,
+    can_scan_bytes,
+    is_csv,
+    is_xml,
+    iter_game_chunks,
+    iter_games,
+    iter_games_from_text,
+)
+
+
+# -------------------------------
+# ゲームの正規化とダイジェスト
+# -------------------------------
+CRC_FIELD_PATTERN = re.compile(r"^(?:romCRC(?:[2-9]|[1-9][0-9]+)?|im1CRC|im2CRC)$")
+DIGEST_SIZE = 16
+
+
+class GameDigester:
+    """
+    <game>（または CSV の 1 行）を正規化した行にし、空でない項目を項目名順に並べた文字列からダイジェストを作る。
+    XML は GameRowExtractor（discover_columns=True）で CSV と同じ列名の行にしてから扱う。
+    """
+
+    def __init__(self, header: list = None):
+        self.extractor = GameRowExtractor(header, discover_columns=header is None)
+        self.columns = self.extractor.columns
+        self.order_width = -1
+
+    def refresh_order(self):
+        # 列が増えたときだけ、項目名順の並びと CRC 列の位置を作り直す（同じ列名が複数あれば最初の列）
+        first = {}
+        for i, name in enumerate(self.columns):
+            first.setdefault(name, i)
+        self.order = [(first[name], name) for name in sorted(first)]
+        self.prefixed_order = [(i, name + "\x1e") for i, name in self.order]
+        self.crc_indexes = [i for i, name in self.order if CRC_FIELD_PATTERN.match(name)]
+        self.rom_index = first.get("romCRC")
+        self.image_index = first.get("imageNumber")
+        self.title_index = first.get("title")
+        self.order_width = len(self.columns)
+
+    def normalize(self, row: list, strip: bool = False) -> list:
+        """列数をそろえ、CRC を大文字にする。strip=True なら前後の空白も除く（XML の行は除去済み）。"""
+        if self.order_width != len(self.columns):
+            self.refresh_order()
+        if strip:
+            row = [value.strip() for value in row]
+        if len(row) < self.order_width:
+            row += [""] * (self.order_width - len(row))
+        for i in self.crc_indexes:
+            if row[i]:
+                row[i] = row[i].upper()
+        return row
+
+    def game_row(self, game: ET.Element) -> list:
+        return self.normalize(self.extractor.extract(game))
+
+    def digest(self, row: list) -> tuple:
+        """
+        正規化した行の (キー, ダイジェスト) を返す。キーは romCRC、なければ imageNumber、title の順で、
+        どれもなければダイジェストそのもの（並び順に関係なく同じ内容のゲームどうしが対応する）。
+        """
+        text = "\x1f".join([prefix + row[i] for i, prefix in self.prefixed_order if row[i]])
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+        if self.rom_index is not None and row[self.rom_index]:
+            return "romCRC=" + row[self.rom_index], digest
+        if self.image_index is not None and row[self.image_index]:
+            return "imageNumber=" + row[self.image_index], digest
+        if self.title_index is not None and row[self.title_index]:
+            return "title=" + " ".join(row[self.title_index].split()), digest
+        return "digest=" + digest.hex(), digest
+
+    def fields(self, row: list) -> dict:
+        return {name: row[i] for i, name in self.order if row[i]}
+
+
+def digest_game_chunk(job: tuple) -> list:
+    """1 チャンク分の <game> を解析し、[(キー, ダイジェスト), ...] を返す（ワーカープロセスでも使う）。"""
+    xml_path, encoding, spans = job
+    start = spans[0][0]
+    end = spans[-1][0] + spans[-1][1]
+    with open(xml_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    decoder = XmlTextDecoder(encoding)
+
+    def texts():
+        yield "<chunk>"
+        for offset, length in spans:
+            yield decoder.decode(data[offset - start:offset - start + length], final=True)
+        yield "</chunk>"
+
+    digester = GameDigester()
+    return [digester.digest(digester.game_row(game)) for game in iter_games_from_text(texts())]
+
+
+# -------------------------------
+# ファイルの走査
+# -------------------------------
+def span_scan_encoding(path: str):
+    """<game> の位置をバイト列のまま探せる DAT なら文字コードを、そうでなければ None を返す。"""
+    if not is_xml(path):
+        return None
+    encoding = XmlTextDecoder.for_file(path).encoding
+    return encoding if can_scan_bytes(encoding) else None
+
+
+def iter_sequential_rows(path: str):
+    """(GameDigester, 正規化した行) を出現順に返す（<game> の位置を使わない読み方）。"""
+    if is_xml(path):
+        digester = GameDigester()
+        for game in iter_games(path):
+            yield digester, digester.game_row(game)
+        return
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        digester = GameDigester(header)
+        for row in reader:
+            if row:
+                yield digester, digester.normalize(row, strip=True)
+
+
+def iter_digests(path: str, encoding: str = None, executor=None, workers: int = 1, spans=None):
+    """
+    ファイルのゲームの (キー, ダイジェスト) を出現順に返す。
+    encoding（span_scan_encoding の結果）を渡すと <game> の位置で分割して解析し、各 <game> の
+    開始位置とバイト長を spans（array）に追加する。大きな DAT は executor のプロセスで並列に計算する。
+    """
+    if encoding is None:
+        for digester, row in iter_sequential_rows(path):
+            yield digester.digest(row)
+        return
+
+    def chunks():
+        for chunk in iter_game_chunks(path, PARALLEL_CHUNK_BYTES):
+            for offset, length in chunk:
+                spans.append(offset)
+                spans.append(length)
+            yield chunk
+
+    jobs = ((path, encoding, chunk) for chunk in chunks())
+    if executor is None or workers < 2 or os.path.getsize(path) < PARALLEL_PARSE_MIN_BYTES:
+        for job in jobs:
+            yield from digest_game_chunk(job)
+        return
+
+    # 同時に処理するチャンクは workers の 2 倍までに抑え、元の順序で返す
+    from collections import deque
+
+    pending = deque()
+
+    def submit_next():
+        job = next(jobs, None)
+        if job is not None:
+            pending.append(executor.submit(digest_game_chunk, job))
+
+    for _ in range(workers * 2):
+        submit_next()
+    while pending:
+        results = pending.popleft().result()
+        submit_next()
+        yield from results
+
+
+def read_game_fields(path: str, encoding: str, spans, numbers: set) -> dict:
+    """numbers（0 から数えた出現順）のゲームの項目を {番号: 項目} で返す。位置がわかれば該当する <game> だけを読む。"""
+    found = {}
+    if encoding is None:
+        for number, (digester, row) in enumerate(iter_sequential_rows(path)):
+            if number in numbers:
+                found[number] = digester.fields(row)
+        return found
+
+    digester = GameDigester()
+    with open(path, "rb") as f:
+        for number in sorted(numbers):
+            f.seek(spans[number * 2])
+            text = f.read(spans[number * 2 + 1]).decode(encoding, "replace")
+            found[number] = digester.fields(digester.game_row(ET.fromstring(text)))
+    return found
+
+
+# -------------------------------
+# 比較
+# -------------------------------
+class VerifyResult:
+    """
+    added / changed は比較先、removed は比較元での出現順に (キー, 番号) を持つ（番号は 0 から数えた出現順）。
+    fields_a / fields_b は詳しく表示するゲームの {キー: 項目}。
+    """
+
+    def __init__(self):
+        self.games_a = 0
+        self.games_b = 0
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.fields_a = {}
+        self.fields_b = {}
+
+    @property
+    def identical(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def unique_key(key: str, seen, counts: dict) -> str:
+    # 同じキーの 2 件目以降は "#2" などを付ける
+    if seen(key):
+        counts[key] = counts.get(key, 1) + 1
+        return f"{key}#{counts[key]}"
+    return key
+
+
+def compare_files(path_a: str, path_b: str, executor=None, workers: int = 1, use_spans: bool = True,
+                  detail_limit: int = None) -> VerifyResult:
+    from array import array
+
+    result = VerifyResult()
+    encodings = [span_scan_encoding(path) if use_spans else None for path in (path_a, path_b)]
+    spans = [array("q"), array("q")]
+
+    # 比較元はキーとダイジェストだけを保持し、比較先は読みながら突き合わせる（照合済みは None にする）
+    digests = {}
+    counts = {}
+    for key, digest in iter_digests(path_a, encodings[0], executor, workers, spans[0]):
+        digests[unique_key(key, digests.__contains__, counts)] = digest
+    result.games_a = len(digests)
+
+    added = set()
+    counts = {}
+
+    def seen_in_b(key: str) -> bool:
+        return key in added or (key in digests and digests[key] is None)
+
+    missing = object()
+    for number, (key, digest) in enumerate(iter_digests(path_b, encodings[1], executor, workers, spans[1])):
+        result.games_b = number + 1
+        key = unique_key(key, seen_in_b, counts)
+        previous = digests.get(key, missing)
+        if previous is missing:
+            added.add(key)
+            result.added.append((key, number))
+            continue
+        if previous != digest:
+            result.changed.append((key, number))
+        digests[key] = None
+
+    changed_keys = {key for key, _ in result.changed[:detail_limit]}
+    numbers_a = {}
+    for number, (key, digest) in enumerate(digests.items()):
+        if digest is not None:
+            result.removed.append((key, number))
+        elif key in changed_keys:
+            numbers_a[key] = number
+
+    # 2 回目: 表示するゲームの項目だけを読み直す
+    wanted_a = dict(result.removed[:detail_limit])
+    wanted_a.update(numbers_a)
+    wanted_b = dict(result.added[:detail_limit] + result.changed[:detail_limit])
+    for path, encoding, game_spans, wanted, fields in (
+            (path_a, encodings[0], spans[0], wanted_a, result.fields_a),
+            (path_b, encodings[1], spans[1], wanted_b, result.fields_b)):
+        if wanted:
+            found = read_game_fields(path, encoding, game_spans, set(wanted.values()))
+            fields.update((key, found[number]) for key, number in wanted.items())
+    return result
+
+
+def verify_files(path_a: str, path_b: str, workers: int = None, detail_limit: int = None) -> VerifyResult:
+    """
+    path_a と path_b のゲームを比較する。追加・削除・変更のあったゲームのうち、
+    各分類の先頭 detail_limit 件（None ならすべて）の項目を fields_a / fields_b に入れる。
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        try:
+            return compare_files(path_a, path_b, executor, workers, True, detail_limit)
+        except ET.ParseError:
+            # <game> だけでは解析できない DAT（外側で宣言した名前空間接頭辞など）は全体を 1 プロセスで読み直す
+            return compare_files(path_a, path_b, None, 1, False, detail_limit)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def format_field_changes(before: dict, after: dict) -> list:
+    changes = []
+    for name in sorted(set(before) | set(after)):
+        if before.get(name, "") != after.get(name, ""):
+            changes.append(f"{name}: {before.get(name, '')!r} → {after.get(name, '')!r}")
+    return changes
+
+
+def describe_game(fields: dict) -> str:
+    title = fields.get("title")
+    return "「" + " ".join(title.split()) + "」" if title else ""
+
+
+# -------------------------------
+# 往復変換（XML → CSV → XML）
+# -------------------------------
+def round_trip(xml_path: str, work_dir: str, discover_columns: bool = False, workers: int = None) -> str:
+    """xml_path を work_dir で CSV に変換し、それを XML に戻したパスを返す。"""
+    from generator import generate_csv_from_xml, generate_xml_from_csv, load_config
+
+    csv_path = os.path.join(work_dir, "roundtrip.csv")
+    generate_csv_from_xml(xml_path, discover_columns=discover_columns, parse_workers=workers, csv_path=csv_path)
+    return generate_xml_from_csv(csv_path, "verify", "verify", "verify", "", "", "", "verify",
+                                 config=load_config(), incremental=False, zip_output=False, validate=False)
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+VERIFY_DETAIL_LIMIT = 50
+
+
+def main(argv: list) -> int:
+    import argparse
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py verify",
+        description="2 つの DAT / CSV のゲームを romCRC（なければ imageNumber）で突き合わせ、"
+                    "追加・削除・変更されたゲームを表示します（空白・並び順の違いは無視）。",
+    )
+    parser.add_argument("path_a", help="比較元の DAT（XML）/ CSV")
+    parser.add_argument("path_b", nargs="?", help="比較先の DAT（XML）/ CSV（--round-trip の場合は不要）")
+    parser.add_argument("--round-trip", action="store_true",
+                        help="path_a を XML → CSV → XML に変換した結果と比較する")
+    parser.add_argument("--discover-columns", action="store_true",
+                        help="往復変換で、標準の列以外のタグも CSV の列にする（convert と同じ）")
+    parser.add_argument("--workers", type=int, default=None, help="並列に計算するプロセス数（既定: CPU 数）")
+    parser.add_argument("--limit", type=int, default=VERIFY_DETAIL_LIMIT,
+                        help=f"分類ごとに詳しく表示する件数（既定: {VERIFY_DETAIL_LIMIT}、0 ならすべて）")
+    args = parser.parse_args(argv)
+
+    if args.round_trip == (args.path_b is not None):
+        parser.error("比較先を指定するか、--round-trip を指定してください。")
+    paths = [args.path_a] if args.round_trip else [args.path_a, args.path_b]
+    for path in paths:
+        if not os.path.isfile(path) or not (is_csv(path) or is_xml(path)):
+            print(f"エラー: CSV / XML ファイルではありません: {path}", file=sys.stderr)
+            return 1
+    if args.round_trip and not is_xml(args.path_a):
+        print(f"エラー: --round-trip には XML を指定してください: {args.path_a}", file=sys.stderr)
+        return 1
+
+    limit = args.limit or None
+    start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            path_b = args.path_b
+            if args.round_trip:
+                path_b = round_trip(args.path_a, work_dir, args.discover_columns, args.workers)
+            result = verify_files(args.path_a, path_b, args.workers, limit)
+    except (ValueError, OSError, ET.ParseError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    seconds = time.perf_counter() - start
+
+    label_b = "往復変換の結果" if args.round_trip else args.path_b
+    print(f"A: {args.path_a}  {result.games_a:,} 件")
+    print(f"B: {label_b}  {result.games_b:,} 件")
+    print(f"追加 {len(result.added):,} 件  削除 {len(result.removed):,} 件  変更 {len(result.changed):,} 件"
+          f"  （{seconds:.2f} 秒）")
+
+    for key, _ in result.added[:limit]:
+        print(f"  [追加] {key} {describe_game(result.fields_b.get(key, {}))}")
+    for key, _ in result.removed[:limit]:
+        print(f"  [削除] {key} {describe_game(result.fields_a.get(key, {}))}")
+    for key, _ in result.changed[:limit]:
+        before = result.fields_a.get(key, {})
+        after = result.fields_b.get(key, {})
+        print(f"  [変更] {key} {describe_game(before)}")
+        for change in format_field_changes(before, after):
+            print(f"      {change}")
+    hidden = sum(max(0, len(keys) - limit) for keys in (result.added, result.removed, result.changed)) if limit else 0
+    if hidden:
+        print(f"  ……ほか {hidden:,} 件（--limit で表示件数を変更）")
+    return 0 if result.identical else 1
@@ -0,0 +1,247 @@
+"""
+監視モード。
+
+  python generator.py watch masters/ --manifest manifest.json
+
+指定したディレクトリの CSV（--from xml なら XML、all なら両方）を定期的に確認し、
+保存が落ち着いた（--debounce 秒間変化がない）ファイルだけを変換する。
+内容のハッシュが前回変換時と同じファイルや、このツール自身が書き出したファイルは変換しない。
+"""
+import os
+import sys
+import time
+
+from generator import (
+    add_convert_options,
+    build_convert_job,
+    convert_file,
+    format_convert_result,
+    is_csv,
+    is_xml,
+    load_config,
+    load_manifest,
+    parse_convert_args,
+)
+
+
+# -------------------------------
+# ファイルの状態
+# -------------------------------
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    import hashlib
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(HASH_BLOCK_SIZE)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
+
+
+def scan_watched_files(directories: list, matcher, recursive: bool = False) -> dict:
+    """監視対象ファイルの {パス: (サイズ, 更新日時)} を返す（os.scandir の stat だけを使う）。"""
+    found = {}
+    pending_dirs = list(directories)
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir():
+                    if recursive:
+                        pending_dirs.append(entry.path)
+                elif matcher(entry.path):
+                    st = entry.stat()
+                    found[entry.path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+    return found
+
+
+class WatchedFile:
+    def __init__(self, signature: tuple):
+        self.signature = signature
+        self.changed_at = None      # 最後に変化を検知した時刻（None なら変換待ちではない）
+        self.converted_hash = None  # 最後に変換したときの内容
+        self.running = False
+
+
+# -------------------------------
+# 監視ループ
+# -------------------------------
+class Watcher:
+    """
+    ポーリングでファイルの変化を検知し、デバウンス後にワーカープールで変換する。
+    同じファイルの変換は同時に 1 つだけ行い、変換中に保存されたら終了後にもう一度変換する。
+    """
+
+    def __init__(self, directories: list, matcher, make_job, executor,
+                 debounce: float = 2.0, recursive: bool = False, log=print):
+        self.directories = directories
+        self.matcher = matcher
+        self.make_job = make_job
+        self.executor = executor
+        self.debounce = debounce
+        self.recursive = recursive
+        self.log = log
+        self.files = {}
+        self.running = {}
+        # 自分で書き出したファイルの内容（監視対象に含まれていても変換し直さない）
+        self.own_outputs = {}
+
+    def start(self, convert_existing: bool = False):
+        now = time.monotonic()
+        for path, signature in scan_watched_files(self.directories, self.matcher, self.recursive).items():
+            watched = self.files[path] = WatchedFile(signature)
+            if convert_existing:
+                watched.changed_at = now - self.debounce
+
+    def poll(self):
+        # 先に完了した変換を回収し、その出力を own_outputs に登録しておく
+        self.collect_finished()
+        now = time.monotonic()
+        current = scan_watched_files(self.directories, self.matcher, self.recursive)
+
+        for path in list(self.files):
+            if path not in current and not self.files[path].running:
+                del self.files[path]
+
+        for path, signature in current.items():
+            watched = self.files.get(path)
+            if watched is None:
+                watched = self.files[path] = WatchedFile(signature)
+                watched.changed_at = now
+            elif watched.signature != signature:
+                watched.signature = signature
+                watched.changed_at = now
+
+        for path, watched in self.files.items():
+            if watched.running or watched.changed_at is None:
+                continue
+            if now - watched.changed_at < self.debounce:
+                continue
+            watched.changed_at = None
+            self.submit(path, watched)
+
+    def submit(self, path: str, watched: WatchedFile):
+        try:
+            content_hash = hash_file(path)
+        except OSError:
+            return
+        if content_hash == watched.converted_hash or self.own_outputs.get(path) == content_hash:
+            return
+
+        try:
+            job = self.make_job(path)
+        except ValueError as e:
+            self.log(f"[NG] {os.path.basename(path)}: {e}")
+            watched.converted_hash = content_hash
+            return
+
+        watched.running = True
+        self.running[self.executor.submit(convert_file, job)] = (path, content_hash)
+
+    def collect_finished(self):
+        for future in [future for future in self.running if future.done()]:
+            path, content_hash = self.running.pop(future)
+            watched = self.files.get(path)
+            if watched is not None:
+                watched.running = False
+                watched.converted_hash = content_hash
+
+            try:
+                result = future.result()
+            except Exception as e:
+                self.log(f"[NG] {os.path.basename(path)}: {e}")
+                continue
+            self.log(format_convert_result(result))
+            if result["output"] and not result["error"]:
+                try:
+                    self.own_outputs[os.path.abspath(result["output"])] = hash_file(result["output"])
+                except OSError:
+                    pass
+
+    def wait_running(self):
+        while self.running:
+            time.sleep(0.1)
+            self.collect_finished()
+
+    def run(self, interval: float = 1.0, stop_event=None):
+        import threading
+
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.poll()
+            # 監視間隔の待機はイベント待ちで行い、ビジーループにしない
+            stop_event.wait(interval)
+        self.wait_running()
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+WATCH_MATCHERS = {
+    "csv": is_csv,
+    "xml": is_xml,
+    "all": lambda path: is_csv(path) or is_xml(path),
+}
+
+
+def main(argv: list) -> int:
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(
+        prog="generator.py watch",
+        description="ディレクトリを監視し、保存された CSV / XML を自動で変換します（Ctrl+C で終了）。",
+    )
+    parser.add_argument("directories", nargs="+", help="監視するディレクトリ")
+    parser.add_argument("--from", dest="source", choices=tuple(WATCH_MATCHERS), default="csv",
+                        help="変換するファイルの種類（既定: csv）")
+    parser.add_argument("--recursive", action="store_true", help="サブディレクトリも監視する")
+    parser.add_argument("--interval", type=float, default=1.0, help="変更を確認する間隔（秒、既定: 1.0）")
+    parser.add_argument("--debounce", type=float, default=2.0,
+                        help="最後の保存からこの秒数だけ変化がなければ変換する（既定: 2.0）")
+    parser.add_argument("--initial", action="store_true", help="起動時に既存のファイルもすべて変換する")
+    add_convert_options(parser)
+    args = parse_convert_args(parser, argv)
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"エラー: ディレクトリではありません: {directory}", file=sys.stderr)
+            return 1
+
+    try:
+        manifest = load_manifest(args.manifest) if args.manifest else ({}, {})
+        # config.json は起動時に 1 回だけ読み、すべての変換で使い回す
+        config = load_config() if args.source != "xml" else None
+    except (ValueError, OSError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    def make_job(path: str) -> dict:
+        return build_convert_job(path, args, config, manifest)
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        directories = [os.path.abspath(directory) for directory in args.directories]
+        watcher = Watcher(directories, WATCH_MATCHERS[args.source], make_job, executor,
+                          debounce=args.debounce, recursive=args.recursive)
+        watcher.start(convert_existing=args.initial)
+        print(f"監視を開始しました（{len(watcher.files)} ファイル）。Ctrl+C で終了します。")
+        try:
+            watcher.run(interval=args.interval)
+        except KeyboardInterrupt:
+            print("変換中のファイルの完了を待っています…")
+            watcher.wait_running()
+    print("監視を終了しました。")
+    return 0